@@ -1,6 +1,7 @@
 # 添加个性化推荐测试数据
 from app import create_app, db
 from app.models.user import User, HealthRecord
+from app.services.record_ingestion import RecordIngestionService
 from datetime import datetime, timedelta
 import random
 
@@ -22,22 +23,23 @@ def add_test_data():
         # 删除旧的健康记录
         HealthRecord.query.filter_by(user_id=test_user.id).delete()
         
-        # 添加测试健康记录
-        for i in range(30):
-            record = HealthRecord(
-                user_id=test_user.id,
-                heart_rate=random.randint(60, 100),
-                blood_pressure=f"{random.randint(90, 140)}/{random.randint(60, 90)}",
-                blood_sugar=random.uniform(3.9, 6.1),
-                weight=random.uniform(50, 80),
-                sleep_hours=random.uniform(6, 9),
-                mood_score=random.randint(1, 10),
-                recorded_at=datetime.now() - timedelta(days=i)
-            )
-            db.session.add(record)
-        
         db.session.commit()
-        print("测试数据添加成功！")
+        
+        # 添加测试健康记录，通过批量导入服务分块写入
+        records = [
+            {
+                'heart_rate': random.randint(60, 100),
+                'blood_pressure': f"{random.randint(90, 140)}/{random.randint(60, 90)}",
+                'blood_sugar': random.uniform(3.9, 6.1),
+                'weight': random.uniform(50, 80),
+                'sleep_hours': random.uniform(6, 9),
+                'mood_score': random.randint(1, 10),
+                'recorded_at': datetime.now() - timedelta(days=i)
+            }
+            for i in range(30)
+        ]
+        result = RecordIngestionService().ingest(test_user.id, records)
+        print(f"测试数据添加成功！共写入 {result['inserted']} 条记录")
 
 if __name__ == '__main__':
     add_test_data() 
\ No newline at end of file
@@ -1,7 +1,11 @@
 # 初始化文件
+import time
+_import_started = time.perf_counter()
+
+import logging
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
+from flask_migrate import Migrate, upgrade
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from flask_mail import Mail
@@ -17,6 +21,7 @@ mail = Mail()
 cors = CORS()
 
 def create_app(test_config=None):
+    started = time.perf_counter()
     app = Flask(__name__)
     
     if test_config is None:
@@ -34,51 +39,141 @@ def create_app(test_config=None):
 
     # 初始化扩展
     db.init_app(app)
-    migrate.init_app(app, db)
+    migrate.init_app(app, db, directory=os.path.join(os.path.dirname(app.root_path), 'migrations'))
     jwt.init_app(app)
     cors.init_app(app)
     
     # 注册蓝图
-    from app.api import auth_bp, health_bp, recommendation_bp, fl_bp, disease_prediction_bp
+    from app.api import auth_bp, health_bp, recommendation_bp, fl_bp, disease_prediction_bp, system_bp, training_job_bp
+    from app.api import algorithm_bp
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(health_bp, url_prefix='/api/health')
     app.register_blueprint(recommendation_bp, url_prefix='/api/recommendation')
     app.register_blueprint(fl_bp, url_prefix='/api/fl')
     app.register_blueprint(disease_prediction_bp, url_prefix='/api/disease')
+    app.register_blueprint(system_bp, url_prefix='/api/system')
+    app.register_blueprint(training_job_bp, url_prefix='/api/jobs')
+    app.register_blueprint(algorithm_bp)
+    
+    # 注册命令行工具
+    from app.commands import register_commands
+    register_commands(app)
+
+    startup_mode = app.config.get('STARTUP_MODE', Config.STARTUP_MODE)
+    with app.app_context():
+        if startup_mode == 'production':
+            # 生产模式：数据库由迁移管理，只检查结构版本，不删库、不建表、不创建测试用户
+            _check_schema_version(app)
+        else:
+            _init_development_database(app)
 
-    # 在应用上下文中创建所有数据库表
+    preloaded = _preload_services(app)
+    _record_startup_stats(app, startup_mode, started, preloaded)
+    return app
+
+def _preload_services(app):
+    """按 PRELOAD_SERVICES 预热服务，需要首个请求也很快的工作进程可以开启"""
+    from app.utils.lazy import preload
+    
+    setting = app.config.get('PRELOAD_SERVICES', Config.PRELOAD_SERVICES)
+    if not setting:
+        return {}
+    names = None if setting == 'all' else {name.strip() for name in setting.split(',') if name.strip()}
     with app.app_context():
-        try:
-            # 导入所有模型以确保它们被注册
-            from app.models.user import User, HealthRecord
-            
-            # 删除现有的数据库文件（如果存在）
-            db_path = os.path.join(os.path.dirname(app.instance_path), 'health.db')
-            if os.path.exists(db_path):
-                os.remove(db_path)
-            
-            # 创建所有表
-            db.create_all()
-            print("成功创建数据库表")
-            
-            # 检查测试用户是否已存在
-            test_user = User.query.filter_by(email='test@test.com').first()
-            if not test_user:
-                # 添加测试用户
-                test_user = User(
-                    username='test_user',
-                    email='test@test.com'
-                )
-                test_user.set_password('test123')
-                db.session.add(test_user)
-                db.session.commit()
-                print("成功创建测试用户")
-            else:
-                print("测试用户已存在")
-            
-        except Exception as e:
-            print(f"初始化数据库时出错: {str(e)}")
-            db.session.rollback()
-            raise e
+        return preload(names)
+
+def _check_schema_version(app):
+    """检查数据库的 Alembic 版本是否与迁移脚本的最新版本一致"""
+    from alembic.config import Config as AlembicConfig
+    from alembic.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+    
+    alembic_config = AlembicConfig()
+    alembic_config.set_main_option('script_location', app.extensions['migrate'].directory)
+    heads = set(ScriptDirectory.from_config(alembic_config).get_heads())
+    with db.engine.connect() as conn:
+        current = set(MigrationContext.configure(conn).get_current_heads())
+    if current != heads:
+        raise RuntimeError(
+            f"数据库结构版本 {sorted(current) or '无'} 与迁移脚本版本 {sorted(heads)} 不一致，"
+            f"请先执行 flask db upgrade"
+        )
 
-    return app 
\ No newline at end of file
+def _record_startup_stats(app, startup_mode, started, preloaded):
+    """记录冷启动耗时，首个请求完成后补充首个请求的耗时"""
+    now = time.perf_counter()
+    stats = app.extensions['startup_stats'] = {
+        'mode': startup_mode,
+        'create_app_seconds': now - started,
+        'since_import_seconds': now - _import_started,
+        'preloaded_services': preloaded,
+        'first_request_seconds': None,
+        'time_to_first_response_seconds': None
+    }
+    logging.getLogger(__name__).info(
+        f"应用启动完成（{startup_mode}），create_app 耗时 {stats['create_app_seconds']:.3f}s"
+    )
+    
+    first_request = {}
+    
+    @app.before_request
+    def _mark_first_request():
+        if 'started' not in first_request:
+            first_request['started'] = time.perf_counter()
+    
+    @app.after_request
+    def _record_first_response(response):
+        if stats['first_request_seconds'] is None and 'started' in first_request:
+            finished = time.perf_counter()
+            stats['first_request_seconds'] = finished - first_request['started']
+            stats['time_to_first_response_seconds'] = finished - _import_started
+        return response
+
+def _init_development_database(app):
+    """开发模式：重建数据库并创建测试用户"""
+    try:
+        # 导入所有模型以确保它们被注册
+        from app.models.user import User, HealthRecord
+        from app.models.training_job import TrainingJob
+        from app.models.health_rollup import HealthRollup
+        from app.models.user_recommendation import UserRecommendation
+        
+        # 删除应用实际使用的数据库（相对路径的 SQLite 位于 instance 目录下）
+        _drop_development_database()
+
+        # 按迁移脚本建表，开发数据库与生产数据库的表结构保持一致
+        upgrade(directory=app.extensions['migrate'].directory)
+        print("成功创建数据库表")
+        
+        # 检查测试用户是否已存在
+        test_user = User.query.filter_by(email='test@test.com').first()
+        if not test_user:
+            # 添加测试用户
+            test_user = User(
+                username='test_user',
+                email='test@test.com'
+            )
+            test_user.set_password('test123')
+            db.session.add(test_user)
+            db.session.commit()
+            print("成功创建测试用户")
+        else:
+            print("测试用户已存在")
+        
+    except Exception as e:
+        print(f"初始化数据库时出错: {str(e)}")
+        db.session.rollback()
+        raise e
+
+def _drop_development_database():
+    """删除开发数据库：SQLite 文件直接删除，其他数据库删除全部表"""
+    url = db.engine.url
+    if url.get_backend_name() == 'sqlite' and url.database and url.database != ':memory:':
+        db.engine.dispose()
+        if os.path.exists(url.database):
+            os.remove(url.database)
+    else:
+        db.drop_all()
+        # 版本表不在模型中，不删除的话迁移会认为数据库已是最新版本
+        with db.engine.begin() as conn:
+            conn.execute(db.text('DROP TABLE IF EXISTS alembic_version'))
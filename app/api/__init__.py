@@ -4,4 +4,6 @@ from .health_recommendation_api import bp as recommendation_bp
 from .federated_learning_api import bp as fl_bp
 from .algorithm_analysis_api import bp as algorithm_bp
 from .data_collection_api import bp as data_collection_bp
-from .disease_prediction_api import bp as disease_prediction_bp 
\ No newline at end of file
+from .disease_prediction_api import bp as disease_prediction_bp
+from .system_api import bp as system_bp
+from .training_job_api import bp as training_job_bp 
\ No newline at end of file
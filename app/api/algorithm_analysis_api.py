@@ -1,47 +1,60 @@
+from datetime import datetime, timedelta
 from flask import Blueprint, request, jsonify
-from app.services.algorithm_analysis import AlgorithmAnalysisService
+from app.services.health_rollups import rollup_service
 from app.utils.auth import token_required
+from app.services.training_jobs import training_queue, TrainingJobError
+from app.utils.lazy import LazyService
 
 bp = Blueprint('algorithm_analysis', __name__)
-algorithm_service = AlgorithmAnalysisService()
+# 健康评估最多回溯的天数
+MAX_ASSESS_DAYS = 3650
+algorithm_service = LazyService('app.services.algorithm_analysis:AlgorithmAnalysisService', name='algorithm_analysis.algorithm_service')
+
+def _run_training(train, health_records, progress):
+    """后台训练任务：训练并评估模型"""
+    progress(0.1, '训练模型')
+    result = train(health_records)
+    if 'error' in result:
+        raise TrainingJobError(result['error'])
+    return result
 
 @bp.route('/api/algorithm/train/diabetes', methods=['POST'])
 @token_required
-def train_diabetes_model():
+def train_diabetes_model(current_user):
     """训练糖尿病预测模型"""
     try:
         data = request.get_json()
         if not data or 'health_records' not in data:
             return jsonify({'error': '缺少健康记录数据'}), 400
             
-        result = algorithm_service.train_diabetes_model(data['health_records'])
-        if 'error' in result:
-            return jsonify(result), 400
-            
-        return jsonify(result), 200
+        job = training_queue.submit(
+            'algorithm_diabetes', current_user.id,
+            _run_training, algorithm_service.train_diabetes_model, data['health_records']
+        )
+        return jsonify(job.to_dict()), 202
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/api/algorithm/train/hypertension', methods=['POST'])
 @token_required
-def train_hypertension_model():
+def train_hypertension_model(current_user):
     """训练高血压预测模型"""
     try:
         data = request.get_json()
         if not data or 'health_records' not in data:
             return jsonify({'error': '缺少健康记录数据'}), 400
             
-        result = algorithm_service.train_hypertension_model(data['health_records'])
-        if 'error' in result:
-            return jsonify(result), 400
-            
-        return jsonify(result), 200
+        job = training_queue.submit(
+            'algorithm_hypertension', current_user.id,
+            _run_training, algorithm_service.train_hypertension_model, data['health_records']
+        )
+        return jsonify(job.to_dict()), 202
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/api/algorithm/predict/risk', methods=['POST'])
 @token_required
-def predict_disease_risk():
+def predict_disease_risk(current_user):
     """预测疾病风险"""
     try:
         data = request.get_json()
@@ -56,16 +69,39 @@ def predict_disease_risk():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@bp.route('/api/algorithm/assess/health', methods=['POST'])
+@bp.route('/api/algorithm/predict/risk/batch', methods=['POST'])
 @token_required
-def assess_health_status():
-    """评估健康状态"""
+def predict_disease_risk_batch(current_user):
+    """批量预测疾病风险"""
     try:
         data = request.get_json()
-        if not data or 'health_records' not in data:
+        if not data or not isinstance(data.get('health_records'), list):
+            return jsonify({'error': '缺少健康记录数据'}), 400
+            
+        # 整批一次推理，格式错误的记录在对应位置返回错误信息
+        results = algorithm_service.predict_disease_risk_batch(data['health_records'])
+        return jsonify({'predictions': results}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/algorithm/assess/health', methods=['POST'])
+@token_required
+def assess_health_status(current_user):
+    """评估健康状态，未提供健康记录时使用当前用户最近 days 天（默认30天）的每日汇总"""
+    try:
+        data = request.get_json(silent=True) or {}
+        if 'health_records' in data:
+            health_records = data['health_records']
+        else:
+            days = data.get('days', 30)
+            if isinstance(days, bool) or not isinstance(days, int) or not 0 < days <= MAX_ASSESS_DAYS:
+                return jsonify({'error': f'days 必须是 1 到 {MAX_ASSESS_DAYS} 之间的整数'}), 400
+            start = datetime.utcnow().date() - timedelta(days=days)
+            health_records = rollup_service.daily_means(current_user.id, start=start)
+        if not health_records:
             return jsonify({'error': '缺少健康记录数据'}), 400
             
-        result = algorithm_service.assess_health_status(data['health_records'])
+        result = algorithm_service.assess_health_status(health_records)
         if 'error' in result:
             return jsonify(result), 400
             
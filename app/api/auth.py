@@ -5,6 +5,7 @@ from werkzeug.security import generate_password_hash, check_password_hash
 import jwt
 from app.models.user import User
 from app import db
+from app.utils.principal_cache import authenticate
 
 bp = Blueprint('auth', __name__)
 
@@ -20,8 +21,9 @@ def token_required(f):
             return jsonify({'message': 'Token is missing!'}), 401
             
         try:
-            data = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=["HS256"])
-            current_user = User.query.get(data['user_id'])
+            current_user = authenticate(token, current_app.config['JWT_SECRET_KEY'])
+            if not current_user:
+                return jsonify({'message': 'User not found!'}), 401
         except:
             return jsonify({'message': 'Token is invalid!'}), 401
             
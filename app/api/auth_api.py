@@ -4,6 +4,7 @@ from datetime import datetime, timedelta
 from app.models.user import User, db
 from app.config import Config
 from app.utils.auth import token_required
+from app.services.password_hashing import password_hasher, PasswordHasherBusy
 
 bp = Blueprint('auth', __name__)
 
@@ -20,11 +21,16 @@ def register():
     if User.query.filter_by(email=data['email']).first():
         return jsonify({'error': '邮箱已存在'}), 400
         
+    try:
+        password_hash = password_hasher.hash(data['password'])
+    except PasswordHasherBusy:
+        return _busy_response()
+        
     user = User(
         username=data['username'],
-        email=data['email']
+        email=data['email'],
+        password_hash=password_hash
     )
-    user.password = data['password']
     
     db.session.add(user)
     db.session.commit()
@@ -40,8 +46,15 @@ def login():
         
     user = User.query.filter_by(username=data['username']).first()
     
-    if not user or not user.check_password(data['password']):
+    try:
+        # 校验成功且哈希参数已过时时会顺便更新哈希
+        verified = user is not None and password_hasher.verify_and_update(user, data['password'])
+    except PasswordHasherBusy:
+        return _busy_response()
+    if not verified:
         return jsonify({'error': '用户名或密码错误'}), 401
+    if user in db.session.dirty:
+        db.session.commit()
         
     token = jwt.encode({
         'user_id': user.id,
@@ -56,8 +69,13 @@ def login():
 @bp.route('/profile', methods=['GET'])
 @token_required
 def get_profile(current_user):
-    user = User.query.get(current_user)
+    user = db.session.get(User, current_user.id)
     if not user:
         return jsonify({'error': '用户不存在'}), 404
         
-    return jsonify(user.to_dict()), 200 
\ No newline at end of file
+    return jsonify(user.to_dict()), 200 
+
+def _busy_response():
+    response = jsonify({'error': '服务繁忙，请稍后重试'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
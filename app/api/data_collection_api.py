@@ -1,12 +1,11 @@
 # 数据收集API
 from flask import Blueprint, request, jsonify
-from app.services.data_collection import DataCollectionService
 from app.api.auth import token_required
-import pandas as pd
 import json
+from app.utils.lazy import LazyService
 
 bp = Blueprint('data_collection', __name__)
-data_service = DataCollectionService()
+data_service = LazyService('app.services.data_collection:DataCollectionService', name='data_collection.data_service')
 
 @bp.route('/api/data/hospital', methods=['POST'])
 @token_required
@@ -70,6 +69,7 @@ def preprocess_data(current_user):
             return jsonify({'error': '缺少数据'}), 400
             
         # 将JSON数据转换为DataFrame
+        import pandas as pd
         df = pd.DataFrame(data)
         
         # 数据预处理
@@ -1,27 +1,32 @@
 from flask import Blueprint, jsonify, request
 from app.utils.auth import token_required
-from app.services.disease_prediction import DiseasePrediction
-from app.models.user import User, HealthRecord
+from app.services.training_jobs import training_queue, TrainingJobError
+from app.models.user import User
 from app import db
+from app.utils.lazy import LazyService
 
 bp = Blueprint('disease_prediction', __name__)
+predictor = LazyService('app.services.disease_prediction:DiseasePrediction', name='disease_prediction.predictor')
+
+def _run_training(user_id, full, progress):
+    """后台训练任务：默认只用上次训练后新增的记录增量更新模型"""
+    from app.services.disease_prediction import user_record_loader
+    progress(0.1, "加载健康记录并训练模型")
+    
+    # 训练模型（特征按列直接从ORM对象提取）
+    success, message, details = predictor.update_model(user_record_loader(user_id), scope=user_id, full=full)
+    if not success:
+        raise TrainingJobError(message)
+    return dict(details, message=message)
 
 @bp.route('/train', methods=['POST'])
 @token_required
 def train_model(current_user):
-    """训练疾病风险预测模型"""
-    # 获取用户的健康记录
-    health_records = HealthRecord.query.filter_by(user_id=current_user.id).all()
-    records_data = [record.to_dict() for record in health_records]
-    
-    # 训练模型
-    predictor = DiseasePrediction()
-    success, message = predictor.train_model(records_data)
-    
-    if success:
-        return jsonify({"message": message}), 200
-    else:
-        return jsonify({"error": message}), 400
+    """提交疾病风险预测模型训练任务，请求体 {"full": true} 时强制全量训练"""
+    data = request.get_json(silent=True) or {}
+    full = bool(data.get('full', False))
+    job = training_queue.submit('disease', current_user.id, _run_training, current_user.id, full)
+    return jsonify(job.to_dict()), 202
 
 @bp.route('/predict', methods=['POST'])
 @token_required
@@ -33,7 +38,6 @@ def predict_risk(current_user):
         return jsonify({"error": "未提供健康数据"}), 400
         
     # 获取预测结果
-    predictor = DiseasePrediction()
     result = predictor.predict_risk(data)
     
     return jsonify(result), 200
@@ -47,12 +51,7 @@ def batch_predict(current_user):
     if not data or not isinstance(data, list):
         return jsonify({"error": "未提供有效的健康数据列表"}), 400
         
-    # 获取预测结果
-    predictor = DiseasePrediction()
-    results = []
-    
-    for record in data:
-        result = predictor.predict_risk(record)
-        results.append(result)
+    # 整批一次推理，格式错误的记录在对应位置返回错误信息
+    results = predictor.predict_batch(data)
     
     return jsonify({"predictions": results}), 200 
\ No newline at end of file
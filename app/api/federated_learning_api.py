@@ -1,45 +1,177 @@
 # 联邦学习API
-from flask import Blueprint, request, jsonify
-from app.services.federated_learning import FederatedLearning
+import base64
+import binascii
+from flask import Blueprint, request, jsonify, make_response
 from app.models.user import HealthRecord
 from app import db
 from app.api.auth import token_required
+from app.services.training_jobs import training_queue, TrainingJobError
+from app.services.federated_rounds import (
+    fedavg_aggregator, parse_update, check_base_version, pack_params, UpdateError, PARAM_KEYS, PARAM_SIZE
+)
+from app.services.fl_codec import encode_update, decode_update, ENCODINGS, TOPK
+from app.services.fl_distribution import model_distribution, ENCODINGS as MODEL_ENCODINGS
+from app.utils.lazy import LazyService
 
 bp = Blueprint('federated_learning', __name__)
-fl_service = FederatedLearning()
+fl_service = LazyService('app.services.federated_learning:FederatedLearning', name='federated_learning.fl_service')
 
-@bp.route('/api/fl/train', methods=['POST'])
+def _run_training(user_id, encoding, base_version, top_k, progress):
+    """后台训练任务：训练本地模型，任务结果中包含模型参数（JSON 列表或 base64 编码的二进制更新）"""
+    progress(0.1, '加载健康记录')
+    health_records = HealthRecord.query.filter_by(user_id=user_id).all()
+    
+    progress(0.3, '训练本地模型')
+    local_model_params = fl_service.train_local_model(health_records)
+    if local_model_params is None:
+        raise TrainingJobError('没有足够的训练数据')
+    # 本地训练时的最新全局版本，异步聚合据此计算更新的过期程度
+    latest_version = fedavg_aggregator.latest_version()
+    if encoding == 'json':
+        return dict(local_model_params, message='本地模型训练成功', base_version=latest_version)
+    
+    params = pack_params(*(local_model_params[key] for key in PARAM_KEYS))
+    base = None
+    if base_version:
+        base = fedavg_aggregator.global_params(base_version)
+        if base is None:
+            raise TrainingJobError(f'基准全局模型版本 {base_version} 不存在')
+    payload = encode_update(
+        params, local_model_params['samples'], encoding,
+        base=base, base_version=base_version or 0, top_k=top_k
+    )
+    return {
+        'message': '本地模型训练成功',
+        'samples': local_model_params['samples'],
+        'encoding': encoding,
+        'base_version': base_version or latest_version,
+        'bytes': len(payload),
+        'update': base64.b64encode(payload).decode('ascii')
+    }
+
+@bp.route('/train', methods=['POST'])
 @token_required
 def train_local_model(current_user):
-    """训练本地模型"""
-    health_records = HealthRecord.query.filter_by(user_id=current_user.id).all()
-    records_data = [record.to_dict() for record in health_records]
+    """提交本地模型训练任务
     
-    local_model_params = fl_service.train_local_model(records_data)
-    if local_model_params is None:
-        return jsonify({'error': '没有足够的训练数据'}), 400
-        
-    return jsonify(local_model_params)
+    请求体可选 {"encoding": "json/float32/float16/q8/topk", "base_version": 版本号, "top_k": 个数}，
+    指定 base_version 时编码相对该全局版本的增量，topk 编码未指定时使用最新版本。
+    """
+    data = request.get_json(silent=True) or {}
+    encoding = data.get('encoding', 'json')
+    if encoding != 'json' and encoding not in ENCODINGS:
+        return jsonify({'error': f'不支持的编码方式: {encoding}'}), 400
+    base_version = data.get('base_version')
+    if base_version is not None and (isinstance(base_version, bool) or not isinstance(base_version, int) or base_version <= 0):
+        return jsonify({'error': 'base_version 必须是正整数'}), 400
+    if base_version is None and encoding == TOPK:
+        base_version = fedavg_aggregator.latest_version()
+        if base_version is None:
+            return jsonify({'error': '还没有全局模型，无法使用增量编码'}), 400
+    if encoding == 'json' and base_version:
+        return jsonify({'error': 'JSON 格式不支持增量编码'}), 400
+    top_k = data.get('top_k')
+    if top_k is not None and (isinstance(top_k, bool) or not isinstance(top_k, int) or not 1 <= top_k <= PARAM_SIZE):
+        return jsonify({'error': f'top_k 必须是 1 到 {PARAM_SIZE} 之间的整数'}), 400
+    
+    job = training_queue.submit(
+        'federated', current_user.id, _run_training,
+        current_user.id, encoding, base_version, top_k
+    )
+    return jsonify(job.to_dict()), 202
+
+def _decode_update(payload, base_version):
+    """解码二进制更新；完整参数的更新没有基准版本，使用请求中单独给出的 base_version"""
+    params, samples, header_version = decode_update(payload, fedavg_aggregator.global_params)
+    return params, samples, header_version or base_version
+
+def _read_update():
+    """读取客户端更新：application/octet-stream 请求体或 JSON 中 base64 编码的二进制更新，否则按 JSON 参数列表解析
 
-@bp.route('/api/fl/update', methods=['POST'])
+    返回 (参数向量, 样本数, 客户端训练时所基于的全局模型版本)。
+    """
+    if request.mimetype == 'application/octet-stream':
+        base_version = check_base_version(request.args.get('base_version', type=int))
+        return _decode_update(request.get_data(), base_version)
+    data = request.get_json(silent=True)
+    if isinstance(data, dict) and 'update' in data:
+        try:
+            payload = base64.b64decode(data['update'], validate=True)
+        except (TypeError, binascii.Error):
+            raise UpdateError('update 必须是 base64 编码的二进制更新')
+        return _decode_update(payload, check_base_version(data.get('base_version')))
+    return parse_update(data)
+
+@bp.route('/update', methods=['POST'])
 @token_required
 def update_global_model(current_user):
-    """更新全局模型参数"""
-    data = request.get_json()
+    """提交本地模型参数到当前聚合轮次，本轮关闭时加权平均并发布全局模型
     
-    if not all(key in data for key in ['model_weights', 'intercept', 'scaler_mean', 'scaler_scale']):
-        return jsonify({'error': '缺少必要的模型参数'}), 400
-        
-    fl_service.update_global_model(
-        data['model_weights'],
-        data['intercept'],
-        data['scaler_mean'],
-        data['scaler_scale']
-    )
+    异步聚合时请求中的 base_version（二进制增量更新取头部中的版本）说明客户端基于哪个全局版本训练。
+    """
+    try:
+        params, samples, base_version = _read_update()
+        round_ = fedavg_aggregator.submit(current_user.id, params, samples, base_version)
+    except UpdateError as e:
+        response = jsonify({'error': str(e)})
+        if e.status == 503:
+            # 并发冲突重试耗尽，提示客户端稍后重新提交
+            response.headers['Retry-After'] = '1'
+        return response, e.status
+    
+    if round_.status == 'closed':
+        message = f'第 {round_.id} 轮聚合完成，全局模型已更新'
+    else:
+        message = f'模型更新已加入第 {round_.id} 轮聚合'
+    return jsonify({
+        'message': message,
+        'round': round_.to_dict(),
+        'global_version': fedavg_aggregator.latest_version()
+    })
+
+@bp.route('/round', methods=['GET'])
+@token_required
+def get_round(current_user):
+    """查询当前聚合轮次和最新的全局模型版本"""
+    round_ = fedavg_aggregator.current_round(create=False)
+    return jsonify({
+        'round': round_.to_dict() if round_ else None,
+        'global_version': fedavg_aggregator.latest_version()
+    })
+
+@bp.route('/model', methods=['GET'])
+@token_required
+def get_global_model(current_user):
+    """下载全局模型
+    
+    ?since=版本号 时返回从该版本到最新版本的增量（该版本已不在内存中时返回完整模型），已是最新时返回 304；
+    也可以带 If-None-Match。?encoding=float32/float16/q8 返回与模型更新相同的二进制格式，默认 JSON。
+    """
+    version = fedavg_aggregator.latest_version()
+    if version is None:
+        return jsonify({'error': '还没有全局模型'}), 404
+    since = request.args.get('since', type=int)
+    if since is not None and not 0 < since <= version:
+        return jsonify({'error': f'全局模型版本 {since} 不存在'}), 400
+    encoding = request.args.get('encoding', 'json')
+    if encoding not in MODEL_ENCODINGS:
+        return jsonify({'error': f'不支持的编码方式: {encoding}'}), 400
     
-    return jsonify({'message': '全局模型更新成功'})
+    etag = model_distribution.etag(version)
+    if since == version or request.if_none_match.contains_weak(etag):
+        response = make_response('', 304)
+    else:
+        body, base_version = model_distribution.body(version, since, encoding)
+        response = make_response(body)
+        response.mimetype = 'application/json' if encoding == 'json' else 'application/octet-stream'
+        response.headers['X-Base-Version'] = str(base_version)
+    # 不同 since/encoding 的响应内容不同，但都表示同一个模型版本，使用弱 ETag
+    response.set_etag(etag, weak=True)
+    response.headers['X-Model-Version'] = str(version)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
-@bp.route('/api/fl/predict', methods=['POST'])
+@bp.route('/predict', methods=['POST'])
 @token_required
 def predict_health_status(current_user):
     """预测健康状态"""
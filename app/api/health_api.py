@@ -1,13 +1,22 @@
 # 健康数据API
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from app.models.user import User, HealthRecord
-from app.services.health_recommendation import HealthRecommendationService
 from app import db
-from datetime import datetime
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
 from app.api.auth_api import token_required
+from app.services.training_jobs import training_queue, TrainingJobError
+from app.utils.pagination import paginate_health_records
+from app.services.record_ingestion import RecordIngestionService
+from app.services.health_rollups import rollup_service, ROLLUP_METRICS
+from app.services.recommendation_store import recommendation_store
+from app.services.recommendation_rules import recommendation_engine
+from app.utils.lazy import LazyService
+from app.utils.response_cache import response_cache, bump_data_version
 
 bp = Blueprint('health', __name__)
-recommender = HealthRecommendationService()
+recommender = LazyService('app.services.health_recommendation:HealthRecommendationService', name='health.recommender')
+ingestion_service = RecordIngestionService()
 
 @bp.route('/records', methods=['POST'])
 @token_required
@@ -28,15 +37,51 @@ def add_health_record(current_user):
     )
     
     db.session.add(record)
+    db.session.flush()
+    rollup_service.apply([record])
+    bump_data_version(current_user.id)
     db.session.commit()
     
     return jsonify(record.to_dict()), 201
 
+@bp.route('/records/bulk', methods=['POST'])
+@token_required
+def bulk_add_health_records(current_user):
+    """批量导入健康记录，返回每条失败记录的错误信息"""
+    data = request.get_json(silent=True)
+    records = data.get('records') if isinstance(data, dict) else data
+    
+    if not records or not isinstance(records, list):
+        return jsonify({'error': '请提供健康记录列表'}), 400
+    if len(records) > current_app.config.get('BULK_MAX_RECORDS', 50000):
+        return jsonify({'error': f"单次最多导入 {current_app.config.get('BULK_MAX_RECORDS', 50000)} 条记录"}), 413
+        
+    result = ingestion_service.ingest(current_user.id, records)
+    if result['inserted']:
+        bump_data_version(current_user.id)
+        db.session.commit()
+    return jsonify(result), 201 if result['inserted'] else 400
+
 @bp.route('/records', methods=['GET'])
 @token_required
+@response_cache.cached('health.records')
 def get_health_records(current_user):
-    records = HealthRecord.query.filter_by(user_id=current_user.id).all()
-    return jsonify([record.to_dict() for record in records]), 200
+    try:
+        records, next_cursor = paginate_health_records(current_user.id, request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+        
+    response = jsonify([record.to_dict() for record in records])
+    # 响应体保持为记录列表，下一页游标通过响应头返回
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = f'<{request.base_url}?{_next_page_query(next_cursor)}>; rel="next"'
+    return response, 200
+
+def _next_page_query(next_cursor):
+    args = request.args.to_dict()
+    args['after'] = next_cursor
+    return urlencode(args)
 
 @bp.route('/records/<int:record_id>', methods=['GET'])
 @token_required
@@ -64,6 +109,9 @@ def update_health_record(current_user, record_id):
     record.sleep_hours = data.get('sleep_hours', record.sleep_hours)
     record.mood_score = data.get('mood_score', record.mood_score)
     
+    db.session.flush()
+    rollup_service.refresh_record(record)
+    bump_data_version(current_user.id)
     db.session.commit()
     return jsonify(record.to_dict()), 200
 
@@ -75,66 +123,82 @@ def delete_health_record(current_user, record_id):
         return jsonify({'error': '记录不存在'}), 404
         
     db.session.delete(record)
+    db.session.flush()
+    rollup_service.refresh_record(record)
+    bump_data_version(current_user.id)
     db.session.commit()
     return jsonify({'message': '记录已删除'}), 200
 
+@bp.route('/trends', methods=['GET'])
+@token_required
+@response_cache.cached('health.trends')
+def get_health_trends(current_user):
+    """从日/周汇总表读取趋势，默认返回最近30天或12周"""
+    period = request.args.get('period', 'day')
+    metrics = [m for m in request.args.get('metrics', '').split(',') if m] or list(ROLLUP_METRICS)
+    try:
+        end = _parse_date(request.args.get('end'), 'end') or datetime.utcnow().date()
+        start = _parse_date(request.args.get('start'), 'start')
+        if start is None:
+            start = end - (timedelta(weeks=12) if period == 'week' else timedelta(days=30))
+        # start 所在的周期和 end 当天都包含在内
+        series = rollup_service.trends(current_user.id, period, start, end + timedelta(days=1), metrics)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+        
+    return jsonify({'period': period, 'series': series}), 200
+
+def _parse_date(value, name):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).date()
+    except ValueError:
+        raise ValueError(f'无效的日期参数 {name}: {value}')
+
 @bp.route('/recommendation/<int:user_id>', methods=['GET'])
 @token_required
+@response_cache.cached('health.recommendation', version=recommendation_engine.digest)
 def get_health_recommendation(current_user, user_id):
     if current_user.id != user_id:
         return jsonify({'error': '无权访问其他用户的健康建议'}), 403
         
     try:
-        # 获取用户最近的健康记录
-        health_record = HealthRecord.query.filter_by(user_id=user_id).order_by(HealthRecord.recorded_at.desc()).first()
+        # 读取预计算的建议，用户有新记录时重新计算
+        stored = recommendation_store.get(user_id)
         
-        if not health_record:
+        if stored is None:
             return jsonify({'error': '未找到健康记录'}), 404
-            
-        # 分析健康指标
-        analysis = recommender.analyze_health_metrics(health_record)
-        
-        # 生成个性化建议
-        recommendations = recommender.generate_recommendations(analysis)
         
         return jsonify({
-            'analysis': analysis,
-            'recommendations': recommendations
+            'analysis': stored.analysis,
+            'recommendations': stored.recommendations
         }), 200
         
     except Exception as e:
         return jsonify({'error': f'获取健康建议失败: {str(e)}'}), 500
 
+def _run_training(user_id, progress):
+    """后台训练任务：使用用户全部健康记录训练健康状况模型"""
+    progress(0.1, '加载健康记录')
+    records = HealthRecord.query.filter_by(user_id=user_id).all()
+    
+    # 使用健康推荐服务训练模型（特征按列直接从ORM对象提取）
+    progress(0.3, '训练模型')
+    result = recommender.train_model(records)
+    if result['status'] != 'success':
+        raise TrainingJobError(result['message'])
+    return {
+        'message': result['message'],
+        'data_points': len(records),
+        'training_samples': result['training_samples']
+    }
+
 @bp.route('/train', methods=['POST'])
 @token_required
 def train_model(current_user):
-    try:
-        # 获取用户的所有健康记录
-        records = HealthRecord.query.filter_by(user_id=current_user.id).all()
+    if HealthRecord.query.filter_by(user_id=current_user.id).count() < 10:
+        return jsonify({'error': '需要至少10条健康记录来训练模型'}), 400
         
-        if len(records) < 10:
-            return jsonify({'error': '需要至少10条健康记录来训练模型'}), 400
-            
-        # 准备训练数据
-        training_data = []
-        for record in records:
-            data = {
-                'heart_rate': record.heart_rate,
-                'blood_pressure': record.blood_pressure,
-                'blood_sugar': record.blood_sugar,
-                'weight': record.weight,
-                'sleep_hours': record.sleep_hours,
-                'mood_score': record.mood_score
-            }
-            training_data.append(data)
-            
-        # 使用健康推荐服务训练模型
-        recommender.train_model(training_data)
-        
-        return jsonify({
-            'message': '模型训练成功',
-            'data_points': len(records)
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'error': f'模型训练失败: {str(e)}'}), 500 
\ No newline at end of file
+    job = training_queue.submit('health', current_user.id, _run_training, current_user.id)
+    return jsonify(job.to_dict()), 202
\ No newline at end of file
@@ -1,34 +1,29 @@
 from flask import Blueprint, jsonify
-from app.models.user import User, HealthRecord
-from app.services.health_recommendation import HealthRecommendationService
 from app.api.auth_api import token_required
+from app.services.recommendation_store import recommendation_store
+from app.services.recommendation_rules import recommendation_engine
+from app.utils.response_cache import response_cache
 
 bp = Blueprint('health_recommendation', __name__)
-recommender = HealthRecommendationService()
 
 @bp.route('/recommendation/<int:user_id>', methods=['GET'])
 @token_required
+@response_cache.cached('recommendation.recommendation', version=recommendation_engine.digest)
 def get_health_recommendation(current_user, user_id):
     """获取用户的健康建议"""
     if current_user.id != user_id:
         return jsonify({'error': '无权访问其他用户的健康建议'}), 403
         
     try:
-        # 获取用户最近的健康记录
-        health_record = HealthRecord.query.filter_by(user_id=user_id).order_by(HealthRecord.recorded_at.desc()).first()
+        # 读取预计算的建议，用户有新记录时重新计算
+        stored = recommendation_store.get(user_id)
         
-        if not health_record:
+        if stored is None:
             return jsonify({'error': '未找到健康记录'}), 404
-            
-        # 分析健康指标
-        analysis = recommender.analyze_health_metrics(health_record)
-        
-        # 生成个性化建议
-        recommendations = recommender.generate_recommendations(analysis)
         
         return jsonify({
-            'analysis': analysis,
-            'recommendations': recommendations
+            'analysis': stored.analysis,
+            'recommendations': stored.recommendations
         }), 200
         
     except Exception as e:
@@ -36,23 +31,21 @@ def get_health_recommendation(current_user, user_id):
 
 @bp.route('/analysis/<int:user_id>', methods=['GET'])
 @token_required
+@response_cache.cached('recommendation.analysis', version=recommendation_engine.digest)
 def get_health_analysis(current_user, user_id):
     """获取用户的健康指标分析"""
     if current_user.id != user_id:
         return jsonify({'error': '无权访问其他用户的健康分析'}), 403
         
     try:
-        # 获取用户最近的健康记录
-        health_record = HealthRecord.query.filter_by(user_id=user_id).order_by(HealthRecord.recorded_at.desc()).first()
+        # 读取预计算的分析结果，用户有新记录时重新计算
+        stored = recommendation_store.get(user_id)
         
-        if not health_record:
+        if stored is None:
             return jsonify({'error': '未找到健康记录'}), 404
-            
-        # 分析健康指标
-        analysis = recommender.analyze_health_metrics(health_record)
         
         return jsonify({
-            'analysis': analysis
+            'analysis': stored.analysis
         }), 200
         
     except Exception as e:
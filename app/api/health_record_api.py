@@ -3,6 +3,7 @@ from flask import Blueprint, request, jsonify
 from app.models.user import HealthRecord
 from app import db
 from app.api.auth_api import token_required
+from app.utils.pagination import paginate_health_records
 
 bp = Blueprint('health_record', __name__, url_prefix='/api/health')
 
@@ -41,9 +42,12 @@ def add_health_record(current_user):
 @token_required
 def get_health_records(current_user):
     try:
-        records = HealthRecord.query.filter_by(user_id=current_user.id).all()
+        records, next_cursor = paginate_health_records(current_user.id, request.args)
         return jsonify({
-            'records': [record.to_dict() for record in records]
+            'records': [record.to_dict() for record in records],
+            'next_cursor': next_cursor
         }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'获取健康记录失败: {str(e)}'}), 500 
\ No newline at end of file
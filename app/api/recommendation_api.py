@@ -1,8 +1,7 @@
 # 健康建议API
 from flask import Blueprint, jsonify
-from app.models.user import HealthRecord
 from app.api.auth_api import token_required
-from app.services.health_recommendation import HealthRecommendationService
+from app.services.recommendation_store import recommendation_store
 
 bp = Blueprint('recommendation', __name__, url_prefix='/api/recommendation')
 
@@ -13,24 +12,15 @@ def get_health_recommendation(current_user, user_id):
         return jsonify({'error': '无权访问其他用户的健康建议'}), 403
         
     try:
-        # 获取用户最近的健康记录
-        health_record = HealthRecord.query.filter_by(user_id=user_id).order_by(HealthRecord.recorded_at.desc()).first()
+        # 读取预计算的建议，用户有新记录时重新计算
+        stored = recommendation_store.get(user_id)
         
-        if not health_record:
+        if stored is None:
             return jsonify({'error': '未找到健康记录'}), 404
-            
-        # 创建健康推荐服务实例
-        recommendation_service = HealthRecommendationService()
-        
-        # 分析健康指标
-        analysis = recommendation_service.analyze_health_metrics(health_record)
-        
-        # 生成个性化建议
-        recommendations = recommendation_service.generate_recommendations(analysis)
         
         return jsonify({
-            'analysis': analysis,
-            'recommendations': recommendations
+            'analysis': stored.analysis,
+            'recommendations': stored.recommendations
         }), 200
         
     except Exception as e:
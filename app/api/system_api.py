@@ -0,0 +1,25 @@
+# 系统状态API
+from flask import Blueprint, jsonify, current_app
+from app.services.model_registry import model_registry
+from app.utils.auth import token_required
+from app.utils.lazy import lazy_service_stats
+from app.utils.principal_cache import principal_cache
+from app.services.password_hashing import password_hasher
+from app.utils.response_cache import response_cache
+from app.services.clinical_ranges import clinical_ranges
+
+bp = Blueprint('system', __name__)
+
+@bp.route('/stats', methods=['GET'])
+@token_required
+def get_stats(current_user):
+    """获取启动耗时、服务初始化耗时、认证缓存、临床范围版本和模型缓存的命中统计"""
+    return jsonify({
+        'startup': current_app.extensions.get('startup_stats'),
+        'services': lazy_service_stats(),
+        'principal_cache': principal_cache.stats(),
+        'password_hasher': password_hasher.stats(),
+        'response_cache': response_cache.stats(),
+        'clinical_ranges': clinical_ranges.stats(),
+        'model_registry': model_registry.stats()
+    }), 200
@@ -0,0 +1,15 @@
+# 训练任务API
+from flask import Blueprint, jsonify
+from app.services.training_jobs import training_queue
+from app.utils.auth import token_required
+
+bp = Blueprint('training_jobs', __name__)
+
+@bp.route('/<job_id>', methods=['GET'])
+@token_required
+def get_training_job(current_user, job_id):
+    """查询训练任务的进度、耗时和指标"""
+    job = training_queue.get(job_id)
+    if not job or job.user_id != current_user.id:
+        return jsonify({'error': '任务不存在'}), 404
+    return jsonify(job.to_dict()), 200
@@ -0,0 +1,98 @@
+# 命令行工具
+import click
+from flask.cli import with_appcontext
+
+
+@click.command('rebuild-rollups')
+@click.option('--user-id', type=int, default=None, help='只重建指定用户的汇总')
+@click.option('--chunk-size', type=int, default=None, help='每批处理的健康记录数')
+@with_appcontext
+def rebuild_rollups_command(user_id, chunk_size):
+    """根据健康记录重建日/周汇总表"""
+    from app.services.health_rollups import rollup_service
+    processed = rollup_service.rebuild(user_id=user_id, chunk_size=chunk_size)
+    click.echo(f'汇总表重建完成，共处理 {processed} 条健康记录')
+
+
+@click.command('precompute-recommendations')
+@click.option('--chunk-size', type=int, default=None, help='每批处理的用户数')
+@with_appcontext
+def precompute_recommendations_command(chunk_size):
+    """为所有用户预计算健康建议，建议每晚通过定时任务执行"""
+    from app.services.recommendation_store import recommendation_store
+    processed = recommendation_store.precompute_all(chunk_size=chunk_size)
+    click.echo(f'健康建议预计算完成，共处理 {processed} 个用户')
+
+
+@click.command('export-disease-model')
+@with_appcontext
+def export_disease_model_command():
+    """把旧版 joblib 疾病预测模型转换为 XGBoost 原生格式"""
+    from app.services.disease_prediction import DiseasePrediction
+    meta = DiseasePrediction().export_legacy_model()
+    click.echo(f'已导出疾病预测模型 {meta["model_file"]}')
+
+
+@click.command('train-disease-model')
+@click.option('--user-id', type=int, required=True, help='用该用户的健康记录训练')
+@click.option('--full', is_flag=True, help='强制全量训练')
+@with_appcontext
+def train_disease_model_command(user_id, full):
+    """按训练水位更新疾病预测模型，可由定时任务执行；是否全量训练由训练计划和漂移检查决定"""
+    from app.services.disease_prediction import DiseasePrediction, user_record_loader
+    success, message, details = DiseasePrediction().update_model(user_record_loader(user_id), scope=user_id, full=full)
+    click.echo(f'[{details["mode"]}] {message}')
+    if not success:
+        raise click.ClickException(message)
+
+
+@click.command('train-cohort')
+@click.option('--model', 'model_type', type=click.Choice(['disease', 'diabetes', 'hypertension']), required=True,
+              help='要训练的模型')
+@click.option('--user-id', 'user_ids', type=int, multiple=True, help='只使用指定用户的记录，可重复指定；默认全部用户')
+@click.option('--chunk-size', type=int, default=None, help='每批从数据库读取的记录数')
+@click.option('--memory-budget-mb', type=int, default=None, help='sklearn 模型特征缓冲区的内存预算（MB）')
+@with_appcontext
+def train_cohort_command(model_type, user_ids, chunk_size, memory_budget_mb):
+    """从数据库分块读取健康记录训练模型，内存占用不随数据量增长"""
+    from app.services.cohort_training import CohortSource
+    from app.services.feature_extraction import DISEASE_SCHEMA, ALGORITHM_SCHEMA
+    from app.services.health_scoring import DISEASE_RULES, ALGORITHM_LABEL_RULES
+    if model_type == 'disease':
+        from app.services.disease_prediction import DiseasePrediction
+        source = CohortSource(DISEASE_SCHEMA, lambda columns: ~DISEASE_RULES.label(columns), user_ids, chunk_size)
+        success, message = DiseasePrediction().train_cohort(source)
+        if not success:
+            raise click.ClickException(message)
+        click.echo(message)
+    else:
+        from app.services.algorithm_analysis import AlgorithmAnalysisService
+        source = CohortSource(ALGORITHM_SCHEMA, ALGORITHM_LABEL_RULES.label, user_ids, chunk_size)
+        budget = memory_budget_mb * 1024 * 1024 if memory_budget_mb else None
+        result = AlgorithmAnalysisService().train_cohort_model(model_type, source, budget)
+        if 'error' in result:
+            raise click.ClickException(result['error'])
+        click.echo(f'{result["message"]}，使用 {result["samples"]} / {result["total_samples"]} 条记录，指标 {result["metrics"]}')
+
+
+@click.command('close-fl-round')
+@with_appcontext
+def close_fl_round_command():
+    """立即关闭当前联邦学习聚合轮次并发布全局模型，可由定时任务执行"""
+    from app.services.federated_rounds import fedavg_aggregator
+    round_ = fedavg_aggregator.current_round(create=False)
+    if round_ is None:
+        click.echo('没有开放的聚合轮次')
+    elif fedavg_aggregator.close_round(round_, 'manual'):
+        click.echo(f'第 {round_.id} 轮已关闭，{round_.clients} 个客户端，全局模型版本 {round_.id}')
+    else:
+        click.echo(f'第 {round_.id} 轮还没有客户端更新，未关闭')
+
+
+def register_commands(app):
+    app.cli.add_command(rebuild_rollups_command)
+    app.cli.add_command(precompute_recommendations_command)
+    app.cli.add_command(export_disease_model_command)
+    app.cli.add_command(train_disease_model_command)
+    app.cli.add_command(train_cohort_command)
+    app.cli.add_command(close_fl_round_command)
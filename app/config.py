@@ -6,6 +6,12 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-key-123'
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-key-123'
     
+    # 启动模式：development 每次启动重建数据库并创建测试用户；
+    # production 只检查数据库结构版本是否与迁移一致，不修改数据
+    STARTUP_MODE = os.environ.get('STARTUP_MODE', 'development')
+    # 启动时预先创建的服务（逗号分隔的服务名，all 表示全部），默认全部在首次使用时创建
+    PRELOAD_SERVICES = os.environ.get('PRELOAD_SERVICES', '')
+    
     # 数据库配置
     SQLALCHEMY_DATABASE_URI = 'sqlite:///health.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
@@ -13,6 +19,17 @@ class Config:
     # JWT配置
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
+    # 认证主体缓存：已验证令牌对应的用户快照在每个工作进程中缓存的秒数和最大条数
+    PRINCIPAL_CACHE_TTL = int(os.environ.get('PRINCIPAL_CACHE_TTL', 60))
+    PRINCIPAL_CACHE_SIZE = 10000
+    
+    # 密码哈希配置：werkzeug 的 method 字符串，如 scrypt:32768:8:1 或 pbkdf2:sha256:600000；
+    # 修改后旧哈希会在用户下次登录成功时自动按新参数重新计算
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    # 在线程池中排队的最大请求数，超过后直接返回503
+    PASSWORD_HASH_QUEUE_SIZE = int(os.environ.get('PASSWORD_HASH_QUEUE_SIZE', 16))
+    PASSWORD_HASH_TIMEOUT = 10
     
     # 邮件配置
     MAIL_SERVER = os.environ.get('MAIL_SERVER', 'smtp.example.com')
@@ -24,6 +41,66 @@ class Config:
     
     # 模型配置
     MODEL_DIR = 'app/models'
+    # 模型文件变化检查间隔（秒），用于热替换
+    MODEL_RELOAD_INTERVAL = float(os.environ.get('MODEL_RELOAD_INTERVAL', 1.0))
+    # XGBoost 推理线程数，单条和小批量预测时1个线程延迟最低
+    XGBOOST_PREDICT_THREADS = int(os.environ.get('XGBOOST_PREDICT_THREADS', 1))
+    # 疾病预测模型增量训练：每次在新增记录上追加的树数、触发更新的最少新增样本数
+    DISEASE_INCREMENTAL_ROUNDS = 10
+    DISEASE_INCREMENTAL_MIN_SAMPLES = 10
+    # 满足任一条件时改为全量重训：树的总数上限、距上次全量训练的天数、
+    # 新增数据特征均值偏移的标准差倍数、需要关注样本比例的变化
+    DISEASE_MAX_TREES = 300
+    DISEASE_FULL_RETRAIN_DAYS = 7
+    DISEASE_DRIFT_THRESHOLD = 0.5
+    DISEASE_LABEL_DRIFT_THRESHOLD = 0.2
+    # 临床正常范围配置文件，修改后各工作进程按 MODEL_RELOAD_INTERVAL 检查并热加载
+    CLINICAL_RANGES_PATH = os.environ.get(
+        'CLINICAL_RANGES_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'clinical_ranges.json')
+    )
+    
+    # 健康记录分页配置
+    RECORDS_PAGE_SIZE = 100
+    RECORDS_MAX_PAGE_SIZE = 1000
+    
+    # 批量导入配置
+    BULK_INSERT_CHUNK_SIZE = 1000
+    BULK_MAX_RECORDS = 50000
+    
+    # 响应缓存配置：lru 为进程内缓存，redis 为共享缓存（需要安装 redis 包）
+    RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', 'lru')
+    RESPONSE_CACHE_REDIS_URL = os.environ.get('RESPONSE_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    RESPONSE_CACHE_SIZE = 1024
+    RESPONSE_CACHE_TTL = 3600
+    
+    # 健康数据汇总配置
+    ROLLUP_REBUILD_CHUNK_SIZE = 5000
+    
+    # 健康建议预计算配置：每批处理的用户数
+    RECOMMENDATION_PRECOMPUTE_CHUNK_SIZE = 1000
+    
+    # 队列训练配置：从数据库分块读取的记录数；sklearn 模型特征缓冲区的内存预算（MB），
+    # 数据超过预算时均匀抽样，XGBoost 模型使用外存训练，不受此限制
+    COHORT_CHUNK_SIZE = int(os.environ.get('COHORT_CHUNK_SIZE', 50000))
+    COHORT_MEMORY_BUDGET_MB = int(os.environ.get('COHORT_MEMORY_BUDGET_MB', 1024))
+    
+    # 联邦学习聚合轮次配置：收到 FL_ROUND_QUORUM 个客户端更新时关闭本轮；
+    # 或到达截止时间且至少有 FL_ROUND_MIN_CLIENTS 个更新时关闭
+    FL_ROUND_QUORUM = int(os.environ.get('FL_ROUND_QUORUM', 10))
+    FL_ROUND_DEADLINE_SECONDS = int(os.environ.get('FL_ROUND_DEADLINE_SECONDS', 3600))
+    FL_ROUND_MIN_CLIENTS = int(os.environ.get('FL_ROUND_MIN_CLIENTS', 1))
+    # 聚合模式：sync 按轮次同步平均；async 缓冲异步聚合，每收到 FL_ASYNC_BUFFER_SIZE 个更新发布一个新版本，
+    # 更新按 (1 + 落后的版本数)^-FL_ASYNC_STALENESS_EXPONENT 降权，落后超过 FL_ASYNC_MAX_STALENESS 个版本的更新拒绝
+    FL_AGGREGATION_MODE = os.environ.get('FL_AGGREGATION_MODE', 'sync')
+    FL_ASYNC_BUFFER_SIZE = int(os.environ.get('FL_ASYNC_BUFFER_SIZE', 10))
+    FL_ASYNC_SERVER_LR = float(os.environ.get('FL_ASYNC_SERVER_LR', 1.0))
+    FL_ASYNC_STALENESS_EXPONENT = float(os.environ.get('FL_ASYNC_STALENESS_EXPONENT', 0.5))
+    FL_ASYNC_MAX_STALENESS = int(os.environ.get('FL_ASYNC_MAX_STALENESS', 20))
+    # 全局模型分发：内存中保留最近多少个版本，用于返回增量
+    FL_MODEL_DELTA_RING = int(os.environ.get('FL_MODEL_DELTA_RING', 16))
+    
+    # 训练任务配置
+    TRAINING_WORKERS = int(os.environ.get('TRAINING_WORKERS', 2))
     
     # 算法配置
     DIABETES_THRESHOLD = 0.5
@@ -1,3 +1,7 @@
 from app.models.user import User, HealthRecord
+from app.models.training_job import TrainingJob
+from app.models.health_rollup import HealthRollup
+from app.models.user_recommendation import UserRecommendation
+from app.models.federated_round import FederatedRound, FederatedUpdate
 
-__all__ = ['User', 'HealthRecord'] 
\ No newline at end of file
+__all__ = ['User', 'HealthRecord', 'TrainingJob', 'HealthRollup', 'UserRecommendation', 'FederatedRound', 'FederatedUpdate'] 
\ No newline at end of file
@@ -0,0 +1,62 @@
+# 联邦学习聚合轮次模型
+from app import db
+from datetime import datetime
+
+class FederatedRound(db.Model):
+    """一轮聚合：只保存加权的参数累加和，不保存客户端上传的原始参数
+
+    sync 模式累加各客户端参数，关闭时做联邦平均；async 模式是异步聚合的缓冲区，
+    累加各客户端相对 base_version 的增量（按过期程度降权），关闭时叠加到 base_version 上。
+    轮次编号即发布的全局模型版本号，关闭后 result 中保存该版本的全局模型参数。
+    """
+    __tablename__ = 'federated_rounds'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    status = db.Column(db.String(16), nullable=False, default='open', index=True)  # open/closed
+    mode = db.Column(db.String(8), nullable=False, default='sync', server_default='sync')  # sync/async
+    base_version = db.Column(db.Integer)  # 开启时的最新全局模型版本，async 模式的增量叠加在它上面
+    quorum = db.Column(db.Integer, nullable=False)  # 收到这么多客户端更新后关闭
+    deadline = db.Column(db.DateTime, nullable=False)  # 到期且至少有一个更新时关闭
+    clients = db.Column(db.Integer, nullable=False, default=0)
+    total_samples = db.Column(db.Float, nullable=False, default=0.0)
+    total_weight = db.Column(db.Float, nullable=False, default=0.0, server_default='0')  # 累加和的权重之和
+    sums = db.Column(db.LargeBinary)  # float64 加权累加向量
+    result = db.Column(db.JSON)
+    close_reason = db.Column(db.String(16))  # quorum/deadline/manual
+    opened_at = db.Column(db.DateTime, default=datetime.utcnow)
+    closed_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<FederatedRound {self.id} {self.status} {self.clients}/{self.quorum}>'
+    
+    def to_dict(self):
+        return {
+            'round': self.id,
+            'status': self.status,
+            'mode': self.mode,
+            'base_version': self.base_version,
+            'clients': self.clients,
+            'quorum': self.quorum,
+            'total_samples': self.total_samples,
+            'total_weight': self.total_weight,
+            'deadline': self.deadline.isoformat() if self.deadline else None,
+            'opened_at': self.opened_at.isoformat() if self.opened_at else None,
+            'closed_at': self.closed_at.isoformat() if self.closed_at else None,
+            'close_reason': self.close_reason
+        }
+
+class FederatedUpdate(db.Model):
+    """客户端在某一轮提交过更新的记录，每个客户端每轮只计入一次"""
+    __tablename__ = 'federated_updates'
+    __table_args__ = (
+        db.UniqueConstraint('round_id', 'user_id', name='uq_federated_updates_round_user'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    round_id = db.Column(db.Integer, db.ForeignKey('federated_rounds.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    samples = db.Column(db.Float, nullable=False)
+    submitted_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<FederatedUpdate {self.round_id} {self.user_id}>'
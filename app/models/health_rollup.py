@@ -0,0 +1,41 @@
+# 健康指标汇总模型
+from app import db
+from datetime import datetime
+
+class HealthRollup(db.Model):
+    """按用户、周期（日/周）和指标汇总的健康数据，随健康记录的增删改增量维护"""
+    __tablename__ = 'health_rollups'
+    __table_args__ = (
+        # 每个 (用户, 周期, 起始日期, 指标) 只有一行，也用于按时间范围查询趋势
+        db.UniqueConstraint('user_id', 'period', 'period_start', 'metric', name='uq_health_rollups_bucket'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    period = db.Column(db.String(8), nullable=False)  # day/week
+    period_start = db.Column(db.Date, nullable=False)  # 周汇总为当周周一
+    metric = db.Column(db.String(32), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    value_sum = db.Column(db.Float, nullable=False, default=0.0)
+    min_value = db.Column(db.Float)
+    max_value = db.Column(db.Float)
+    last_value = db.Column(db.Float)
+    last_recorded_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<HealthRollup {self.user_id} {self.period} {self.period_start} {self.metric}>'
+    
+    @property
+    def mean(self):
+        return self.value_sum / self.count if self.count else None
+    
+    def to_dict(self):
+        return {
+            'date': self.period_start.isoformat(),
+            'count': self.count,
+            'min': self.min_value,
+            'max': self.max_value,
+            'mean': self.mean,
+            'last': self.last_value
+        }
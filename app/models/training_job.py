@@ -0,0 +1,42 @@
+# 训练任务模型
+from app import db
+from datetime import datetime
+
+class TrainingJob(db.Model):
+    __tablename__ = 'training_jobs'
+    
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    kind = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(16), nullable=False, default='queued')  # queued/running/succeeded/failed
+    progress = db.Column(db.Float, nullable=False, default=0.0)  # 0-1
+    message = db.Column(db.String(255))
+    result = db.Column(db.JSON)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<TrainingJob {self.id} {self.kind} {self.status}>'
+    
+    def to_dict(self):
+        queue_seconds = run_seconds = None
+        if self.started_at and self.created_at:
+            queue_seconds = (self.started_at - self.created_at).total_seconds()
+        if self.finished_at and self.started_at:
+            run_seconds = (self.finished_at - self.started_at).total_seconds()
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': self.progress,
+            'message': self.message,
+            'result': self.result,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'timings': {
+                'queue_seconds': queue_seconds,
+                'run_seconds': run_seconds
+            }
+        }
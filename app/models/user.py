@@ -1,5 +1,8 @@
 # 用户模型
 from app import db
+from app.config import Config
+from sqlalchemy.orm import validates
+from app.services.feature_extraction import split_blood_pressure
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 
@@ -9,8 +12,10 @@ class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(64), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128))
+    password_hash = db.Column(db.String(256))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # 健康数据版本，每次写入健康记录加一，用作响应缓存的键
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # 健康数据关联
     health_records = db.relationship('HealthRecord', backref='user', lazy=True)
@@ -21,11 +26,11 @@ class User(db.Model):
         
     @password.setter
     def password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.set_password(password)
         
     def set_password(self, password):
-        """设置密码的辅助方法"""
-        self.password_hash = generate_password_hash(password)
+        """设置密码的辅助方法，哈希算法和参数由 PASSWORD_HASH_METHOD 配置"""
+        self.password_hash = generate_password_hash(password, method=Config.PASSWORD_HASH_METHOD)
         
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
@@ -43,11 +48,18 @@ class User(db.Model):
 
 class HealthRecord(db.Model):
     __tablename__ = 'health_records'
+    __table_args__ = (
+        # 按用户+时间查询和游标分页使用的复合索引，id 用于同一时间点的稳定排序
+        db.Index('ix_health_records_user_id_recorded_at', 'user_id', 'recorded_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     heart_rate = db.Column(db.Integer)
     blood_pressure = db.Column(db.String(20))
+    # 由 blood_pressure 解析得到，写入时自动填充，便于按血压值查询
+    systolic_bp = db.Column(db.Integer, index=True)
+    diastolic_bp = db.Column(db.Integer, index=True)
     blood_sugar = db.Column(db.Float)
     weight = db.Column(db.Float)
     sleep_hours = db.Column(db.Float)
@@ -56,6 +68,17 @@ class HealthRecord(db.Model):
     
     def __repr__(self):
         return f'<HealthRecord {self.id}>'
+    
+    @validates('blood_pressure')
+    def _sync_blood_pressure(self, key, value):
+        """写入血压字符串时同步收缩压/舒张压列"""
+        self.systolic_bp, self.diastolic_bp = split_blood_pressure(value)
+        return value
+    
+    @classmethod
+    def latest_for_user(cls, user_id):
+        """获取用户最近的一条健康记录（走 user_id+recorded_at 索引）"""
+        return cls.query.filter_by(user_id=user_id).order_by(cls.recorded_at.desc(), cls.id.desc()).first()
         
     # 将健康记录转换为字典
     def to_dict(self):
@@ -64,6 +87,8 @@ class HealthRecord(db.Model):
             'user_id': self.user_id,
             'heart_rate': self.heart_rate,
             'blood_pressure': self.blood_pressure,
+            'systolic_bp': self.systolic_bp,
+            'diastolic_bp': self.diastolic_bp,
             'blood_sugar': self.blood_sugar,
             'weight': self.weight,
             'sleep_hours': self.sleep_hours,
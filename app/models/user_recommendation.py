@@ -0,0 +1,29 @@
+# 预计算健康建议模型
+from app import db
+from datetime import datetime
+
+class UserRecommendation(db.Model):
+    """每个用户基于最新健康记录预先计算的分析结果和建议
+
+    data_version 与用户数据版本一致、rules_digest 与当前临床范围摘要一致时有效。
+    """
+    __tablename__ = 'user_recommendations'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    data_version = db.Column(db.Integer, nullable=False, default=0)
+    rules_digest = db.Column(db.String(16))  # 计算时所用临床范围的摘要
+    record_id = db.Column(db.Integer)  # 生成建议所用的健康记录，没有记录时为空
+    analysis = db.Column(db.JSON)
+    recommendations = db.Column(db.JSON, nullable=False)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<UserRecommendation {self.user_id} v{self.data_version}>'
+    
+    def to_dict(self):
+        return {
+            'analysis': self.analysis,
+            'recommendations': self.recommendations,
+            'record_id': self.record_id,
+            'computed_at': self.computed_at.isoformat() if self.computed_at else None
+        }
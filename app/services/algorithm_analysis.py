@@ -1,27 +1,53 @@
 # 算法分析服务
-import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
 from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
-import joblib
 import os
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional
 import logging
+from app.config import Config
+from app.services.model_registry import model_registry
+from app.services.feature_extraction import extract_features, ALGORITHM_SCHEMA
+from app.services.health_scoring import ALGORITHM_LABEL_RULES, ALGORITHM_SCORE_RULES
+from app.services.tree_ensemble import CompiledEnsemble
+
+# 糖尿病和高血压模型编译后的融合推理模型
+ENSEMBLE_FILE = 'algorithm_ensemble.pkl'
+
+# 可以用全体用户数据训练的模型：模型类型 -> (模型文件, 未训练的模型)
+COHORT_MODELS = {
+    'diabetes': ('diabetes_model.pkl', lambda: GradientBoostingClassifier(n_estimators=100, random_state=42)),
+    'hypertension': ('hypertension_model.pkl', lambda: RandomForestClassifier(n_estimators=100, random_state=42))
+}
 
 class AlgorithmAnalysisService:
     def __init__(self):
         self.logger = logging.getLogger(__name__)
-        self.scaler = StandardScaler()
         self.models_dir = 'app/models'
         self._ensure_models_dir()
+        self._default_scaler = StandardScaler()
+        # 由旧版模型文件即时编译的融合模型缓存 (糖尿病模型, 高血压模型, 标准化器, 融合模型)
+        self._compiled = None
+        
+    @property
+    def diabetes_model(self):
+        return self._load_model('diabetes_model.pkl')
         
-        # 加载或初始化模型
-        self.diabetes_model = self._load_model('diabetes_model.pkl')
-        self.hypertension_model = self._load_model('hypertension_model.pkl')
-        self.health_assessment_model = self._load_model('health_assessment_model.pkl')
+    @property
+    def hypertension_model(self):
+        return self._load_model('hypertension_model.pkl')
+        
+    @property
+    def health_assessment_model(self):
+        return self._load_model('health_assessment_model.pkl')
+        
+    @property
+    def scaler(self):
+        scaler = self._load_model('algorithm_scaler.pkl')
+        return self._default_scaler if scaler is None else scaler
         
     def _ensure_models_dir(self):
         """确保模型目录存在"""
@@ -29,76 +55,64 @@ class AlgorithmAnalysisService:
             os.makedirs(self.models_dir)
             
     def _load_model(self, model_name: str):
-        """加载模型"""
-        model_path = os.path.join(self.models_dir, model_name)
-        if os.path.exists(model_path):
-            return joblib.load(model_path)
-        return None
+        """从模型注册表加载模型，不存在时返回None"""
+        return model_registry.get(os.path.join(self.models_dir, model_name))
+        
+    def _publish_models(self, models: Dict) -> None:
+        """原子地发布一组模型到模型注册表，两个模型都已训练时一起发布编译后的融合模型"""
+        models = dict(models)
+        diabetes_model = models['diabetes_model.pkl'] if 'diabetes_model.pkl' in models else self.diabetes_model
+        hypertension_model = models['hypertension_model.pkl'] if 'hypertension_model.pkl' in models else self.hypertension_model
+        if diabetes_model is not None and hypertension_model is not None:
+            models[ENSEMBLE_FILE] = self._compile_ensemble(
+                diabetes_model, hypertension_model, models['algorithm_scaler.pkl']
+            )
+        model_registry.publish_many({
+            os.path.join(self.models_dir, model_name): model
+            for model_name, model in models.items()
+        })
+        
+    @staticmethod
+    def _compile_ensemble(diabetes_model, hypertension_model, scaler) -> CompiledEnsemble:
+        """把两个模型的树展平为一组节点数组"""
+        return CompiledEnsemble.compile(
+            {'diabetes': diabetes_model, 'hypertension': hypertension_model}, scaler
+        )
+        
+    def _ensemble(self) -> Optional[CompiledEnsemble]:
+        """获取融合模型，没有时由已有的模型文件编译；模型未训练时返回None"""
+        ensemble = self._load_model(ENSEMBLE_FILE)
+        if ensemble is not None:
+            return ensemble
+        diabetes_model, hypertension_model, scaler = model_registry.get_many([
+            os.path.join(self.models_dir, name)
+            for name in ('diabetes_model.pkl', 'hypertension_model.pkl', 'algorithm_scaler.pkl')
+        ])
+        if diabetes_model is None or hypertension_model is None or scaler is None:
+            return None
+        compiled = self._compiled
+        sources = (diabetes_model, hypertension_model, scaler)
+        if compiled is None or any(a is not b for a, b in zip(compiled, sources)):
+            # 按对象身份比较，模型文件被替换后重新编译
+            compiled = self._compiled = (
+                diabetes_model, hypertension_model, scaler,
+                self._compile_ensemble(diabetes_model, hypertension_model, scaler)
+            )
+        return compiled[3]
         
     def prepare_training_data(self, health_records: List[Dict]) -> Tuple[np.ndarray, np.ndarray]:
         """准备训练数据"""
         try:
-            # 转换为DataFrame
-            df = pd.DataFrame(health_records)
-            
-            # 提取特征
-            features = []
-            for record in health_records:
-                feature = []
-                # 心率
-                feature.append(record.get('heart_rate', 0))
-                # 血压
-                if 'blood_pressure' in record:
-                    systolic, diastolic = map(float, record['blood_pressure'].split('/'))
-                    feature.extend([systolic, diastolic])
-                else:
-                    feature.extend([0, 0])
-                # 血糖
-                feature.append(record.get('blood_sugar', 0))
-                # 体重
-                feature.append(record.get('weight', 0))
-                # 睡眠时长
-                feature.append(record.get('sleep_hours', 0))
-                # 情绪评分
-                feature.append(record.get('mood_score', 0))
-                features.append(feature)
-                
-            X = np.array(features)
-            y = np.array([self._calculate_health_label(record) for record in health_records])
+            # 按列提取特征，丢弃无法解析的记录
+            X, columns = extract_features(health_records, ALGORITHM_SCHEMA)
+            valid = columns.valid
+            y = ALGORITHM_LABEL_RULES.label(columns).astype(int)
             
-            return X, y
+            return X[valid], y[valid]
         except Exception as e:
             self.logger.error(f"准备训练数据失败: {str(e)}")
             return np.array([]), np.array([])
             
-    def _calculate_health_label(self, record: Dict) -> int:
-        """计算健康标签"""
-        score = 0
-        count = 0
-        
-        # 心率评分
-        if 'heart_rate' in record:
-            heart_rate = record['heart_rate']
-            if 60 <= heart_rate <= 100:
-                score += 1
-            count += 1
-            
-        # 血压评分
-        if 'blood_pressure' in record:
-            systolic, diastolic = map(float, record['blood_pressure'].split('/'))
-            if 90 <= systolic <= 140 and 60 <= diastolic <= 90:
-                score += 1
-            count += 1
-            
-        # 血糖评分
-        if 'blood_sugar' in record:
-            blood_sugar = record['blood_sugar']
-            if 3.9 <= blood_sugar <= 6.1:
-                score += 1
-            count += 1
-            
-        return 1 if score / count >= 0.7 else 0
-        
     def train_diabetes_model(self, health_records: List[Dict]) -> Dict:
         """训练糖尿病预测模型"""
         try:
@@ -107,7 +121,8 @@ class AlgorithmAnalysisService:
                 return {'error': '没有足够的训练数据'}
                 
             # 数据标准化
-            X = self.scaler.fit_transform(X)
+            scaler = StandardScaler()
+            X = scaler.fit_transform(X)
             
             # 划分训练集和测试集
             X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
@@ -117,17 +132,10 @@ class AlgorithmAnalysisService:
             model.fit(X_train, y_train)
             
             # 评估模型
-            y_pred = model.predict(X_test)
-            metrics = {
-                'accuracy': accuracy_score(y_test, y_pred),
-                'precision': precision_score(y_test, y_pred),
-                'recall': recall_score(y_test, y_pred),
-                'f1': f1_score(y_test, y_pred)
-            }
+            metrics = self._evaluate(model, X_test, y_test)
             
-            # 保存模型
-            self.diabetes_model = model
-            joblib.dump(model, os.path.join(self.models_dir, 'diabetes_model.pkl'))
+            # 发布模型和标准化器
+            self._publish_models({'diabetes_model.pkl': model, 'algorithm_scaler.pkl': scaler})
             
             return {
                 'message': '模型训练成功',
@@ -137,6 +145,17 @@ class AlgorithmAnalysisService:
             self.logger.error(f"训练糖尿病模型失败: {str(e)}")
             return {'error': str(e)}
             
+    @staticmethod
+    def _evaluate(model, X_test: np.ndarray, y_test: np.ndarray) -> Dict:
+        """在测试集上评估模型"""
+        y_pred = model.predict(X_test)
+        return {
+            'accuracy': accuracy_score(y_test, y_pred),
+            'precision': precision_score(y_test, y_pred),
+            'recall': recall_score(y_test, y_pred),
+            'f1': f1_score(y_test, y_pred)
+        }
+        
     def train_hypertension_model(self, health_records: List[Dict]) -> Dict:
         """训练高血压预测模型"""
         try:
@@ -145,7 +164,8 @@ class AlgorithmAnalysisService:
                 return {'error': '没有足够的训练数据'}
                 
             # 数据标准化
-            X = self.scaler.fit_transform(X)
+            scaler = StandardScaler()
+            X = scaler.fit_transform(X)
             
             # 划分训练集和测试集
             X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
@@ -155,17 +175,10 @@ class AlgorithmAnalysisService:
             model.fit(X_train, y_train)
             
             # 评估模型
-            y_pred = model.predict(X_test)
-            metrics = {
-                'accuracy': accuracy_score(y_test, y_pred),
-                'precision': precision_score(y_test, y_pred),
-                'recall': recall_score(y_test, y_pred),
-                'f1': f1_score(y_test, y_pred)
-            }
+            metrics = self._evaluate(model, X_test, y_test)
             
-            # 保存模型
-            self.hypertension_model = model
-            joblib.dump(model, os.path.join(self.models_dir, 'hypertension_model.pkl'))
+            # 发布模型和标准化器
+            self._publish_models({'hypertension_model.pkl': model, 'algorithm_scaler.pkl': scaler})
             
             return {
                 'message': '模型训练成功',
@@ -175,48 +188,80 @@ class AlgorithmAnalysisService:
             self.logger.error(f"训练高血压模型失败: {str(e)}")
             return {'error': str(e)}
             
+    def train_cohort_model(self, model_type: str, source, memory_budget: Optional[int] = None) -> Dict:
+        """用数据库中的全体（或指定用户的）健康记录训练模型，特征矩阵大小受内存预算限制
+        
+        source 为 CohortSource，逐块写入预分配的 float32 缓冲区，数据超过容量时均匀抽样；
+        标准化在缓冲区上原地进行。划分训练集和测试集会再复制一份，所以缓冲区只占预算的一半。
+        """
+        from app.services.cohort_training import fill_buffer, standardize
+        if model_type not in COHORT_MODELS:
+            return {'error': f'不支持的模型类型: {model_type}'}
+        model_file, build_model = COHORT_MODELS[model_type]
+        try:
+            budget = memory_budget or Config.COHORT_MEMORY_BUDGET_MB * 1024 * 1024
+            X, y, total = fill_buffer(source, budget // 2)
+            
+            scaler = StandardScaler().fit(X)
+            X = standardize(X, scaler)
+            X_train, X_test, y_train, y_test = train_test_split(X, y.astype(int), test_size=0.2, random_state=42)
+            del X
+            
+            model = build_model()
+            model.fit(X_train, y_train)
+            metrics = self._evaluate(model, X_test, y_test)
+            self._publish_models({model_file: model, 'algorithm_scaler.pkl': scaler})
+            
+            return {
+                'message': '模型训练成功',
+                'metrics': metrics,
+                'samples': len(X_train) + len(X_test),
+                'total_samples': total
+            }
+        except Exception as e:
+            self.logger.error(f"队列训练{model_type}模型失败: {str(e)}")
+            return {'error': str(e)}
+            
     def predict_disease_risk(self, health_record: Dict) -> Dict:
         """预测疾病风险"""
+        return self.predict_disease_risk_batch([health_record])[0]
+        
+    def predict_disease_risk_batch(self, health_records: List[Dict]) -> List[Dict]:
+        """批量预测疾病风险：两个模型在一次向量化遍历中完成，格式错误的记录在对应位置返回错误"""
+        n = len(health_records)
         try:
-            if self.diabetes_model is None or self.hypertension_model is None:
-                return {'error': '模型未训练'}
+            ensemble = self._ensemble()
+            if ensemble is None:
+                return [{'error': '模型未训练'} for _ in range(n)]
                 
             # 准备特征
-            features = []
-            # 心率
-            features.append(health_record.get('heart_rate', 0))
-            # 血压
-            if 'blood_pressure' in health_record:
-                systolic, diastolic = map(float, health_record['blood_pressure'].split('/'))
-                features.extend([systolic, diastolic])
-            else:
-                features.extend([0, 0])
-            # 血糖
-            features.append(health_record.get('blood_sugar', 0))
-            # 体重
-            features.append(health_record.get('weight', 0))
-            # 睡眠时长
-            features.append(health_record.get('sleep_hours', 0))
-            # 情绪评分
-            features.append(health_record.get('mood_score', 0))
-            
-            X = np.array([features])
-            X = self.scaler.transform(X)
+            X, columns = extract_features(health_records, ALGORITHM_SCHEMA)
+            valid = columns.valid
             
             # 预测
-            diabetes_prob = self.diabetes_model.predict_proba(X)[0][1]
-            hypertension_prob = self.hypertension_model.predict_proba(X)[0][1]
-            
-            return {
-                'diabetes_risk': float(diabetes_prob),
-                'hypertension_risk': float(hypertension_prob),
-                'recommendations': self._generate_risk_recommendations(
-                    diabetes_prob, hypertension_prob
-                )
-            }
+            diabetes_prob = np.zeros(n)
+            hypertension_prob = np.zeros(n)
+            if valid.any():
+                probabilities = ensemble.predict_proba(X[valid])
+                diabetes_prob[valid] = probabilities['diabetes']
+                hypertension_prob[valid] = probabilities['hypertension']
         except Exception as e:
             self.logger.error(f"预测疾病风险失败: {str(e)}")
-            return {'error': str(e)}
+            return [{'error': str(e)} for _ in range(n)]
+            
+        results = []
+        for i in range(n):
+            if i in columns.errors:
+                results.append({'error': columns.errors[i]})
+            else:
+                results.append({
+                    'diabetes_risk': float(diabetes_prob[i]),
+                    'hypertension_risk': float(hypertension_prob[i]),
+                    'recommendations': self._generate_risk_recommendations(
+                        diabetes_prob[i], hypertension_prob[i]
+                    )
+                })
+        return results
             
     def _generate_risk_recommendations(self, 
                                      diabetes_prob: float,
@@ -245,11 +290,8 @@ class AlgorithmAnalysisService:
     def assess_health_status(self, health_records: List[Dict]) -> Dict:
         """评估健康状态"""
         try:
-            # 计算健康评分
-            health_scores = []
-            for record in health_records:
-                score = self._calculate_health_score(record)
-                health_scores.append(score)
+            # 整批计算健康评分
+            health_scores = ALGORITHM_SCORE_RULES.score(health_records)
                 
             # 计算趋势
             if len(health_scores) > 1:
@@ -271,48 +313,6 @@ class AlgorithmAnalysisService:
             self.logger.error(f"评估健康状态失败: {str(e)}")
             return {'error': str(e)}
             
-    def _calculate_health_score(self, record: Dict) -> float:
-        """计算健康评分"""
-        score = 0
-        count = 0
-        
-        # 心率评分
-        if 'heart_rate' in record:
-            heart_rate = record['heart_rate']
-            if 60 <= heart_rate <= 100:
-                score += 1
-            count += 1
-            
-        # 血压评分
-        if 'blood_pressure' in record:
-            systolic, diastolic = map(float, record['blood_pressure'].split('/'))
-            if 90 <= systolic <= 140 and 60 <= diastolic <= 90:
-                score += 1
-            count += 1
-            
-        # 血糖评分
-        if 'blood_sugar' in record:
-            blood_sugar = record['blood_sugar']
-            if 3.9 <= blood_sugar <= 6.1:
-                score += 1
-            count += 1
-            
-        # 睡眠评分
-        if 'sleep_hours' in record:
-            sleep_hours = record['sleep_hours']
-            if 7 <= sleep_hours <= 9:
-                score += 1
-            count += 1
-            
-        # 情绪评分
-        if 'mood_score' in record:
-            mood_score = record['mood_score']
-            if mood_score >= 6:
-                score += 1
-            count += 1
-            
-        return score / count if count > 0 else 0
-        
     def _generate_health_recommendations(self, 
                                        average_score: float,
                                        trend: float) -> List[str]:
@@ -0,0 +1,191 @@
+# 临床正常范围配置
+import hashlib
+import json
+import logging
+import os
+import time
+import numpy as np
+from app.config import Config
+from app.services.model_registry import model_registry
+from app.services.feature_extraction import NUMERIC_FIELDS, BP_FIELDS
+
+# 范围可以引用的指标列
+RANGE_COLUMNS = NUMERIC_FIELDS + BP_FIELDS + ('bmi',)
+# 各服务引用的范围名，配置文件中缺少任何一个都视为无效
+REQUIRED_RANGES = (
+    'heart_rate', 'blood_pressure', 'blood_sugar', 'sleep_hours', 'weight', 'bmi',
+    'mood_score', 'mood_score_good', 'mood_score_federated', 'mood_score_alert'
+)
+
+
+def _readonly(values):
+    array = np.array(values, dtype=np.float64)
+    array.setflags(write=False)
+    return array
+
+
+class CompiledRange:
+    """一个命名范围编译成的只读数组：列名、各列下限和上限"""
+
+    def __init__(self, name, bounds):
+        self.name = name
+        self.columns = tuple(bounds)
+        # null 表示该侧不设限
+        self.lows = _readonly([-np.inf if low is None else low for low, _ in bounds.values()])
+        self.highs = _readonly([np.inf if high is None else high for _, high in bounds.values()])
+        canonical = json.dumps([name, sorted(bounds.items())], sort_keys=True)
+        self.digest = hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+    def masks(self, columns):
+        """返回 (缺失, 偏低, 偏高) 三个布尔数组，任一列缺失/低于下限/高于上限即为真"""
+        values = np.column_stack([columns[column] for column in self.columns])
+        with np.errstate(invalid='ignore'):
+            return (
+                np.isnan(values).any(axis=1),
+                (values < self.lows).any(axis=1),
+                (values > self.highs).any(axis=1)
+            )
+
+    def to_dict(self):
+        return {
+            column: [None if np.isinf(low) else float(low), None if np.isinf(high) else float(high)]
+            for column, low, high in zip(self.columns, self.lows, self.highs)
+        }
+
+    def __repr__(self):
+        return f'<CompiledRange {self.name} {self.to_dict()}>'
+
+
+class ClinicalRanges:
+    """某一版本的全部临床范围，加载后不再修改，可以在线程间共享"""
+
+    def __init__(self, version, ranges):
+        self.version = version
+        self._ranges = dict(ranges)
+
+    def __getitem__(self, name):
+        try:
+            return self._ranges[name]
+        except KeyError:
+            raise KeyError(f'临床范围配置中缺少 {name}')
+
+    def __contains__(self, name):
+        return name in self._ranges
+
+    def digest(self, names=None):
+        """指定范围的联合摘要，只有这些范围改变时摘要才变化；names 为空时包含全部范围"""
+        names = sorted(self._ranges if names is None else set(names))
+        return hashlib.sha256(''.join(self[name].digest for name in names).encode()).hexdigest()[:16]
+
+    def to_dict(self):
+        return {
+            'version': self.version,
+            'ranges': {name: compiled.to_dict() for name, compiled in self._ranges.items()}
+        }
+
+
+def parse_clinical_ranges(data):
+    """校验并编译范围配置，格式错误时抛出 ValueError"""
+    if not isinstance(data, dict) or not isinstance(data.get('ranges'), dict):
+        raise ValueError('临床范围配置必须包含 ranges 对象')
+    ranges = {}
+    for name, bounds in data['ranges'].items():
+        if not isinstance(bounds, dict) or not bounds:
+            raise ValueError(f'范围 {name} 必须是非空的 {{列名: [下限, 上限]}} 对象')
+        parsed = {}
+        for column, pair in bounds.items():
+            if column not in RANGE_COLUMNS:
+                raise ValueError(f'范围 {name} 引用了未知的指标列 {column}')
+            if not isinstance(pair, (list, tuple)) or len(pair) != 2:
+                raise ValueError(f'范围 {name}.{column} 必须是 [下限, 上限]')
+            low, high = pair
+            for bound in (low, high):
+                if bound is not None and (isinstance(bound, bool) or not isinstance(bound, (int, float))):
+                    raise ValueError(f'范围 {name}.{column} 的上下限必须是数值或 null')
+            if low is not None and high is not None and low > high:
+                raise ValueError(f'范围 {name}.{column} 的下限大于上限')
+            parsed[column] = (low, high)
+        ranges[name] = CompiledRange(name, parsed)
+    missing = [name for name in REQUIRED_RANGES if name not in ranges]
+    if missing:
+        raise ValueError(f'临床范围配置缺少范围: {", ".join(missing)}')
+    return ClinicalRanges(data.get('version'), ranges)
+
+
+def load_clinical_ranges(path):
+    with open(path, encoding='utf-8') as f:
+        return parse_clinical_ranges(json.load(f))
+
+
+class ClinicalRangeConfig:
+    """通过模型注册表加载范围配置文件，文件被替换后自动热加载
+
+    新文件格式错误时记录日志并继续使用上一个有效版本。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.logger = logging.getLogger(__name__)
+        self._last_good = None
+        self._last_error = None
+        # 加载失败的文件签名和检查时间，文件未变化时不再重新解析
+        self._failed = None
+        self._errors = 0
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def _failed_unchanged(self):
+        """上次加载失败的文件仍未变化时返回 True，最多每 MODEL_RELOAD_INTERVAL 秒检查一次文件"""
+        failed = self._failed
+        if failed is None or self._last_good is None:
+            return False
+        signature, checked_at = failed
+        if time.monotonic() - checked_at < model_registry.check_interval:
+            return True
+        if self._signature() == signature:
+            self._failed = (signature, time.monotonic())
+            return True
+        return False
+
+    def current(self):
+        """返回当前生效的 ClinicalRanges；一批计算应只调用一次，保证使用同一版本"""
+        if self._failed_unchanged():
+            return self._last_good
+        signature = self._signature()
+        try:
+            ranges = model_registry.get(self.path, loader=load_clinical_ranges)
+        except (OSError, ValueError) as e:
+            if self._last_good is None:
+                raise RuntimeError(f'无法加载临床范围配置 {self.path}: {e}')
+            self._errors += 1
+            # 记住失败的文件签名，文件变化之前不再重试；同样的错误只记录一次
+            self._failed = (signature, time.monotonic())
+            if str(e) != self._last_error:
+                self._last_error = str(e)
+                self.logger.error(f'临床范围配置加载失败，继续使用版本 {self._last_good.version}: {e}')
+            return self._last_good
+        if ranges is None:
+            if self._last_good is None:
+                raise RuntimeError(f'未找到临床范围配置文件 {self.path}')
+            return self._last_good
+        self._last_good = ranges
+        self._last_error = None
+        self._failed = None
+        return ranges
+
+    def stats(self):
+        ranges = self._last_good
+        return {
+            'path': self.path,
+            'version': ranges.version if ranges else None,
+            'digest': ranges.digest() if ranges else None,
+            'load_errors': self._errors
+        }
+
+
+clinical_ranges = ClinicalRangeConfig(Config.CLINICAL_RANGES_PATH)
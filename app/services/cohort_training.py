@@ -0,0 +1,137 @@
+# 全体用户（队列）数据的分块训练
+import numpy as np
+import sqlalchemy as sa
+from app import db
+from app.config import Config
+from app.models.user import HealthRecord
+from app.services.feature_extraction import extract_features
+
+# 训练需要读取的列，只查询这些列，不构造ORM对象
+COHORT_COLUMNS = (
+    'id', 'heart_rate', 'blood_pressure', 'systolic_bp', 'diastolic_bp',
+    'blood_sugar', 'weight', 'sleep_hours', 'mood_score'
+)
+
+
+class CohortSource:
+    """按主键分块从数据库读取健康记录，每块直接转换为 float32 特征矩阵和标签
+
+    可以重复迭代，每次迭代重新按主键顺序查询，内存中只保留当前一块。
+    labeler 接收 HealthColumns，返回与行对齐的标签数组。
+    """
+
+    def __init__(self, schema, labeler, user_ids=None, chunk_size=None):
+        self.schema = schema
+        self.labeler = labeler
+        self.user_ids = list(user_ids) if user_ids else None
+        self.chunk_size = chunk_size or Config.COHORT_CHUNK_SIZE
+        # 最近一次完整迭代的统计
+        self.rows = 0
+        self.positives = 0.0
+        self.last_id = None
+
+    def _query(self, last_id):
+        statement = sa.select(*(getattr(HealthRecord, name) for name in COHORT_COLUMNS)).where(HealthRecord.id > last_id)
+        if self.user_ids is not None:
+            statement = statement.where(HealthRecord.user_id.in_(self.user_ids))
+        return statement.order_by(HealthRecord.id).limit(self.chunk_size)
+
+    def __iter__(self):
+        rows, positives, last_id = 0, 0.0, 0
+        while True:
+            result = db.session.execute(self._query(last_id)).all()
+            if not result:
+                break
+            last_id = result[-1].id
+            # 转置为列字典，按列提取特征
+            columns = dict(zip(COHORT_COLUMNS, zip(*result)))
+            del result
+            X, columns = extract_features(columns, self.schema)
+            valid = columns.valid
+            y = np.asarray(self.labeler(columns), dtype=np.float32)[valid]
+            X = X[valid]
+            rows += len(X)
+            positives += float(y.sum())
+            if len(X):
+                yield X, y
+        self.rows = rows
+        self.positives = positives
+        self.last_id = last_id or None
+
+
+def fit_scaler(source):
+    """逐块 partial_fit，得到与整体 fit 相同的 StandardScaler"""
+    from sklearn.preprocessing import StandardScaler
+    scaler = StandardScaler()
+    for X, _ in source:
+        scaler.partial_fit(X)
+    if source.rows == 0:
+        raise ValueError('没有可用的训练数据')
+    return scaler
+
+
+def standardize(X, scaler):
+    """与 StandardScaler.transform 相同，但在 float32 数组上原地计算，不额外复制"""
+    X -= scaler.mean_
+    X /= scaler.scale_
+    return X
+
+
+def make_data_iter(source, scaler, cache_prefix):
+    """把数据源包装成 XGBoost 外存数据迭代器，每块标准化后交给 XGBoost 量化并写入缓存页"""
+    import xgboost as xgb
+
+    class CohortDataIter(xgb.DataIter):
+        def __init__(self):
+            self._chunks = None
+            super().__init__(cache_prefix=cache_prefix)
+
+        def next(self, input_data):
+            if self._chunks is None:
+                self._chunks = iter(source)
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            X, y = chunk
+            input_data(data=standardize(X, scaler), label=y)
+            return 1
+
+        def reset(self):
+            self._chunks = None
+
+    return CohortDataIter()
+
+
+def fill_buffer(source, budget_bytes, seed=42):
+    """把数据源逐块写入预分配的 float32 缓冲区，返回 (X, y, 总行数)
+
+    缓冲区行数由内存预算决定，数据超过容量时按蓄水池抽样均匀保留，
+    内存占用不随总数据量增长。
+    """
+    width = len(source.schema)
+    capacity = max(1, int(budget_bytes // ((width + 1) * np.dtype(np.float32).itemsize)))
+    X_buffer, y_buffer = None, None
+    rng = np.random.default_rng(seed)
+    filled = seen = 0
+    for X, y in source:
+        if X_buffer is None:
+            X_buffer = np.empty((capacity, width), dtype=np.float32)
+            y_buffer = np.empty(capacity, dtype=np.float32)
+        # 缓冲区未满的部分直接写入
+        take = min(capacity - filled, len(X))
+        X_buffer[filled:filled + take] = X[:take]
+        y_buffer[filled:filled + take] = y[:take]
+        filled += take
+        # 其余行第 t 行以 capacity/t 的概率替换随机位置（Algorithm R），同一位置后写入的生效
+        if take < len(X):
+            positions = rng.integers(0, seen + np.arange(take, len(X)) + 1)
+            keep = positions < capacity
+            rows = np.flatnonzero(keep) + take
+            X_buffer[positions[keep]] = X[rows]
+            y_buffer[positions[keep]] = y[rows]
+        seen += len(X)
+    if X_buffer is None:
+        raise ValueError('没有可用的训练数据')
+    if filled < capacity:
+        return X_buffer[:filled].copy(), y_buffer[:filled].copy(), seen
+    return X_buffer, y_buffer, seen
@@ -1,16 +1,14 @@
 # 数据收集服务
 import pandas as pd
 import numpy as np
-from scipy import stats
 from sklearn.preprocessing import StandardScaler, MinMaxScaler
 from sklearn.ensemble import IsolationForest
-from snownlp import SnowNLP
-import jieba
 import json
 from datetime import datetime
 import requests
 from typing import Dict, List, Union, Optional
 import logging
+from app.services.feature_extraction import split_blood_pressure
 
 class DataCollectionService:
     def __init__(self):
@@ -110,7 +108,8 @@ class DataCollectionService:
     def analyze_sentiment(self, text: str) -> Dict:
         """情感分析"""
         try:
-            # 使用SnowNLP进行情感分析
+            # 使用SnowNLP进行情感分析，导入较慢，只在需要时加载
+            from snownlp import SnowNLP
             s = SnowNLP(text)
             sentiment_score = s.sentiments
             
@@ -137,9 +136,11 @@ class DataCollectionService:
             if isinstance(record.get("recorded_at"), str):
                 record["recorded_at"] = datetime.fromisoformat(record["recorded_at"])
             
-            # 解析血压
-            if isinstance(record.get("blood_pressure"), str):
-                systolic, diastolic = map(float, record["blood_pressure"].split("/"))
+            # 解析血压，已有收缩压/舒张压时不再重复解析
+            if record.get("systolic_bp") is None and isinstance(record.get("blood_pressure"), str):
+                systolic, diastolic = split_blood_pressure(record["blood_pressure"])
+                if systolic is None:
+                    raise ValueError(f"血压格式错误: {record['blood_pressure']}")
                 record["systolic_bp"] = systolic
                 record["diastolic_bp"] = diastolic
             
@@ -1,13 +1,63 @@
 import xgboost as xgb
 import numpy as np
 from sklearn.preprocessing import StandardScaler
-import joblib
+import logging
 import os
-from datetime import datetime
+import tempfile
+import warnings
+from datetime import datetime, timedelta
+from app.config import Config
+from app.services.model_registry import model_registry
+from app.services.xgb_artifacts import BoosterModel, load_booster_model, save_booster_model
+from app.services.feature_extraction import extract_features, DISEASE_SCHEMA
+from app.services.health_scoring import DISEASE_RULES
+from app.services.clinical_ranges import clinical_ranges
+from app.models.user import HealthRecord
+
+# 训练方式
+FULL = 'full'                # 全量重训
+INCREMENTAL = 'incremental'  # 在当前模型上用新增记录继续提升
+SKIPPED = 'skipped'          # 新增记录不足，模型保持不变
+
+
+def _max_record_id(health_records):
+    """记录中最大的ID（ORM对象或带 id 的字典），没有ID时返回 None"""
+    ids = [
+        record.get('id') if isinstance(record, dict) else getattr(record, 'id', None)
+        for record in health_records
+    ]
+    ids = [i for i in ids if i is not None]
+    return max(ids) if ids else None
+
+
+def user_record_loader(user_id):
+    """update_model 使用的记录加载函数：按ID顺序返回用户在 after_id 之后的健康记录"""
+    def load(after_id=None):
+        query = HealthRecord.query.filter_by(user_id=user_id)
+        if after_id is not None:
+            query = query.filter(HealthRecord.id > after_id)
+        return query.order_by(HealthRecord.id).all()
+    return load
 
 class DiseasePrediction:
     def __init__(self):
-        self.model = xgb.XGBClassifier(
+        self.logger = logging.getLogger(__name__)
+        
+        # 原生格式模型：元数据文件（含标准化参数）引用同目录下的 .ubj 模型文件
+        self.meta_path = 'app/models/disease_model.meta.json'
+        # 旧版 joblib 模型，没有原生格式模型时兼容读取
+        self.model_path = 'app/models/disease_model.pkl'
+        self.scaler_path = 'app/models/disease_scaler.pkl'
+        
+        # 确保模型目录存在
+        os.makedirs(os.path.dirname(self.meta_path), exist_ok=True)
+        
+        # 旧版模型转换后的缓存 (模型, 标准化器, BoosterModel)
+        self._legacy = None
+    
+    def _build_model(self):
+        """创建未训练的XGBoost分类器"""
+        return xgb.XGBClassifier(
             objective='binary:logistic',
             n_estimators=100,
             max_depth=6,
@@ -18,235 +68,276 @@ class DiseasePrediction:
             scale_pos_weight=1.0,  # 处理类别不平衡
             base_score=0.5  # 设置初始预测值
         )
-        self.scaler = StandardScaler()
-        self.model_path = 'app/models/disease_model.pkl'
-        self.scaler_path = 'app/models/disease_scaler.pkl'
-        
-        # 确保模型目录存在
-        os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
-        
-        # 加载或初始化模型
-        if os.path.exists(self.model_path):
-            self.model = joblib.load(self.model_path)
-        if os.path.exists(self.scaler_path):
-            self.scaler = joblib.load(self.scaler_path)
+    
+    def _booster_model(self):
+        """获取共享的原生模型，没有时转换旧版 joblib 模型"""
+        model = model_registry.get(self.meta_path, loader=load_booster_model)
+        if model is None:
+            model = self._legacy_booster_model()
+        if model.feature_names is not None and list(model.feature_names) != list(DISEASE_SCHEMA.columns):
+            raise RuntimeError('模型特征与当前特征定义不一致，请重新训练模型')
+        return model
+    
+    def _legacy_booster_model(self):
+        model, scaler = model_registry.get_many([self.model_path, self.scaler_path])
+        if model is None or scaler is None:
+            raise RuntimeError('模型尚未训练')
+        legacy = self._legacy
+        if legacy is None or legacy[0] is not model or legacy[1] is not scaler:
+            converted = BoosterModel.from_sklearn(model, scaler)
+            converted.set_threads(Config.XGBOOST_PREDICT_THREADS)
+            legacy = self._legacy = (model, scaler, converted)
+        return legacy[2]
+    
+    def export_legacy_model(self):
+        """把旧版 joblib 模型转换为原生格式发布，返回模型元数据"""
+        model = self._legacy_booster_model()
+        return save_booster_model(
+            self.meta_path, model,
+            feature_names=list(DISEASE_SCHEMA.columns),
+            source=os.path.basename(self.model_path)
+        ).meta
     
     def prepare_data(self, health_records):
         """准备训练数据"""
-        if not health_records:
+        if health_records is None or len(health_records) == 0:
             return None, None
             
-        # 提取特征
-        X = []
-        y = []
-        
-        for record in health_records:
-            features = []
-            # 基础生理指标
-            if record.get('heart_rate'):
-                features.append(record['heart_rate'])
-            else:
-                features.append(0)
-                
-            if record.get('blood_pressure'):
-                systolic, diastolic = map(float, record['blood_pressure'].split('/'))
-                features.extend([systolic, diastolic])
-            else:
-                features.extend([0, 0])
-                
-            if record.get('blood_sugar'):
-                features.append(record['blood_sugar'])
-            else:
-                features.append(0)
-                
-            # 生活习惯指标
-            if record.get('weight'):
-                features.append(record['weight'])
-            else:
-                features.append(0)
-                
-            if record.get('sleep_hours'):
-                features.append(record['sleep_hours'])
-            else:
-                features.append(0)
-                
-            if record.get('mood_score'):
-                features.append(record['mood_score'])
-            else:
-                features.append(0)
-                
-            # 添加BMI特征
-            if record.get('weight') and record.get('height'):
-                bmi = record['weight'] / ((record['height'] / 100) ** 2)
-                features.append(bmi)
-            else:
-                features.append(0)
-                
-            X.append(features)
-            
-            # 标签：根据健康指标综合评分
-            health_score = self._calculate_health_score(record)
-            y.append(0 if health_score >= 0.7 else 1)  # 1表示需要关注，0表示健康
-            
-        return np.array(X), np.array(y)
-    
-    def _calculate_health_score(self, record):
-        """计算健康评分"""
-        score = 0
-        count = 0
+        # 按列提取特征，丢弃无法解析的记录
+        X, columns = extract_features(health_records, DISEASE_SCHEMA)
+        valid = columns.valid
         
-        # 心率评分
-        if record.get('heart_rate'):
-            heart_rate = record['heart_rate']
-            if 60 <= heart_rate <= 100:
-                score += 1
-            count += 1
-            
-        # 血压评分
-        if record.get('blood_pressure'):
-            systolic, diastolic = map(float, record['blood_pressure'].split('/'))
-            if 90 <= systolic <= 140 and 60 <= diastolic <= 90:
-                score += 1
-            count += 1
-            
-        # 血糖评分
-        if record.get('blood_sugar'):
-            blood_sugar = record['blood_sugar']
-            if 3.9 <= blood_sugar <= 6.1:
-                score += 1
-            count += 1
-            
-        # BMI评分
-        if record.get('weight') and record.get('height'):
-            bmi = record['weight'] / ((record['height'] / 100) ** 2)
-            if 18.5 <= bmi <= 24:
-                score += 1
-            count += 1
-            
-        # 睡眠评分
-        if record.get('sleep_hours'):
-            sleep_hours = record['sleep_hours']
-            if 7 <= sleep_hours <= 9:
-                score += 1
-            count += 1
-            
-        return score / count if count > 0 else 0
+        # 标签：根据健康指标综合评分，1表示需要关注，0表示健康
+        y = (~DISEASE_RULES.label(columns)).astype(int)
+        return X[valid], y[valid]
     
-    def train_model(self, health_records):
-        """训练疾病风险预测模型"""
+    def train_model(self, health_records, scope=None):
+        """全量训练疾病风险预测模型，scope 标识训练数据的范围（如用户ID），用于之后的增量训练"""
         try:
             X, y = self.prepare_data(health_records)
             if X is None or len(X) < 10:  # 确保有足够的训练数据
                 return False, "训练数据不足"
                 
-            # 数据标准化
-            X_scaled = self.scaler.fit_transform(X)
+            # 数据标准化（使用新对象训练，避免修改正在服务的共享模型）
+            scaler = StandardScaler()
+            X_scaled = scaler.fit_transform(X)
             
             # 训练模型
-            self.model.fit(X_scaled, y)
+            model = self._build_model()
+            model.fit(X_scaled, y)
             
-            # 保存模型和标准化器
-            joblib.dump(self.model, self.model_path)
-            joblib.dump(self.scaler, self.scaler_path)
+            # 以原生格式发布模型，标准化参数和训练水位写入元数据
+            now = datetime.utcnow().isoformat()
+            save_booster_model(
+                self.meta_path, BoosterModel.from_sklearn(model, scaler),
+                feature_names=list(DISEASE_SCHEMA.columns),
+                training_samples=len(X),
+                trained_at=now,
+                full_trained_at=now,
+                incremental_updates=0,
+                positive_rate=float(y.mean()),
+                scope=scope,
+                watermark=_max_record_id(health_records)
+            )
             
             return True, "模型训练成功"
         except Exception as e:
             return False, f"模型训练失败: {str(e)}"
     
-    def predict_risk(self, health_record):
-        """预测疾病风险"""
+    def train_cohort(self, source):
+        """用数据库中的全体（或指定用户的）健康记录外存训练，内存占用只与分块大小有关
+        
+        source 为 CohortSource：第一遍逐块拟合标准化参数，之后 XGBoost 逐块量化数据并写入
+        临时缓存页，训练时按页读取，不在内存中组装完整的特征矩阵。
+        """
+        from app.services.cohort_training import fit_scaler, make_data_iter
         try:
-            # 准备特征
-            features = []
-            if health_record.get('heart_rate'):
-                features.append(health_record['heart_rate'])
-            else:
-                features.append(0)
-                
-            if health_record.get('blood_pressure'):
-                systolic, diastolic = map(float, health_record['blood_pressure'].split('/'))
-                features.extend([systolic, diastolic])
-            else:
-                features.extend([0, 0])
-                
-            if health_record.get('blood_sugar'):
-                features.append(health_record['blood_sugar'])
-            else:
-                features.append(0)
-                
-            if health_record.get('weight'):
-                features.append(health_record['weight'])
-            else:
-                features.append(0)
-                
-            if health_record.get('sleep_hours'):
-                features.append(health_record['sleep_hours'])
-            else:
-                features.append(0)
-                
-            if health_record.get('mood_score'):
-                features.append(health_record['mood_score'])
-            else:
-                features.append(0)
-                
-            # 计算BMI
-            if health_record.get('weight') and health_record.get('height'):
-                bmi = health_record['weight'] / ((health_record['height'] / 100) ** 2)
-                features.append(bmi)
-            else:
-                features.append(0)
-                
-            # 标准化特征
-            X = np.array([features])
-            X_scaled = self.scaler.transform(X)
+            scaler = fit_scaler(source)
+            if source.rows < 10:
+                return False, "训练数据不足"
             
-            # 预测风险概率
-            risk_prob = self.model.predict_proba(X_scaled)[0][1]
+            model = self._build_model()
+            params = {key: value for key, value in model.get_xgb_params().items() if value is not None}
+            with tempfile.TemporaryDirectory(prefix='disease-cohort-') as cache_dir:
+                dtrain = xgb.ExtMemQuantileDMatrix(make_data_iter(source, scaler, os.path.join(cache_dir, 'cache')))
+                booster = xgb.train(params, dtrain, num_boost_round=model.n_estimators)
+                # 先释放缓存页再删除临时目录
+                del dtrain
             
-            # 根据概率确定风险等级
-            if risk_prob < 0.3:
-                risk_level = "低风险"
-            elif risk_prob < 0.7:
-                risk_level = "中风险"
-            else:
-                risk_level = "高风险"
-                
-            return {
-                "risk_probability": float(risk_prob),
-                "risk_level": risk_level,
-                "suggestions": self._generate_suggestions(health_record, risk_prob)
-            }
+            now = datetime.utcnow().isoformat()
+            save_booster_model(
+                self.meta_path, BoosterModel(booster, scaler.mean_, scaler.scale_, {}),
+                feature_names=list(DISEASE_SCHEMA.columns),
+                training_samples=source.rows,
+                trained_at=now,
+                full_trained_at=now,
+                incremental_updates=0,
+                positive_rate=source.positives / source.rows,
+                scope='cohort',
+                watermark=source.last_id
+            )
+            return True, f"队列模型训练成功，样本 {source.rows} 条"
         except Exception as e:
-            return {
-                "error": f"预测失败: {str(e)}"
-            }
+            return False, f"模型训练失败: {str(e)}"
     
-    def _generate_suggestions(self, health_record, risk_prob):
-        """生成健康建议"""
-        suggestions = []
+    def update_model(self, load_records, scope=None, full=False):
+        """按训练水位更新模型，返回 (是否成功, 消息, 训练详情)
         
-        # 根据风险概率添加通用建议
-        if risk_prob > 0.5:
-            suggestions.append("建议定期进行健康检查")
-            suggestions.append("保持规律作息，避免熬夜")
-            suggestions.append("注意饮食均衡，控制糖分摄入")
+        load_records(after_id) 返回ID大于 after_id 的健康记录，after_id 为 None 时返回全部记录。
+        默认只用水位之后新增的记录在当前模型上继续提升，训练量与新增数据成正比；
+        定期全量训练的时间到了、树的数量达到上限或新增数据出现漂移时才全量重训。
+        """
+        current = None if full else self._current_model()
+        reason = "指定全量训练" if full else self._full_retrain_reason(current, scope)
+        if reason is None:
+            records = load_records(current.meta['watermark'])
+            X, y = self.prepare_data(records)
+            samples = 0 if X is None else len(X)
+            if samples < Config.DISEASE_INCREMENTAL_MIN_SAMPLES:
+                # 水位不变，新增记录留到下次一起训练
+                message = f"新增有效记录 {samples} 条，不足 {Config.DISEASE_INCREMENTAL_MIN_SAMPLES} 条，模型保持不变"
+                return True, message, {'mode': SKIPPED, 'samples': samples}
+            reason = self._drift_reason(current, X, y)
+            if reason is None:
+                success, message = self._train_incremental(current, records, X, y)
+                return success, message, {'mode': INCREMENTAL, 'samples': samples}
         
-        # 根据具体指标添加针对性建议
-        if health_record.get('blood_pressure'):
-            systolic, diastolic = map(float, health_record['blood_pressure'].split('/'))
-            if systolic > 140 or diastolic > 90:
-                suggestions.append("血压偏高，建议减少盐分摄入，适当运动")
-                
-        if health_record.get('blood_sugar'):
-            if health_record['blood_sugar'] > 6.1:
-                suggestions.append("血糖偏高，建议控制饮食，减少糖分摄入")
-                
-        if health_record.get('sleep_hours'):
-            if health_record['sleep_hours'] < 7:
-                suggestions.append("睡眠不足，建议保证每天7-8小时睡眠")
-                
-        if health_record.get('mood_score'):
-            if health_record['mood_score'] < 5:
-                suggestions.append("情绪评分较低，建议适当放松，保持积极心态")
-                
-        return suggestions 
\ No newline at end of file
+        self.logger.info(f"疾病预测模型全量训练: {reason}")
+        records = load_records(None)
+        success, message = self.train_model(records, scope=scope)
+        return success, message, {'mode': FULL, 'samples': len(records), 'reason': reason}
+    
+    def _current_model(self):
+        """当前发布的原生模型，不存在或无法加载时返回 None"""
+        try:
+            return model_registry.get(self.meta_path, loader=load_booster_model)
+        except Exception as e:
+            self.logger.warning(f"无法加载当前疾病预测模型，改为全量训练: {e}")
+            return None
+    
+    def _full_retrain_reason(self, current, scope):
+        """检查模型状态和训练计划，需要全量训练时返回原因"""
+        if current is None:
+            return "没有可增量更新的原生格式模型"
+        meta = current.meta
+        if meta.get('watermark') is None or meta.get('scope') != scope:
+            return "当前模型不是用这组数据训练的"
+        if list(meta.get('feature_names') or []) != list(DISEASE_SCHEMA.columns):
+            return "特征定义已变化"
+        if current.booster.num_boosted_rounds() + Config.DISEASE_INCREMENTAL_ROUNDS > Config.DISEASE_MAX_TREES:
+            return f"树的数量将超过上限 {Config.DISEASE_MAX_TREES}"
+        full_trained_at = meta.get('full_trained_at')
+        if full_trained_at is None or (
+            datetime.utcnow() - datetime.fromisoformat(full_trained_at) > timedelta(days=Config.DISEASE_FULL_RETRAIN_DAYS)
+        ):
+            return f"距上次全量训练超过 {Config.DISEASE_FULL_RETRAIN_DAYS} 天"
+        return None
+    
+    def _drift_reason(self, current, X, y):
+        """新增数据相对训练数据的漂移检查，超过阈值时返回原因
+        
+        新增样本少时均值波动大，偏移量减去两倍标准误后仍超过阈值才算漂移。
+        """
+        n = len(X)
+        # 用当前标准化参数变换后，各列均值就是相对训练均值偏移了几个标准差，标准误约为 1/sqrt(n)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # 整列缺失时均值为 NaN，不算漂移
+            shift = np.abs(np.nanmean(current.transform(X), axis=0))
+        shift = np.nan_to_num(shift)
+        column = int(shift.argmax())
+        if shift[column] - 2 / np.sqrt(n) > Config.DISEASE_DRIFT_THRESHOLD:
+            return f"特征 {DISEASE_SCHEMA.columns[column]} 偏移 {shift[column]:.2f} 个标准差"
+        rate = current.meta.get('positive_rate', 0.0)
+        label_shift = abs(float(y.mean()) - rate)
+        if label_shift - 2 * np.sqrt(rate * (1 - rate) / n) > Config.DISEASE_LABEL_DRIFT_THRESHOLD:
+            return f"需要关注的样本比例变化 {label_shift:.2f}"
+        return None
+    
+    def _train_incremental(self, current, records, X, y):
+        """沿用当前标准化参数，在新增记录上追加若干棵树后发布"""
+        try:
+            params = {key: value for key, value in self._build_model().get_xgb_params().items() if value is not None}
+            # 在副本上继续训练，正在服务的共享模型不受影响
+            booster = xgb.train(
+                params, xgb.DMatrix(current.transform(X), label=y),
+                num_boost_round=Config.DISEASE_INCREMENTAL_ROUNDS,
+                xgb_model=current.booster.copy()
+            )
+            meta = current.meta
+            save_booster_model(
+                self.meta_path, BoosterModel(booster, current.mean, current.scale, dict(meta)),
+                training_samples=meta.get('training_samples', 0) + len(X),
+                trained_at=datetime.utcnow().isoformat(),
+                incremental_updates=meta.get('incremental_updates', 0) + 1,
+                watermark=max(meta['watermark'], _max_record_id(records) or meta['watermark'])
+            )
+            return True, f"模型增量训练成功，新增样本 {len(X)} 条"
+        except Exception as e:
+            return False, f"模型增量训练失败: {str(e)}"
+    
+    def predict_risk(self, health_record):
+        """预测疾病风险"""
+        return self.predict_batch([health_record])[0]
+    
+    def predict_batch(self, health_records):
+        """批量预测疾病风险：整批只做一次标准化和一次 Booster.inplace_predict"""
+        n = len(health_records)
+        try:
+            X, columns = extract_features(health_records, DISEASE_SCHEMA)
+            errors = columns.errors
+            valid = columns.valid
+            
+            risk_prob = np.zeros(n)
+            if valid.any():
+                risk_prob[valid] = self._booster_model().predict_proba(X[valid])
+        except Exception as e:
+            return [{"error": f"预测失败: {str(e)}"} for _ in range(n)]
+        
+        # 根据概率确定风险等级
+        risk_levels = np.select(
+            [risk_prob < 0.3, risk_prob < 0.7],
+            ["低风险", "中风险"],
+            default="高风险"
+        )
+        suggestions = self._generate_suggestions(columns, risk_prob)
+        
+        results = []
+        for i in range(n):
+            if i in errors:
+                results.append({"error": f"预测失败: {errors[i]}"})
+            else:
+                results.append({
+                    "risk_probability": float(risk_prob[i]),
+                    "risk_level": str(risk_levels[i]),
+                    "suggestions": suggestions[i]
+                })
+        return results
+    
+    # 建议规则，依次对应 _generate_suggestions 中的条件列
+    SUGGESTION_RULES = (
+        ("建议定期进行健康检查", "保持规律作息，避免熬夜", "注意饮食均衡，控制糖分摄入"),
+        ("血压偏高，建议减少盐分摄入，适当运动",),
+        ("血糖偏高，建议控制饮食，减少糖分摄入",),
+        ("睡眠不足，建议保证每天7-8小时睡眠",),
+        ("情绪评分较低，建议适当放松，保持积极心态",)
+    )
+    
+    def _generate_suggestions(self, columns, risk_prob):
+        """根据指标列批量生成健康建议，返回与行对齐的建议列表"""
+        # 阈值取自临床范围配置，缺失指标不会触发建议
+        ranges = clinical_ranges.current()
+        conditions = np.column_stack([
+            risk_prob > 0.5,
+            ranges['blood_pressure'].masks(columns)[2],
+            ranges['blood_sugar'].masks(columns)[2],
+            ranges['sleep_hours'].masks(columns)[1],
+            ranges['mood_score_alert'].masks(columns)[1]
+        ])
+        
+        # 相同条件组合的行共享同一份建议列表
+        patterns, inverse = np.unique(conditions, axis=0, return_inverse=True)
+        pattern_suggestions = [
+            [text for hit, rule in zip(pattern, self.SUGGESTION_RULES) if hit for text in rule]
+            for pattern in patterns
+        ]
+        return [list(pattern_suggestions[k]) for k in inverse.reshape(-1)]
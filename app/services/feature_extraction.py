@@ -0,0 +1,217 @@
+# 特征提取服务
+import numpy as np
+
+# 记录中直接读取的数值指标
+NUMERIC_FIELDS = ('heart_rate', 'blood_sugar', 'weight', 'height', 'sleep_hours', 'mood_score')
+# 数据库中单独存储的血压数值列，缺失时从 blood_pressure 字符串解析
+BP_FIELDS = ('systolic_bp', 'diastolic_bp')
+
+
+class FeatureSchema:
+    """模型的特征定义：特征列顺序及缺失值填充方式"""
+
+    def __init__(self, name, columns, fill_value=0.0):
+        self.name = name
+        self.columns = tuple(columns)
+        self.fill_value = fill_value
+
+    def __len__(self):
+        return len(self.columns)
+
+    def __repr__(self):
+        return f'<FeatureSchema {self.name} {self.columns}>'
+
+
+# 各模型的特征列，顺序必须与已训练模型保持一致
+DISEASE_SCHEMA = FeatureSchema('disease', (
+    'heart_rate', 'systolic_bp', 'diastolic_bp', 'blood_sugar',
+    'weight', 'sleep_hours', 'mood_score', 'bmi'
+))
+FEDERATED_SCHEMA = FeatureSchema('federated', (
+    'heart_rate', 'systolic_bp', 'diastolic_bp', 'blood_sugar',
+    'weight', 'sleep_hours', 'mood_score'
+))
+ALGORITHM_SCHEMA = FeatureSchema('algorithm', FEDERATED_SCHEMA.columns)
+RECOMMENDATION_SCHEMA = FeatureSchema('recommendation', (
+    'heart_rate', 'systolic_bp', 'diastolic_bp', 'blood_sugar',
+    'sleep_hours', 'mood_score', 'weight'
+))
+
+
+class HealthColumns:
+    """按列存放的一批健康记录，缺失值统一为NaN，无法解析的行记录在errors中"""
+
+    def __init__(self, columns, errors, n_rows):
+        self.columns = columns
+        self.errors = errors
+        self.n_rows = n_rows
+
+    def __len__(self):
+        return self.n_rows
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    @property
+    def valid(self):
+        """没有解析错误的行"""
+        mask = np.ones(self.n_rows, dtype=bool)
+        if self.errors:
+            mask[list(self.errors)] = False
+        return mask
+
+    def matrix(self, schema, dtype=np.float32):
+        """按schema组装特征矩阵，缺失值和非有限值按schema.fill_value填充"""
+        X = np.empty((self.n_rows, len(schema)), dtype=dtype)
+        for j, name in enumerate(schema.columns):
+            column = self.columns[name]
+            X[:, j] = np.where(np.isfinite(column), column, schema.fill_value)
+        return X
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _to_float_column(values, errors):
+    """把一列原始值转换为float64数组，缺失值为NaN"""
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        pass
+
+    # 存在字符串或非法值时逐个解析，定位出错的行
+    values = list(values)
+    column = np.full(len(values), np.nan)
+    for i, value in enumerate(values):
+        if _is_missing(value):
+            continue
+        try:
+            column[i] = float(value)
+        except (TypeError, ValueError):
+            errors.setdefault(i, f'无效的数值: {value!r}')
+    return column
+
+
+def parse_blood_pressure(values, errors=None):
+    """向量化解析"收缩压/舒张压"格式的血压，返回 (收缩压, 舒张压) 两个float64数组"""
+    if errors is None:
+        errors = {}
+    values = np.asarray(values, dtype=object)
+    n = len(values)
+    systolic = np.full(n, np.nan)
+    diastolic = np.full(n, np.nan)
+
+    present = (values != None) & (values != '')  # noqa: E711  逐元素比较
+    if not present.any():
+        return systolic, diastolic
+
+    index = np.flatnonzero(present)
+    try:
+        # 纯ASCII时按字节串解析，比unicode数组快一倍左右
+        strings, sep = values[present].astype('S'), b'/'
+    except (UnicodeEncodeError, TypeError):
+        strings, sep = values[present].astype(str), '/'
+    parts = np.char.partition(strings, sep)
+    try:
+        if not (parts[:, 1] == sep).all():
+            raise ValueError('missing separator')
+        systolic[index] = parts[:, 0].astype(np.float64)
+        diastolic[index] = parts[:, 2].astype(np.float64)
+    except ValueError:
+        # 批量解析失败时逐行解析，只标记格式错误的行
+        for k, i in enumerate(index):
+            try:
+                if parts[k, 1] != sep:
+                    raise ValueError
+                systolic[i], diastolic[i] = float(parts[k, 0]), float(parts[k, 2])
+            except ValueError:
+                systolic[i] = diastolic[i] = np.nan
+                errors.setdefault(int(i), f'血压格式错误: {values[i]!r}')
+    return systolic, diastolic
+
+
+def split_blood_pressure(value):
+    """解析单个"收缩压/舒张压"血压字符串，返回 (收缩压, 舒张压) 整数，格式错误或缺失时返回 (None, None)"""
+    if not isinstance(value, str) or '/' not in value:
+        return None, None
+    systolic, _, diastolic = value.partition('/')
+    try:
+        return int(round(float(systolic))), int(round(float(diastolic)))
+    except ValueError:
+        return None, None
+
+
+def _read_raw_columns(records, fields, errors):
+    """从DataFrame、列字典、字典列表或ORM对象列表中按列读取原始值"""
+    # pandas.DataFrame：直接取列数组，避免逐行访问
+    if hasattr(records, 'columns') and hasattr(records, 'to_numpy'):
+        n = len(records)
+        return n, {
+            field: records[field].to_numpy() if field in records.columns else np.full(n, None, dtype=object)
+            for field in fields
+        }
+
+    # 列字典：{'heart_rate': [...], 'blood_pressure': [...]}
+    if isinstance(records, dict):
+        lengths = {len(v) for v in records.values()}
+        if len(lengths) > 1:
+            raise ValueError('各列长度不一致')
+        n = lengths.pop() if lengths else 0
+        return n, {
+            field: records[field] if field in records else [None] * n
+            for field in fields
+        }
+
+    # 行序列：字典或ORM对象
+    rows = list(records)
+    for i, row in enumerate(rows):
+        if isinstance(row, (str, bytes, int, float, list, tuple)) or row is None:
+            errors[i] = '健康记录必须是对象'
+            rows[i] = {}
+        elif hasattr(row, '_mapping'):
+            # SQLAlchemy查询返回的Row
+            rows[i] = row._mapping
+    raw = {}
+    for field in fields:
+        raw[field] = [
+            row.get(field) if hasattr(row, 'get') else getattr(row, field, None)
+            for row in rows
+        ]
+    return len(rows), raw
+
+
+def load_columns(records):
+    """把一批健康记录转换为HealthColumns，包含原始指标以及收缩压、舒张压和BMI"""
+    errors = {}
+    n, raw = _read_raw_columns(records, NUMERIC_FIELDS + BP_FIELDS + ('blood_pressure',), errors)
+
+    columns = {}
+    for field in NUMERIC_FIELDS + BP_FIELDS:
+        columns[field] = _to_float_column(raw[field], errors)
+
+    # 优先使用已存储的收缩压/舒张压列，只解析缺少这两列的记录的血压字符串
+    missing = np.isnan(columns['systolic_bp']) | np.isnan(columns['diastolic_bp'])
+    if missing.any():
+        blood_pressure = np.asarray(raw['blood_pressure'], dtype=object)
+        if not missing.all():
+            blood_pressure = np.where(missing, blood_pressure, None)
+        systolic, diastolic = parse_blood_pressure(blood_pressure, errors)
+        parsed = ~np.isnan(systolic)
+        columns['systolic_bp'] = np.where(parsed, systolic, columns['systolic_bp'])
+        columns['diastolic_bp'] = np.where(parsed, diastolic, columns['diastolic_bp'])
+
+    # BMI = 体重(kg) / 身高(m)^2，缺少身高时为NaN
+    with np.errstate(divide='ignore', invalid='ignore'):
+        columns['bmi'] = columns['weight'] / np.square(columns['height'] / 100)
+
+    return HealthColumns(columns, errors, n)
+
+
+def extract_features(records, schema, dtype=np.float32):
+    """按schema提取特征矩阵，返回 (X, HealthColumns)；X包含所有行，错误行需调用方根据valid过滤"""
+    columns = records if isinstance(records, HealthColumns) else load_columns(records)
+    return columns.matrix(schema, dtype=dtype), columns
@@ -1,168 +1,115 @@
 # 联邦学习服务
+import copy
 import numpy as np
 from sklearn.linear_model import LogisticRegression
 from sklearn.preprocessing import StandardScaler
-import joblib
 import os
 from datetime import datetime
+from app.services.model_registry import model_registry
+from app.services.feature_extraction import extract_features, load_columns, FEDERATED_SCHEMA
+from app.services.health_scoring import FEDERATED_RULES
 
 class FederatedLearning:
     def __init__(self):
-        self.model = LogisticRegression()
-        self.scaler = StandardScaler()
         self.model_path = 'app/models/federated_model.pkl'
         self.scaler_path = 'app/models/federated_scaler.pkl'
         
-        # 加载或初始化模型
-        if os.path.exists(self.model_path):
-            self.model = joblib.load(self.model_path)
-        if os.path.exists(self.scaler_path):
-            self.scaler = joblib.load(self.scaler_path)
+        # 尚未训练时使用的初始模型
+        self._default_model = LogisticRegression()
+        self._default_scaler = StandardScaler()
+    
+    @property
+    def model(self):
+        """从模型注册表获取共享模型"""
+        model = model_registry.get(self.model_path)
+        return self._default_model if model is None else model
+    
+    @property
+    def scaler(self):
+        """从模型注册表获取共享标准化器"""
+        scaler = model_registry.get(self.scaler_path)
+        return self._default_scaler if scaler is None else scaler
+    
+    def _artifacts(self):
+        """同时获取模型和标准化器，保证二者来自同一次训练"""
+        model, scaler = model_registry.get_many([self.model_path, self.scaler_path])
+        return (
+            self._default_model if model is None else model,
+            self._default_scaler if scaler is None else scaler
+        )
     
     def prepare_data(self, health_records):
         """准备训练数据"""
-        if not health_records:
+        if health_records is None or len(health_records) == 0:
             return None, None
             
-        # 提取特征
-        X = []
-        y = []
+        # 按列提取特征，丢弃无法解析的记录
+        X, columns = extract_features(health_records, FEDERATED_SCHEMA)
+        valid = columns.valid
         
-        for record in health_records:
-            features = []
-            # 心率
-            if record.get('heart_rate'):
-                features.append(record['heart_rate'])
-            else:
-                features.append(0)
-                
-            # 血压
-            if record.get('blood_pressure'):
-                systolic, diastolic = map(float, record['blood_pressure'].split('/'))
-                features.extend([systolic, diastolic])
-            else:
-                features.extend([0, 0])
-                
-            # 血糖
-            if record.get('blood_sugar'):
-                features.append(record['blood_sugar'])
-            else:
-                features.append(0)
-                
-            # 体重
-            if record.get('weight'):
-                features.append(record['weight'])
-            else:
-                features.append(0)
-                
-            # 睡眠时长
-            if record.get('sleep_hours'):
-                features.append(record['sleep_hours'])
-            else:
-                features.append(0)
-                
-            # 情绪评分
-            if record.get('mood_score'):
-                features.append(record['mood_score'])
-            else:
-                features.append(0)
-                
-            X.append(features)
-            
-            # 标签：根据健康指标综合评分
-            health_score = self._calculate_health_score(record)
-            y.append(1 if health_score >= 0.7 else 0)  # 1表示健康，0表示需要关注
-            
-        return np.array(X), np.array(y)
+        # 标签：根据健康指标综合评分，1表示健康，0表示需要关注
+        y = FEDERATED_RULES.label(columns).astype(int)
+        return X[valid], y[valid]
     
-    def _calculate_health_score(self, record):
-        """计算健康评分"""
-        score = 0
-        count = 0
-        
-        # 心率评分
-        if record.get('heart_rate'):
-            heart_rate = record['heart_rate']
-            if 60 <= heart_rate <= 100:
-                score += 1
-            count += 1
-            
-        # 血压评分
-        if record.get('blood_pressure'):
-            systolic, diastolic = map(float, record['blood_pressure'].split('/'))
-            if 90 <= systolic <= 140 and 60 <= diastolic <= 90:
-                score += 1
-            count += 1
-            
-        # 血糖评分
-        if record.get('blood_sugar'):
-            blood_sugar = record['blood_sugar']
-            if 3.9 <= blood_sugar <= 6.1:
-                score += 1
-            count += 1
-            
-        # 睡眠评分
-        if record.get('sleep_hours'):
-            sleep_hours = record['sleep_hours']
-            if 7 <= sleep_hours <= 9:
-                score += 1
-            count += 1
-            
-        # 情绪评分
-        if record.get('mood_score'):
-            mood_score = record['mood_score']
-            if mood_score >= 6:
-                score += 1
-            count += 1
-            
-        return score / count if count > 0 else 0
+    @property
+    def global_version(self):
+        """当前全局模型的版本号（联邦平均的轮次编号），不是聚合得到的模型时为 None"""
+        return getattr(self.model, 'global_version', None)
     
     def train_local_model(self, health_records):
-        """训练本地模型"""
+        """训练本地模型，返回参数供客户端提交到聚合轮次，不修改全局模型"""
         X, y = self.prepare_data(health_records)
         if X is None or len(X) == 0:
             return None
             
         # 标准化特征
-        X_scaled = self.scaler.fit_transform(X)
+        scaler = StandardScaler()
+        X_scaled = scaler.fit_transform(X)
         
         # 训练模型
-        self.model.fit(X_scaled, y)
-        
-        # 保存模型
-        joblib.dump(self.model, self.model_path)
-        joblib.dump(self.scaler, self.scaler_path)
+        model = LogisticRegression()
+        model.fit(X_scaled, y)
         
         return {
-            'model_weights': self.model.coef_.tolist(),
-            'intercept': self.model.intercept_.tolist(),
-            'scaler_mean': self.scaler.mean_.tolist(),
-            'scaler_scale': self.scaler.scale_.tolist()
+            'model_weights': model.coef_.tolist(),
+            'intercept': model.intercept_.tolist(),
+            'scaler_mean': scaler.mean_.tolist(),
+            'scaler_scale': scaler.scale_.tolist(),
+            'samples': len(X)
         }
     
-    def update_global_model(self, global_weights, global_intercept, global_scaler_mean, global_scaler_scale):
-        """更新全局模型参数"""
-        self.model.coef_ = np.array(global_weights)
-        self.model.intercept_ = np.array(global_intercept)
-        self.scaler.mean_ = np.array(global_scaler_mean)
-        self.scaler.scale_ = np.array(global_scaler_scale)
+    def update_global_model(self, global_weights, global_intercept, global_scaler_mean, global_scaler_scale, version=None):
+        """发布全局模型参数，version 为聚合轮次编号"""
+        # 在副本上修改，避免其他请求读到更新了一半的共享模型
+        model, scaler = map(copy.deepcopy, self._artifacts())
+        model.coef_ = np.array(global_weights)
+        model.intercept_ = np.array(global_intercept)
+        if not hasattr(model, 'classes_'):
+            model.classes_ = np.array([0, 1])
+        scaler.mean_ = np.array(global_scaler_mean)
+        scaler.scale_ = np.array(global_scaler_scale)
+        model.global_version = version
         
-        # 保存更新后的模型
-        joblib.dump(self.model, self.model_path)
-        joblib.dump(self.scaler, self.scaler_path)
+        # 发布更新后的模型
+        model_registry.publish_many({self.model_path: model, self.scaler_path: scaler})
     
     def predict_health_status(self, health_record):
         """预测健康状态"""
-        X, _ = self.prepare_data([health_record])
-        if X is None:
+        columns = load_columns([health_record])
+        if columns.errors:
             return None
+        X = columns.matrix(FEDERATED_SCHEMA)
             
-        X_scaled = self.scaler.transform(X)
-        prediction = self.model.predict(X_scaled)[0]
-        probability = self.model.predict_proba(X_scaled)[0][1]
+        model, scaler = self._artifacts()
+        if not hasattr(model, 'coef_'):
+            # 还没有发布过全局模型
+            return None
+        X_scaled = scaler.transform(X)
+        prediction = model.predict(X_scaled)[0]
+        probability = model.predict_proba(X_scaled)[0][1]
         
         return {
             'prediction': int(prediction),
             'probability': float(probability),
-            'health_score': self._calculate_health_score(health_record)
+            'health_score': float(FEDERATED_RULES.score(columns)[0])
         } 
\ No newline at end of file
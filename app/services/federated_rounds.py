@@ -0,0 +1,313 @@
+# 联邦平均（FedAvg）轮次聚合，以及缓冲式异步聚合
+import logging
+from datetime import datetime, timedelta
+import numpy as np
+import sqlalchemy as sa
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.config import Config
+from app.models.federated_round import FederatedRound, FederatedUpdate
+from app.services.feature_extraction import FEDERATED_SCHEMA
+
+# 客户端上传的参数
+PARAM_KEYS = ('model_weights', 'intercept', 'scaler_mean', 'scaler_scale')
+N_FEATURES = len(FEDERATED_SCHEMA)
+# 展平后的参数向量：[系数(d), 截距(1), 标准化均值(d), 标准化标准差(d)]
+PARAM_SIZE = 3 * N_FEATURES + 1
+# 并发提交冲突时的重试次数
+MAX_RETRIES = 5
+# 缓存的历史全局模型参数个数，用于解码增量更新
+PARAMS_CACHE_SIZE = 8
+# 聚合模式：sync 每轮等待法定数量的客户端后做联邦平均；async 按到达顺序累加相对全局模型的增量
+SYNC = 'sync'
+ASYNC = 'async'
+
+
+class UpdateError(ValueError):
+    """客户端更新无法接受，message 会原样返回给客户端"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def pack_params(weights, intercept, mean, scale):
+    """把 LogisticRegression 和 StandardScaler 的参数展平为一个 float64 向量"""
+    parts = [np.asarray(part, dtype=np.float64).reshape(-1) for part in (weights, intercept, mean, scale)]
+    sizes = tuple(len(part) for part in parts)
+    if sizes != (N_FEATURES, 1, N_FEATURES, N_FEATURES):
+        raise UpdateError(f'模型参数维度错误: {sizes}，应为 {(N_FEATURES, 1, N_FEATURES, N_FEATURES)}')
+    return np.concatenate(parts)
+
+
+def unpack_params(vector):
+    """参数向量转换回接口使用的字典格式"""
+    d = N_FEATURES
+    return {
+        'model_weights': [vector[:d].tolist()],
+        'intercept': vector[d:d + 1].tolist(),
+        'scaler_mean': vector[d + 1:2 * d + 1].tolist(),
+        'scaler_scale': vector[2 * d + 1:].tolist()
+    }
+
+
+def parse_update(data):
+    """校验 /api/fl/update 的请求体，返回 (参数向量, 样本数, 基准版本)"""
+    if not isinstance(data, dict) or not all(key in data for key in PARAM_KEYS):
+        raise UpdateError('缺少必要的模型参数')
+    try:
+        params = pack_params(*(data[key] for key in PARAM_KEYS))
+        # 未上报样本数的旧客户端按1条计
+        samples = float(data.get('samples', 1))
+    except (TypeError, ValueError) as e:
+        if isinstance(e, UpdateError):
+            raise
+        raise UpdateError(f'模型参数格式错误: {e}')
+    # 客户端训练时所基于的全局模型版本，异步聚合用它计算过期程度
+    base_version = check_base_version(data.get('base_version'))
+    return (*check_update(params, samples), base_version)
+
+
+def check_base_version(base_version):
+    """校验客户端给出的基准全局版本号，未给出时返回 None"""
+    if base_version is not None and (isinstance(base_version, bool) or not isinstance(base_version, int) or base_version <= 0):
+        raise UpdateError('base_version 必须是正整数')
+    return base_version
+
+
+def check_update(params, samples):
+    """检查参数向量和样本数的取值，JSON 和二进制更新共用"""
+    if not np.isfinite(params).all():
+        raise UpdateError('模型参数包含非有限值')
+    if (params[2 * N_FEATURES + 1:] <= 0).any():
+        raise UpdateError('标准化标准差必须为正数')
+    if not np.isfinite(samples) or samples <= 0:
+        raise UpdateError('样本数必须为正数')
+    return params, samples
+
+
+def contribution(params):
+    """单个客户端参与加权平均的量：[原始特征空间的系数(d), 截距(1), 均值(d), 二阶矩(d)]
+
+    各客户端的系数是在各自标准化后的空间中训练的，先换算到原始特征空间再平均，
+    等价于对各客户端的对数几率函数做加权平均；均值和二阶矩的加权平均给出合并后的标准化参数。
+    """
+    d = N_FEATURES
+    coef, intercept = params[:d], params[d]
+    mean, scale = params[d + 1:2 * d + 1], params[2 * d + 1:]
+    raw_coef = coef / scale
+    return np.concatenate([raw_coef, [intercept - raw_coef @ mean], mean, np.square(scale) + np.square(mean)])
+
+
+def from_contribution(average):
+    """contribution 的逆变换：由加权平均后的贡献向量得到全局模型的参数向量"""
+    d = N_FEATURES
+    raw_coef, raw_intercept = average[:d], average[d]
+    mean, second_moment = average[d + 1:2 * d + 1], average[2 * d + 1:]
+    scale = np.sqrt(np.maximum(second_moment - np.square(mean), 0.0))
+    # 与 StandardScaler 一样，方差为0的特征不缩放
+    scale[scale < 10 * np.finfo(np.float64).eps] = 1.0
+    return np.concatenate([raw_coef * scale, [raw_intercept + raw_coef @ mean], mean, scale])
+
+
+def staleness_weight(samples, staleness, exponent):
+    """异步更新的权重：样本数 × (1 + 过期版本数)^-exponent"""
+    return samples * (1.0 + staleness) ** -exponent
+
+
+class FedAvgAggregator:
+    """按轮次收集客户端更新并做加权的联邦平均
+
+    每个更新到达时只把 权重 × 贡献向量 累加到当前轮次的累加和中（数据库中的一个二进制列），
+    客户端参数本身不保存，一轮有多少个客户端内存占用都不变。收到的更新数达到法定数量，
+    或到达截止时间时关闭本轮，计算全局模型并以轮次编号作为版本号发布。
+    轮次状态保存在数据库中，多个工作进程共享；累加使用乐观并发控制，冲突时重试。
+
+    FL_AGGREGATION_MODE 为 async 时（已有全局模型之后），轮次是一个大小为 FL_ASYNC_BUFFER_SIZE 的缓冲区：
+    每个更新累加的是它相对本轮基准（开启时的全局模型）的贡献增量，权重为样本数乘以随客户端落后的版本数
+    衰减的系数，落后太多的更新直接拒绝；缓冲区满时把累加和除以样本总数、乘以服务端学习率，
+    叠加到基准上发布新版本。
+    慢客户端不会阻塞其他客户端，每次累加只与模型大小有关，不需要重新读取之前的更新。
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        # 已关闭轮次的结果不再变化，按版本号缓存参数向量
+        self._params_cache = {}
+
+    @staticmethod
+    def _setting(name):
+        return current_app.config.get(name, getattr(Config, name))
+
+    def _open_round(self):
+        return db.session.execute(
+            sa.select(FederatedRound).where(FederatedRound.status == 'open')
+            .order_by(FederatedRound.id).limit(1).execution_options(populate_existing=True)
+        ).scalar_one_or_none()
+
+    def _due(self, round_, now=None):
+        """达到法定数量，或已到截止时间且更新数不少于最少客户端数"""
+        now = now or datetime.utcnow()
+        return round_.clients >= round_.quorum or (
+            now >= round_.deadline and round_.clients >= self._setting('FL_ROUND_MIN_CLIENTS')
+        )
+
+    def current_round(self, create=True):
+        """返回当前开放的轮次，已到期的先关闭；没有开放轮次时新建一轮"""
+        round_ = self._open_round()
+        if round_ is not None and self._due(round_):
+            self.close_round(round_, 'deadline')
+            round_ = None
+        if round_ is None and create:
+            round_ = self._create_round()
+        return round_
+
+    def _create_round(self):
+        last_id = db.session.execute(sa.select(sa.func.max(FederatedRound.id))).scalar() or 0
+        base_version = self.latest_version()
+        # 还没有全局模型时第一轮总是同步聚合，作为异步增量的起点
+        mode = ASYNC if self._setting('FL_AGGREGATION_MODE') == ASYNC and base_version is not None else SYNC
+        now = datetime.utcnow()
+        round_ = FederatedRound(
+            id=last_id + 1, status='open', mode=mode, base_version=base_version,
+            quorum=self._setting('FL_ASYNC_BUFFER_SIZE' if mode == ASYNC else 'FL_ROUND_QUORUM'),
+            deadline=now + timedelta(seconds=self._setting('FL_ROUND_DEADLINE_SECONDS')),
+            clients=0, total_samples=0.0, total_weight=0.0, opened_at=now
+        )
+        try:
+            with db.session.begin_nested():
+                db.session.add(round_)
+            db.session.commit()
+            return round_
+        except IntegrityError:
+            # 其他进程已经创建了这一轮
+            db.session.rollback()
+            return self._open_round()
+
+    def _weighted(self, round_, params, samples, base_version):
+        """本次更新要累加的 (权重, 加权向量)"""
+        if round_.mode != ASYNC:
+            return samples, samples * contribution(params)
+        # 未说明基准版本的客户端视为基于本轮开启时的全局模型
+        base_version = base_version or round_.base_version
+        staleness = round_.base_version - base_version
+        if staleness < 0:
+            raise UpdateError(f'基准全局模型版本 {base_version} 不存在')
+        if staleness > self._setting('FL_ASYNC_MAX_STALENESS'):
+            raise UpdateError(f'基准全局模型版本 {base_version} 已过期，请获取最新全局模型后重新训练', status=409)
+        # 客户端上传的是完整模型，增量相对本轮的基准计算；若相对客户端自己的旧版本计算，
+        # 旧版本之后已经发布的变化会被重复叠加
+        base = self.global_params(round_.base_version)
+        weight = staleness_weight(samples, staleness, self._setting('FL_ASYNC_STALENESS_EXPONENT'))
+        return weight, weight * (contribution(params) - contribution(base))
+
+    def submit(self, user_id, params, samples, base_version=None):
+        """把一个客户端更新累加到当前轮次，达到关闭条件时发布全局模型，返回轮次状态
+
+        base_version 为客户端训练时所基于的全局模型版本，只在异步聚合时使用。
+        """
+        for _ in range(MAX_RETRIES):
+            round_ = self.current_round()
+            if round_ is None:
+                continue
+            submitted = db.session.execute(
+                sa.select(FederatedUpdate.id).where(
+                    FederatedUpdate.round_id == round_.id, FederatedUpdate.user_id == user_id
+                )
+            ).first()
+            if submitted:
+                raise UpdateError(f'已在第 {round_.id} 轮提交过模型更新', status=409)
+
+            weight, weighted = self._weighted(round_, params, samples, base_version)
+            sums = weighted if round_.sums is None else np.frombuffer(round_.sums, dtype=np.float64) + weighted
+            # 以更新数作为版本号，期间有其他更新写入时本次更新不生效，重新读取后重试
+            result = db.session.execute(
+                sa.update(FederatedRound)
+                .where(
+                    FederatedRound.id == round_.id,
+                    FederatedRound.status == 'open',
+                    FederatedRound.clients == round_.clients
+                )
+                .values(
+                    clients=round_.clients + 1,
+                    total_samples=round_.total_samples + samples,
+                    total_weight=round_.total_weight + weight,
+                    sums=sums.tobytes()
+                )
+            )
+            if result.rowcount != 1:
+                db.session.rollback()
+                continue
+            try:
+                with db.session.begin_nested():
+                    db.session.add(FederatedUpdate(round_id=round_.id, user_id=user_id, samples=samples))
+            except IntegrityError:
+                db.session.rollback()
+                raise UpdateError(f'已在第 {round_.id} 轮提交过模型更新', status=409)
+            db.session.commit()
+
+            round_ = db.session.get(FederatedRound, round_.id, populate_existing=True)
+            if self._due(round_):
+                self.close_round(round_, 'quorum' if round_.clients >= round_.quorum else 'deadline')
+            return round_
+        raise UpdateError('模型更新并发冲突，请稍后重试', status=503)
+
+    def close_round(self, round_, reason='manual'):
+        """关闭轮次并发布全局模型，本轮没有任何更新时返回 False"""
+        if round_.clients == 0 or round_.sums is None:
+            return False
+        # 除以样本总数而不是权重之和：同步模式两者相同；异步模式下过期的更新对全局模型的拉动按权重缩小
+        average = np.frombuffer(round_.sums, dtype=np.float64) / round_.total_samples
+        if round_.mode == ASYNC:
+            base = self.global_params(round_.base_version)
+            average = contribution(base) + self._setting('FL_ASYNC_SERVER_LR') * average
+        params = from_contribution(average)
+        result = db.session.execute(
+            sa.update(FederatedRound)
+            .where(FederatedRound.id == round_.id, FederatedRound.status == 'open')
+            .values(status='closed', close_reason=reason, closed_at=datetime.utcnow(), result=unpack_params(params))
+        )
+        db.session.commit()
+        if result.rowcount != 1:
+            # 其他进程已经关闭了这一轮
+            return False
+        db.session.refresh(round_)
+        self.publish(round_)
+        self.logger.info(
+            f"联邦学习第 {round_.id} 轮（{round_.mode}）关闭（{reason}），{round_.clients} 个客户端，{round_.total_samples:.0f} 条样本"
+        )
+        return True
+
+    def publish(self, round_):
+        """把轮次的聚合结果发布为当前全局模型"""
+        from app.services.federated_learning import FederatedLearning
+        params = round_.result
+        FederatedLearning().update_global_model(
+            params['model_weights'], params['intercept'], params['scaler_mean'], params['scaler_scale'],
+            version=round_.id
+        )
+
+    def global_params(self, version):
+        """指定版本全局模型的参数向量，版本不存在时返回 None"""
+        params = self._params_cache.get(version)
+        if params is None:
+            round_ = db.session.get(FederatedRound, version)
+            if round_ is None or round_.status != 'closed':
+                return None
+            result = round_.result
+            params = pack_params(*(result[key] for key in PARAM_KEYS))
+            params.setflags(write=False)
+            if len(self._params_cache) >= PARAMS_CACHE_SIZE:
+                self._params_cache.pop(min(self._params_cache))
+            self._params_cache[version] = params
+        return params
+
+    def latest_version(self):
+        """最近发布的全局模型版本号（轮次编号），还没有时返回 None"""
+        return db.session.execute(
+            sa.select(sa.func.max(FederatedRound.id)).where(FederatedRound.status == 'closed')
+        ).scalar()
+
+
+fedavg_aggregator = FedAvgAggregator()
@@ -0,0 +1,118 @@
+# 联邦学习模型更新的二进制编码
+import struct
+import numpy as np
+from app.services.federated_rounds import N_FEATURES, PARAM_SIZE, UpdateError, check_update
+
+# 头部：魔数、格式版本、编码方式、参数个数、基准版本（0 表示完整参数，否则为相对该全局版本的增量）、
+# top-k 的非零个数、样本数；小端序，共 24 字节，之后的数据块按 4 字节对齐
+HEADER = struct.Struct('<4sBBHIId')
+MAGIC = b'HMFL'
+FORMAT_VERSION = 1
+
+FLOAT32 = 'float32'  # float32 原始数组
+FLOAT16 = 'float16'  # float16 原始数组
+Q8 = 'q8'            # 按参数组做 8 位线性量化
+TOPK = 'topk'        # 只传绝对值最大的 k 个增量，必须指定基准版本
+ENCODINGS = (FLOAT32, FLOAT16, Q8, TOPK)
+_CODES = {name: code for code, name in enumerate(ENCODINGS, start=1)}
+_NAMES = {code: name for name, code in _CODES.items()}
+
+# 参数组：系数、截距、标准化均值、标准化标准差，量化时各组使用自己的取值范围
+SEGMENTS = (N_FEATURES, 1, N_FEATURES, N_FEATURES)
+_SEGMENT_INDEX = np.repeat(np.arange(len(SEGMENTS)), SEGMENTS)
+_SEGMENT_STARTS = np.concatenate([[0], np.cumsum(SEGMENTS)[:-1]])
+_Q8_LEVELS = 255
+
+
+def encode_update(params, samples, encoding=FLOAT32, base=None, base_version=0, top_k=None):
+    """把参数向量编码为二进制更新；指定 base（基准版本的参数向量）时编码相对它的增量"""
+    if encoding not in _CODES:
+        raise ValueError(f'不支持的编码方式: {encoding}')
+    values = np.asarray(params, dtype=np.float64)
+    if base is not None:
+        if not base_version:
+            raise ValueError('增量编码需要基准版本号')
+        values = values - base
+    elif encoding == TOPK:
+        raise ValueError('top-k 编码只能用于增量')
+    k = 0
+
+    if encoding == FLOAT32:
+        body = values.astype('<f4').tobytes()
+    elif encoding == FLOAT16:
+        body = values.astype('<f2').tobytes()
+    elif encoding == Q8:
+        low = np.minimum.reduceat(values, _SEGMENT_STARTS)
+        high = np.maximum.reduceat(values, _SEGMENT_STARTS)
+        step = np.where(high > low, (high - low) / _Q8_LEVELS, 1.0)
+        # 先转成 float32 再量化，解码时用同样的 float32 参数还原
+        low, step = low.astype('<f4'), step.astype('<f4')
+        codes = np.rint((values - low[_SEGMENT_INDEX]) / step[_SEGMENT_INDEX])
+        body = np.stack([low, step], axis=1).tobytes() + np.clip(codes, 0, _Q8_LEVELS).astype(np.uint8).tobytes()
+    else:
+        k = max(1, len(values) // 4) if top_k is None else top_k
+        if not 1 <= k <= len(values):
+            raise ValueError(f'top_k 必须在 1 到 {len(values)} 之间')
+        indices = np.sort(np.argpartition(-np.abs(values), k - 1)[:k])
+        body = values[indices].astype('<f4').tobytes() + indices.astype('<u2').tobytes()
+    return HEADER.pack(MAGIC, FORMAT_VERSION, _CODES[encoding], len(values), base_version, k, float(samples)) + body
+
+
+def read_header(payload):
+    """解析头部，返回 (编码方式, 参数个数, 基准版本, k, 样本数)"""
+    if len(payload) < HEADER.size:
+        raise UpdateError('模型更新数据过短')
+    magic, version, code, n, base_version, k, samples = HEADER.unpack_from(payload)
+    if magic != MAGIC:
+        raise UpdateError('不是有效的模型更新数据')
+    if version != FORMAT_VERSION:
+        raise UpdateError(f'不支持的模型更新格式版本: {version}')
+    if code not in _NAMES:
+        raise UpdateError(f'不支持的编码方式: {code}')
+    if n != PARAM_SIZE:
+        raise UpdateError(f'模型参数个数错误: {n}，应为 {PARAM_SIZE}')
+    return _NAMES[code], n, base_version, k, samples
+
+
+def decode_update(payload, base_params=None):
+    """解码二进制更新，返回 (参数向量, 样本数, 基准版本)
+
+    数据块直接用 np.frombuffer 映射到请求体上，不经过 Python 对象；
+    增量更新通过 base_params(版本号) 获取基准参数，找不到时返回 None。
+    """
+    encoding, n, base_version, k, samples = read_header(payload)
+    offset = HEADER.size
+    expected = {
+        FLOAT32: 4 * n,
+        FLOAT16: 2 * n,
+        Q8: 8 * len(SEGMENTS) + n,
+        TOPK: 6 * k
+    }[encoding]
+    if len(payload) - offset != expected:
+        raise UpdateError(f'模型更新数据长度错误: {len(payload) - offset}，应为 {expected}')
+
+    if encoding == FLOAT32:
+        values = np.frombuffer(payload, dtype='<f4', count=n, offset=offset).astype(np.float64)
+    elif encoding == FLOAT16:
+        values = np.frombuffer(payload, dtype='<f2', count=n, offset=offset).astype(np.float64)
+    elif encoding == Q8:
+        ranges = np.frombuffer(payload, dtype='<f4', count=2 * len(SEGMENTS), offset=offset).reshape(-1, 2)
+        codes = np.frombuffer(payload, dtype=np.uint8, count=n, offset=offset + ranges.nbytes)
+        values = ranges[_SEGMENT_INDEX, 0].astype(np.float64) + codes * ranges[_SEGMENT_INDEX, 1].astype(np.float64)
+    else:
+        if not base_version:
+            raise UpdateError('top-k 编码只能用于增量')
+        delta = np.frombuffer(payload, dtype='<f4', count=k, offset=offset)
+        indices = np.frombuffer(payload, dtype='<u2', count=k, offset=offset + 4 * k)
+        if k and indices.max() >= n:
+            raise UpdateError('top-k 下标越界')
+        values = np.zeros(n)
+        values[indices] = delta
+
+    if base_version:
+        base = base_params(base_version) if base_params is not None else None
+        if base is None:
+            raise UpdateError(f'基准全局模型版本 {base_version} 不存在', status=409)
+        values = base + values
+    params, samples = check_update(values, samples)
+    return params, samples, base_version
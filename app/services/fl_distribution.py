@@ -0,0 +1,101 @@
+# 全局模型分发：按版本号的增量下载
+import json
+import threading
+from collections import deque
+from flask import current_app
+from app import db
+from app.config import Config
+from app.models.federated_round import FederatedRound
+from app.services.federated_rounds import fedavg_aggregator, unpack_params
+from app.services.fl_codec import encode_update, FLOAT32, FLOAT16, Q8
+
+JSON = 'json'
+# 分发只使用稠密编码，top-k 会丢掉大部分参数的变化
+ENCODINGS = (JSON, FLOAT32, FLOAT16, Q8)
+
+
+class ModelDistribution:
+    """按版本分发全局模型，客户端已有某个版本时只下载从该版本到最新版本的增量
+
+    最近 FL_MODEL_DELTA_RING 个版本的参数保存在内存中的环形缓冲区里，增量由最新版本减去客户端版本得到；
+    更早的版本已移出环，返回完整模型。同一最新版本下编码好的响应体按 (客户端版本, 编码) 缓存，
+    发布新版本后整体丢弃，因此内存占用有上限。版本号来自数据库，多个工作进程各自填充自己的环。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ring = deque()
+        self._bodies = {}
+        self._bodies_version = None
+
+    @staticmethod
+    def _setting(name):
+        return current_app.config.get(name, getattr(Config, name))
+
+    @staticmethod
+    def etag(version):
+        return f'fl-{version}'
+
+    def _snapshot(self, version, latest):
+        """环中该版本的 (参数向量, 样本数)，不在最近 FL_MODEL_DELTA_RING 个版本内时返回 None"""
+        size = self._setting('FL_MODEL_DELTA_RING')
+        if version <= latest - size:
+            return None
+        with self._lock:
+            for entry in self._ring:
+                if entry[0] == version:
+                    return entry[1:]
+        params = fedavg_aggregator.global_params(version)
+        round_ = db.session.get(FederatedRound, version)
+        if params is None or round_ is None:
+            return None
+        with self._lock:
+            # 只保留窗口内的版本，按版本号排序
+            entries = [entry for entry in self._ring if entry[0] > latest - size and entry[0] != version]
+            entries.append((version, params, round_.total_samples))
+            self._ring = deque(sorted(entries, key=lambda entry: entry[0]), maxlen=size)
+        return params, round_.total_samples
+
+    def body(self, version, since=None, encoding=JSON):
+        """最新版本 version 相对客户端版本 since 的响应体，返回 (响应体, 实际使用的基准版本)
+
+        since 为 None 或已不在环中时返回完整模型，基准版本为 0。
+        """
+        if since and since <= version - self._setting('FL_MODEL_DELTA_RING'):
+            since = None
+        key = (since, encoding)
+        with self._lock:
+            if self._bodies_version != version:
+                self._bodies, self._bodies_version = {}, version
+            cached = self._bodies.get(key)
+        if cached is not None:
+            return cached
+
+        params, samples = self._snapshot(version, version)
+        base = self._snapshot(since, version) if since else None
+        base_version = since if base is not None else 0
+        if encoding == JSON:
+            result = {'version': version, 'base_version': base_version}
+            if base is not None:
+                result['delta'] = unpack_params(params - base[0])
+            else:
+                result.update(unpack_params(params))
+            body = json.dumps(result).encode()
+        else:
+            # 二进制格式与客户端上传更新相同，基准版本写在头部
+            body = encode_update(
+                params, samples, encoding,
+                base=base[0] if base is not None else None, base_version=base_version
+            )
+        with self._lock:
+            if self._bodies_version == version:
+                self._bodies[key] = (body, base_version)
+        return body, base_version
+
+    def clear(self):
+        with self._lock:
+            self._ring = deque()
+            self._bodies, self._bodies_version = {}, None
+
+
+model_distribution = ModelDistribution()
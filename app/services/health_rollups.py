@@ -0,0 +1,261 @@
+# 健康数据汇总服务
+import logging
+from datetime import datetime, timedelta
+import numpy as np
+import sqlalchemy as sa
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.config import Config
+from app.models.user import HealthRecord
+from app.models.health_rollup import HealthRollup
+from app.services.feature_extraction import load_columns
+
+# 参与汇总的指标
+ROLLUP_METRICS = (
+    'heart_rate', 'systolic_bp', 'diastolic_bp', 'blood_sugar',
+    'weight', 'sleep_hours', 'mood_score'
+)
+PERIODS = ('day', 'week')
+
+
+def _field(record, name):
+    return record.get(name) if isinstance(record, dict) else getattr(record, name, None)
+
+
+def _bucket_starts(days, period):
+    """datetime64[D] 数组转换为所在周期的起始日期，周从周一开始"""
+    if period == 'week':
+        # 1970-01-01 是周四，+3 后对 7 取余即为距离周一的天数
+        return days - ((days.astype(np.int64) + 3) % 7).astype('timedelta64[D]')
+    return days
+
+
+def period_bounds(value, period):
+    """返回时间点或日期所在周期的 [起始日期, 结束日期)"""
+    start = value.date() if isinstance(value, datetime) else value
+    if period == 'week':
+        start -= timedelta(days=start.weekday())
+        return start, start + timedelta(days=7)
+    return start, start + timedelta(days=1)
+
+
+class HealthRollupService:
+    """按日/周维护每个用户各项指标的 count/sum/min/max/last
+
+    新增记录时把整批记录的汇总增量原子地累加到汇总表；修改和删除无法从 min/max
+    中扣除，改为重新计算受影响的日/周桶，每个桶只扫描该时间段内的记录。
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        table = HealthRollup.__table__
+        newer = sa.or_(table.c.last_recorded_at.is_(None), table.c.last_recorded_at <= sa.bindparam('b_last_at'))
+        # 先更新 last_value 再更新 last_recorded_at，兼容按顺序求值 SET 子句的数据库
+        self._update = (
+            sa.update(table)
+            .where(table.c.id == sa.bindparam('b_id'))
+            .ordered_values(
+                (table.c.last_value, sa.case((newer, sa.bindparam('b_last')), else_=table.c.last_value)),
+                (table.c.last_recorded_at, sa.case((newer, sa.bindparam('b_last_at')), else_=table.c.last_recorded_at)),
+                (table.c.count, table.c.count + sa.bindparam('b_count')),
+                (table.c.value_sum, table.c.value_sum + sa.bindparam('b_sum')),
+                (table.c.min_value, sa.case(
+                    (sa.or_(table.c.min_value.is_(None), table.c.min_value > sa.bindparam('b_min')), sa.bindparam('b_min')),
+                    else_=table.c.min_value
+                )),
+                (table.c.max_value, sa.case(
+                    (sa.or_(table.c.max_value.is_(None), table.c.max_value < sa.bindparam('b_max')), sa.bindparam('b_max')),
+                    else_=table.c.max_value
+                )),
+                (table.c.updated_at, sa.bindparam('b_now'))
+            )
+        )
+
+    def compute_deltas(self, records, periods=PERIODS):
+        """整批计算记录对各汇总桶的增量，返回增量字典列表"""
+        records = list(records)
+        if not records:
+            return []
+        columns = load_columns(records)
+        user_ids = np.array([_field(r, 'user_id') for r in records], dtype=np.int64)
+        recorded_at = np.array([_field(r, 'recorded_at') for r in records], dtype='datetime64[us]')
+        valid = columns.valid & ~np.isnat(recorded_at)
+        days = recorded_at.astype('datetime64[D]')
+
+        deltas = []
+        for period in periods:
+            starts = _bucket_starts(days, period).astype(np.int64)
+            for metric in ROLLUP_METRICS:
+                values = columns[metric]
+                mask = valid & ~np.isnan(values)
+                if not mask.any():
+                    continue
+                values, timestamps = values[mask], recorded_at[mask]
+                keys, inverse = np.unique(
+                    np.stack([user_ids[mask], starts[mask]], axis=1), axis=0, return_inverse=True
+                )
+                inverse = inverse.ravel()
+                n = len(keys)
+                count = np.bincount(inverse, minlength=n)
+                total = np.bincount(inverse, weights=values, minlength=n)
+                mins = np.full(n, np.inf)
+                np.minimum.at(mins, inverse, values)
+                maxs = np.full(n, -np.inf)
+                np.maximum.at(maxs, inverse, values)
+                # 按 (桶, 时间) 排序后每个桶的最后一个即为最新值
+                order = np.lexsort((timestamps, inverse))
+                last = order[np.r_[inverse[order][1:] != inverse[order][:-1], True]]
+
+                period_starts = keys[:, 1].astype('datetime64[D]').astype(object)
+                last_at = timestamps[last].astype(object)
+                for k in range(n):
+                    deltas.append({
+                        'user_id': int(keys[k, 0]),
+                        'period': period,
+                        'period_start': period_starts[k],
+                        'metric': metric,
+                        'count': int(count[k]),
+                        'sum': float(total[k]),
+                        'min': float(mins[k]),
+                        'max': float(maxs[k]),
+                        'last': float(values[last[k]]),
+                        'last_at': last_at[k]
+                    })
+        return deltas
+
+    def _merge(self, deltas, retry=True):
+        """把增量累加到汇总表，已有的桶原子更新，不存在的桶插入"""
+        if not deltas:
+            return
+        table = HealthRollup.__table__
+        existing = dict(
+            ((row.user_id, row.period, row.period_start, row.metric), row.id)
+            for row in db.session.execute(
+                sa.select(table.c.id, table.c.user_id, table.c.period, table.c.period_start, table.c.metric)
+                .where(
+                    table.c.user_id.in_({d['user_id'] for d in deltas}),
+                    table.c.period.in_({d['period'] for d in deltas}),
+                    table.c.period_start.in_({d['period_start'] for d in deltas})
+                )
+            )
+        )
+
+        now = datetime.utcnow()
+        updates, inserts, pending = [], [], []
+        for d in deltas:
+            rollup_id = existing.get((d['user_id'], d['period'], d['period_start'], d['metric']))
+            if rollup_id is not None:
+                updates.append({
+                    'b_id': rollup_id, 'b_count': d['count'], 'b_sum': d['sum'], 'b_min': d['min'],
+                    'b_max': d['max'], 'b_last': d['last'], 'b_last_at': d['last_at'], 'b_now': now
+                })
+            else:
+                pending.append(d)
+                inserts.append({
+                    'user_id': d['user_id'], 'period': d['period'], 'period_start': d['period_start'],
+                    'metric': d['metric'], 'count': d['count'], 'value_sum': d['sum'],
+                    'min_value': d['min'], 'max_value': d['max'], 'last_value': d['last'],
+                    'last_recorded_at': d['last_at'], 'updated_at': now
+                })
+
+        if updates:
+            db.session.execute(self._update, updates)
+        if inserts:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(sa.insert(table), inserts)
+            except IntegrityError:
+                # 并发请求先创建了同一个桶，改为累加到已有行
+                if not retry:
+                    raise
+                self._merge(pending, retry=False)
+
+    def apply(self, records):
+        """新增记录后调用，与记录写入在同一个事务中"""
+        self._merge(self.compute_deltas(records))
+
+    def recompute_buckets(self, user_id, recorded_at_values):
+        """重新计算包含这些时间点的日/周汇总桶，用于记录修改和删除之后"""
+        buckets = {
+            (period,) + period_bounds(recorded_at, period)
+            for recorded_at in recorded_at_values if recorded_at is not None
+            for period in PERIODS
+        }
+        table = HealthRollup.__table__
+        for period, start, end in sorted(buckets):
+            db.session.execute(
+                sa.delete(table).where(
+                    table.c.user_id == user_id,
+                    table.c.period == period,
+                    table.c.period_start == start
+                )
+            )
+            records = HealthRecord.query.filter(
+                HealthRecord.user_id == user_id,
+                HealthRecord.recorded_at >= start,
+                HealthRecord.recorded_at < end
+            ).all()
+            self._merge(self.compute_deltas(records, periods=(period,)))
+
+    def refresh_record(self, record):
+        """记录修改或删除后刷新其所在的汇总桶"""
+        self.recompute_buckets(record.user_id, [record.recorded_at])
+
+    def rebuild(self, user_id=None, chunk_size=None):
+        """清空并按主键分块重建汇总表，返回处理的记录数"""
+        chunk_size = chunk_size or Config.ROLLUP_REBUILD_CHUNK_SIZE
+        table = HealthRollup.__table__
+        delete = sa.delete(table)
+        query = HealthRecord.query
+        if user_id is not None:
+            delete = delete.where(table.c.user_id == user_id)
+            query = query.filter(HealthRecord.user_id == user_id)
+        db.session.execute(delete)
+
+        processed, last_id = 0, 0
+        while True:
+            records = query.filter(HealthRecord.id > last_id).order_by(HealthRecord.id).limit(chunk_size).all()
+            if not records:
+                break
+            self.apply(records)
+            db.session.commit()
+            processed += len(records)
+            last_id = records[-1].id
+            self.logger.info(f"已重建 {processed} 条健康记录的汇总")
+        db.session.commit()
+        return processed
+
+    def trends(self, user_id, period='day', start=None, end=None, metrics=None):
+        """读取汇总表中的趋势数据，返回 {指标: [每个周期的汇总]}"""
+        if period not in PERIODS:
+            raise ValueError(f'不支持的汇总周期: {period}')
+        metrics = metrics or ROLLUP_METRICS
+        unknown = set(metrics) - set(ROLLUP_METRICS)
+        if unknown:
+            raise ValueError(f"不支持的指标: {', '.join(sorted(unknown))}")
+
+        query = HealthRollup.query.filter(
+            HealthRollup.user_id == user_id,
+            HealthRollup.period == period,
+            HealthRollup.metric.in_(metrics)
+        )
+        if start is not None:
+            query = query.filter(HealthRollup.period_start >= period_bounds(start, period)[0])
+        if end is not None:
+            query = query.filter(HealthRollup.period_start < end)
+
+        series = {metric: [] for metric in metrics}
+        for rollup in query.order_by(HealthRollup.period_start):
+            series[rollup.metric].append(rollup.to_dict())
+        return series
+
+    def daily_means(self, user_id, start=None, end=None):
+        """按日返回各指标均值，每天一个字典，可直接作为健康记录交给评分规则"""
+        days = {}
+        for metric, points in self.trends(user_id, 'day', start, end).items():
+            for point in points:
+                days.setdefault(point['date'], {'date': point['date']})[metric] = point['mean']
+        return [days[date] for date in sorted(days)]
+
+
+rollup_service = HealthRollupService()
@@ -0,0 +1,93 @@
+# 健康评分服务
+import numpy as np
+from app.services.feature_extraction import HealthColumns, load_columns
+from app.services.clinical_ranges import clinical_ranges
+
+
+class RangeRule:
+    """单项指标的正常范围规则，范围的所有列都落在 [下限, 上限] 内才算正常
+
+    具体数值来自临床范围配置中名为 range_name 的范围，配置热加载后立即生效。
+    """
+
+    def __init__(self, name, range_name=None):
+        self.name = name
+        self.range_name = range_name or name
+
+    def evaluate(self, columns, ranges):
+        """返回 (是否正常, 是否有数据) 两个布尔数组，任一列缺失视为无数据"""
+        missing, low, high = ranges[self.range_name].masks(columns)
+        present = ~missing
+        return present & ~low & ~high, present
+
+    def __repr__(self):
+        return f'<RangeRule {self.name} {self.range_name}>'
+
+
+class RuleSet:
+    """一组范围规则，整批记录一次完成评分和打标签
+
+    评分为正常指标数 / 有数据的指标数；设置 min_normal 时按正常指标个数打标签，
+    否则按评分是否达到 threshold 打标签。
+    """
+
+    def __init__(self, name, rules, threshold=0.7, min_normal=None):
+        self.name = name
+        self.rules = tuple(rules)
+        self.threshold = threshold
+        self.min_normal = min_normal
+
+    @staticmethod
+    def _columns(records):
+        return records if isinstance(records, HealthColumns) else load_columns(records)
+
+    def counts(self, records):
+        """返回每条记录的 (正常指标数, 有数据的指标数)"""
+        columns = self._columns(records)
+        ranges = clinical_ranges.current()
+        normal_count = np.zeros(len(columns), dtype=np.int64)
+        present_count = np.zeros(len(columns), dtype=np.int64)
+        for rule in self.rules:
+            normal, present = rule.evaluate(columns, ranges)
+            normal_count += normal
+            present_count += present
+        return normal_count, present_count
+
+    def score(self, records):
+        """健康评分，没有任何指标数据的记录为0"""
+        normal_count, present_count = self.counts(records)
+        return np.divide(
+            normal_count, present_count,
+            out=np.zeros(len(normal_count)), where=present_count > 0
+        )
+
+    def label(self, records):
+        """健康标签，True表示整体良好"""
+        if self.min_normal is not None:
+            normal_count, _ = self.counts(records)
+            return normal_count >= self.min_normal
+        return self.score(records) >= self.threshold
+
+
+HEART_RATE = RangeRule('heart_rate')
+BLOOD_PRESSURE = RangeRule('blood_pressure')
+BLOOD_SUGAR = RangeRule('blood_sugar')
+SLEEP_HOURS = RangeRule('sleep_hours')
+
+# 各服务使用的规则集，范围数值见 clinical_ranges.json
+DISEASE_RULES = RuleSet('disease', (
+    HEART_RATE, BLOOD_PRESSURE, BLOOD_SUGAR,
+    RangeRule('bmi'),
+    SLEEP_HOURS
+))
+FEDERATED_RULES = RuleSet('federated', (
+    HEART_RATE, BLOOD_PRESSURE, BLOOD_SUGAR, SLEEP_HOURS,
+    RangeRule('mood_score', 'mood_score_federated')
+))
+ALGORITHM_LABEL_RULES = RuleSet('algorithm_label', (HEART_RATE, BLOOD_PRESSURE, BLOOD_SUGAR))
+ALGORITHM_SCORE_RULES = RuleSet('algorithm_score', FEDERATED_RULES.rules)
+RECOMMENDATION_RULES = RuleSet('recommendation', (
+    HEART_RATE, BLOOD_PRESSURE, BLOOD_SUGAR, SLEEP_HOURS,
+    RangeRule('mood_score', 'mood_score_good'),
+    RangeRule('weight')
+), min_normal=4)
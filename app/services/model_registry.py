@@ -0,0 +1,149 @@
+# 模型注册表
+import os
+import threading
+import time
+from app.config import Config
+
+
+def _joblib_load(path):
+    # joblib 在首次加载模型时才导入
+    import joblib
+    return joblib.load(path)
+
+
+def _joblib_dump(obj, path):
+    import joblib
+    joblib.dump(obj, path)
+
+
+class ModelRegistry:
+    """进程级模型注册表
+
+    每个工作进程对同一个模型文件只反序列化一次，之后直接返回缓存对象；
+    磁盘上的文件被替换（mtime/size/inode 变化）时自动重新加载，实现热替换。
+    """
+
+    def __init__(self, check_interval=1.0):
+        # 两次检查文件变化之间的最小间隔（秒），避免每次请求都 stat 文件
+        self.check_interval = check_interval
+        self._entries = {}
+        self._stats = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _signature(path):
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def _stat_entry(self, path):
+        stats = self._stats.get(path)
+        if stats is None:
+            stats = self._stats[path] = {
+                'hits': 0,
+                'misses': 0,
+                'loads': 0,
+                'reloads': 0,
+                'last_load_seconds': None,
+                'total_load_seconds': 0.0,
+                'loaded_at': None
+            }
+        return stats
+
+    def get(self, path, loader=_joblib_load):
+        """获取模型对象，文件不存在时返回None"""
+        path = os.path.abspath(path)
+        entry = self._entries.get(path)
+        if entry is not None and time.monotonic() - entry['checked_at'] < self.check_interval:
+            self._stat_entry(path)['hits'] += 1
+            return entry['obj']
+
+        with self._lock:
+            stats = self._stat_entry(path)
+            entry = self._entries.get(path)
+            try:
+                signature = self._signature(path)
+            except FileNotFoundError:
+                self._entries.pop(path, None)
+                stats['misses'] += 1
+                return None
+
+            if entry is not None and entry['signature'] == signature:
+                entry['checked_at'] = time.monotonic()
+                stats['hits'] += 1
+                return entry['obj']
+
+            # 首次加载或文件已变化，重新反序列化
+            start = time.perf_counter()
+            obj = loader(path)
+            elapsed = time.perf_counter() - start
+
+            self._entries[path] = {
+                'obj': obj,
+                'signature': signature,
+                'checked_at': time.monotonic()
+            }
+            stats['misses'] += 1
+            stats['loads'] += 1
+            if entry is not None:
+                stats['reloads'] += 1
+            stats['last_load_seconds'] = elapsed
+            stats['total_load_seconds'] += elapsed
+            stats['loaded_at'] = time.time()
+            return obj
+
+    def get_many(self, paths, loader=_joblib_load):
+        """一次性获取一组相互依赖的模型（如模型和标准化器），保证不会读到新旧混合的组合"""
+        with self._lock:
+            return [self.get(path, loader=loader) for path in paths]
+
+    def publish(self, path, obj, dumper=_joblib_dump):
+        """原子地发布模型：先写入临时文件，再用 os.replace 替换正式文件"""
+        self.publish_many({path: obj}, dumper=dumper)
+
+    def publish_many(self, artifacts, dumper=_joblib_dump):
+        """原子地发布一组模型文件
+
+        先写好全部临时文件再依次 os.replace，本进程缓存在同一把锁内一起切换；
+        其他进程在下一次检查文件变化时加载到新版本。
+        """
+        staged = []
+        try:
+            for path, obj in artifacts.items():
+                path = os.path.abspath(path)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+                staged.append((path, tmp_path, obj))
+                dumper(obj, tmp_path)
+
+            with self._lock:
+                for path, tmp_path, obj in staged:
+                    os.replace(tmp_path, path)
+                    self._entries[path] = {
+                        'obj': obj,
+                        'signature': self._signature(path),
+                        'checked_at': time.monotonic()
+                    }
+                    self._stat_entry(path)['loaded_at'] = time.time()
+        finally:
+            for _, tmp_path, _ in staged:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    def invalidate(self, path=None):
+        """丢弃缓存，下次访问时重新加载"""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(path), None)
+
+    def stats(self):
+        """返回每个模型文件的加载耗时和缓存命中统计"""
+        with self._lock:
+            return {
+                path: dict(stats, cached=path in self._entries)
+                for path, stats in self._stats.items()
+            }
+
+
+model_registry = ModelRegistry(check_interval=Config.MODEL_RELOAD_INTERVAL)
@@ -0,0 +1,109 @@
+# 密码哈希服务
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from flask import current_app, has_app_context
+from werkzeug.security import generate_password_hash, check_password_hash
+from app.config import Config
+
+
+class PasswordHasherBusy(Exception):
+    """哈希线程池已满，请求应以503拒绝"""
+
+
+class PasswordHasher:
+    """在有界线程池中计算和校验密码哈希
+
+    scrypt/pbkdf2 每次要占用几十到上百毫秒CPU，放在固定大小的线程池里执行，
+    同时在执行和排队的任务总数超过上限时直接拒绝，登录高峰不会占满所有请求工作线程。
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._executor = None
+        self._slots = None
+        self._method_prefixes = {}
+        self._lock = threading.Lock()
+        self._stats = {'submitted': 0, 'rejected': 0, 'timeouts': 0, 'rehashed': 0, 'total_seconds': 0.0}
+
+    def _config(self, name):
+        if has_app_context():
+            return current_app.config.get(name, getattr(Config, name))
+        return getattr(Config, name)
+
+    @property
+    def method(self):
+        return self._config('PASSWORD_HASH_METHOD')
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    workers = self._config('PASSWORD_HASH_WORKERS')
+                    # 允许同时存在的任务数 = 执行中 + 排队中
+                    self._slots = threading.BoundedSemaphore(workers + self._config('PASSWORD_HASH_QUEUE_SIZE'))
+                    self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        return self._executor
+
+    def _run(self, func, *args):
+        executor = self._get_executor()
+        if not self._slots.acquire(blocking=False):
+            self._stats['rejected'] += 1
+            raise PasswordHasherBusy('密码校验请求过多')
+        self._stats['submitted'] += 1
+        start = time.perf_counter()
+        try:
+            future = executor.submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self._config('PASSWORD_HASH_TIMEOUT'))
+        except FutureTimeoutError:
+            self._stats['timeouts'] += 1
+            raise PasswordHasherBusy('密码校验超时')
+        finally:
+            self._stats['total_seconds'] += time.perf_counter() - start
+
+    def hash(self, password):
+        """按当前配置的算法和参数计算密码哈希"""
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        if not password_hash:
+            return False
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """哈希的算法或参数与当前配置不同时需要重新计算"""
+        method = self.method
+        prefix = self._method_prefixes.get(method)
+        if prefix is None:
+            # 用一次哈希得到完整的算法参数，如 scrypt -> scrypt:32768:8:1
+            prefix = self._method_prefixes[method] = generate_password_hash('', method).split('$', 1)[0]
+        return password_hash.split('$', 1)[0] != prefix
+
+    def verify_and_update(self, user, password):
+        """校验密码，成功且哈希参数已过时时顺便重新计算哈希（调用方负责提交）"""
+        if not self.verify(user.password_hash, password):
+            return False
+        if self.needs_rehash(user.password_hash):
+            try:
+                user.password_hash = self.hash(password)
+                self._stats['rehashed'] += 1
+            except PasswordHasherBusy:
+                # 繁忙时下次登录再更新，不影响本次登录
+                pass
+        return True
+
+    def stats(self):
+        stats = dict(self._stats, method=self.method)
+        submitted = stats['submitted']
+        stats['avg_seconds'] = stats['total_seconds'] / submitted if submitted else None
+        return stats
+
+
+password_hasher = PasswordHasher()
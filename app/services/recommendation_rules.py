@@ -0,0 +1,248 @@
+# 健康建议规则引擎
+import numpy as np
+from app.services.feature_extraction import HealthColumns, load_columns
+from app.services.clinical_ranges import clinical_ranges
+
+# 指标状态编码
+UNKNOWN, LOW, NORMAL, HIGH = 0, 1, 2, 3
+STATUS_NAMES = ('unknown', 'low', 'normal', 'high')
+
+# 没有针对性建议时使用的默认建议
+DEFAULT_ADVICE = ("请咨询专业医生获取更详细的建议",)
+ALL_NORMAL_ADVICE = "您的各项健康指标都在正常范围内，请继续保持当前的健康生活方式！"
+
+
+class MetricRule:
+    """单个指标的规则：正常范围、各状态的描述和异常时的建议
+
+    正常范围取临床范围配置中名为 range_name 的范围，任一列缺失为 unknown，否则任一列
+    低于下限为 low，否则任一列高于上限为 high。display_field 为返回给前端的原始值字段。
+    """
+
+    def __init__(self, metric, descriptions, advice, range_name=None, display_field=None):
+        self.metric = metric
+        self.range_name = range_name or metric
+        self.descriptions = descriptions
+        self.advice = {LOW: tuple(advice.get('low', DEFAULT_ADVICE)), HIGH: tuple(advice.get('high', DEFAULT_ADVICE))}
+        self.display_field = display_field or metric
+
+    def evaluate(self, columns, ranges):
+        """返回每条记录的状态编码数组"""
+        unknown, low, high = ranges[self.range_name].masks(columns)
+        return np.select([unknown, low, high], [UNKNOWN, LOW, HIGH], NORMAL).astype(np.int8)
+
+    def describe(self, status):
+        return self.descriptions[STATUS_NAMES[status]]
+
+    def __repr__(self):
+        return f'<MetricRule {self.metric} {self.range_name}>'
+
+
+class RecommendationEngine:
+    """表驱动的健康建议引擎，一次评估整批记录的全部指标"""
+
+    def __init__(self, rules):
+        self.rules = tuple(rules)
+        self.metrics = tuple(rule.metric for rule in self.rules)
+        self.range_names = tuple(rule.range_name for rule in self.rules)
+        self._advice_cache = {}
+
+    def digest(self, ranges=None):
+        """引擎所用临床范围的摘要，只有这些范围改变时才变化，用于缓存失效"""
+        return (ranges or clinical_ranges.current()).digest(self.range_names)
+
+    def evaluate(self, records, ranges=None):
+        """返回 (HealthColumns, 状态矩阵[n, 指标数])"""
+        columns = records if isinstance(records, HealthColumns) else load_columns(records)
+        ranges = ranges or clinical_ranges.current()
+        status = np.empty((len(columns), len(self.rules)), dtype=np.int8)
+        for j, rule in enumerate(self.rules):
+            status[:, j] = rule.evaluate(columns, ranges)
+        return columns, status
+
+    def _advice(self, pattern):
+        """某一组指标状态对应的建议列表，相同的状态组合只生成一次"""
+        advice = self._advice_cache.get(pattern)
+        if advice is None:
+            advice = []
+            for rule, status in zip(self.rules, pattern):
+                if status in (LOW, HIGH):
+                    advice.extend(rule.advice[status])
+            if not advice:
+                advice.append(ALL_NORMAL_ADVICE)
+            advice = self._advice_cache[pattern] = tuple(advice)
+        return advice
+
+    def recommend(self, status):
+        """根据状态矩阵生成每条记录的建议"""
+        patterns, inverse = np.unique(status, axis=0, return_inverse=True)
+        advice = [self._advice(tuple(int(s) for s in pattern)) for pattern in patterns]
+        return [list(advice[k]) for k in inverse.ravel()]
+
+    def _analyses(self, records, status):
+        results = []
+        for i, record in enumerate(records):
+            analysis = {}
+            for j, rule in enumerate(self.rules):
+                value = record.get(rule.display_field) if isinstance(record, dict) else getattr(record, rule.display_field, None)
+                analysis[rule.metric] = {
+                    'value': value,
+                    'status': STATUS_NAMES[status[i, j]],
+                    'description': rule.describe(status[i, j])
+                }
+            results.append(analysis)
+        return results
+
+    def analyze(self, records, ranges=None):
+        """批量分析，返回每条记录的 {指标: {value, status, description}}"""
+        records = list(records)
+        _, status = self.evaluate(records, ranges)
+        return self._analyses(records, status)
+
+    def analyze_and_recommend(self, records, ranges=None):
+        """批量分析并生成建议，返回 [{'analysis': ..., 'recommendations': ...}]"""
+        records = list(records)
+        if not records:
+            return []
+        _, status = self.evaluate(records, ranges)
+        return [
+            {'analysis': analysis, 'recommendations': recommendations}
+            for analysis, recommendations in zip(self._analyses(records, status), self.recommend(status))
+        ]
+
+    def recommendations_for(self, analysis):
+        """根据单条分析结果生成建议"""
+        pattern = tuple(
+            STATUS_NAMES.index(analysis[metric]['status']) if metric in analysis else UNKNOWN
+            for metric in self.metrics
+        )
+        return list(self._advice(pattern))
+
+
+# 各指标的规则表，正常范围数值见 clinical_ranges.json
+METRIC_RULES = (
+    MetricRule(
+        'heart_rate',  # 每分钟心跳次数
+        {
+            'low': "心率偏低，可能感觉疲劳或头晕",
+            'normal': "心率正常，心脏功能良好",
+            'high': "心率偏高，可能感觉心跳加快或焦虑",
+            'unknown': "暂无心率数据"
+        },
+        {
+            'low': [
+                "适当进行有氧运动，如散步、慢跑等",
+                "保持充足的休息和睡眠",
+                "如果经常感觉头晕或疲劳，建议咨询医生"
+            ],
+            'high': [
+                "避免剧烈运动和情绪激动",
+                "学习放松技巧，如深呼吸",
+                "减少咖啡因的摄入"
+            ]
+        }
+    ),
+    MetricRule(
+        # 按存储的收缩压/舒张压判断，返回原始的"收缩压/舒张压"字符串
+        'blood_pressure',
+        {
+            'low': "血压偏低，可能感觉头晕或疲劳",
+            'normal': "血压正常，循环系统功能良好",
+            'high': "血压偏高，需要注意控制",
+            'unknown': "血压数据格式错误"
+        },
+        {
+            'low': [
+                "适当增加盐分摄入",
+                "保持充足的水分补充",
+                "避免突然起立或剧烈运动"
+            ],
+            'high': [
+                "限制盐分摄入",
+                "保持规律运动",
+                "避免压力和情绪波动"
+            ]
+        }
+    ),
+    MetricRule(
+        'blood_sugar',  # mmol/L
+        {
+            'low': "血糖偏低，可能感觉饥饿或头晕",
+            'normal': "血糖正常，代谢功能良好",
+            'high': "血糖偏高，需要注意控制",
+            'unknown': "暂无血糖数据"
+        },
+        {
+            'low': [
+                "规律进食，避免长时间空腹",
+                "随身携带含糖食物以应对低血糖",
+                "注意营养均衡，适量增加碳水化合物摄入"
+            ],
+            'high': [
+                "控制碳水化合物的摄入",
+                "增加运动量",
+                "规律监测血糖水平"
+            ]
+        }
+    ),
+    MetricRule(
+        'sleep_hours',  # 小时
+        {
+            'low': "睡眠时间不足，可能影响日间表现",
+            'normal': "睡眠时间适中，有助于身体恢复",
+            'high': "睡眠时间过长，可能影响身体状态",
+            'unknown': "暂无睡眠数据"
+        },
+        {
+            'low': [
+                "保持规律的作息时间",
+                "创造良好的睡眠环境",
+                "避免睡前使用电子设备"
+            ],
+            'high': [
+                "适当增加日间活动量",
+                "避免日间过长的午睡",
+                "保持规律的作息时间"
+            ]
+        }
+    ),
+    MetricRule(
+        'mood_score',  # 1-10分
+        {
+            'low': "心情状态欠佳，需要适当调节",
+            'normal': "心情状态良好，请继续保持",
+            'high': "心情状态良好，请继续保持",
+            'unknown': "暂无心情评分"
+        },
+        {
+            'low': [
+                "尝试进行放松活动，如瑜伽或冥想",
+                "与亲朋好友多交流",
+                "适当参加户外活动，增加阳光接触"
+            ]
+        }
+    ),
+    MetricRule(
+        'weight',  # BMI范围
+        {
+            'low': "体重偏低，需要适当增加营养摄入",
+            'normal': "体重正常，身体状态良好",
+            'high': "体重偏高，需要注意控制",
+            'unknown': "暂无体重数据"
+        },
+        {
+            'low': [
+                "适当增加饮食量",
+                "增加优质蛋白质的摄入",
+                "进行适度的力量训练"
+            ],
+            'high': [
+                "控制饮食摄入量",
+                "增加运动频率",
+                "选择低热量、高营养的食物"
+            ]
+        }
+    ),
+)
+
+recommendation_engine = RecommendationEngine(METRIC_RULES)
@@ -0,0 +1,109 @@
+# 预计算健康建议存储服务
+import logging
+from datetime import datetime
+import sqlalchemy as sa
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.config import Config
+from app.models.user import User, HealthRecord
+from app.models.user_recommendation import UserRecommendation
+from app.services.clinical_ranges import clinical_ranges
+from app.services.recommendation_rules import recommendation_engine
+from app.utils.response_cache import get_data_version
+
+
+class RecommendationStore:
+    """按用户保存基于最新健康记录的分析结果和建议
+
+    precompute_all 每晚批量为所有用户计算（flask precompute-recommendations），接口直接返回
+    保存的结果；保存时记下用户数据版本和所用临床范围的摘要，用户写入新记录或建议引擎所用的
+    范围被修改后，下次请求时重新计算并保存。
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def _latest_records(user_ids):
+        """每个用户最近的一条健康记录"""
+        ranked = sa.select(
+            HealthRecord.id,
+            sa.func.row_number().over(
+                partition_by=HealthRecord.user_id,
+                order_by=(HealthRecord.recorded_at.desc(), HealthRecord.id.desc())
+            ).label('rn')
+        ).where(HealthRecord.user_id.in_(user_ids)).subquery()
+        return HealthRecord.query.join(ranked, ranked.c.id == HealthRecord.id).filter(ranked.c.rn == 1).all()
+
+    @staticmethod
+    def _row(record, result, data_version, rules_digest, now):
+        return {
+            'user_id': record.user_id,
+            'data_version': data_version,
+            'rules_digest': rules_digest,
+            'record_id': record.id,
+            'analysis': result['analysis'],
+            'recommendations': result['recommendations'],
+            'computed_at': now
+        }
+
+    def precompute_all(self, chunk_size=None):
+        """按用户主键分块为所有有健康记录的用户重新计算建议，返回处理的用户数"""
+        chunk_size = chunk_size or Config.RECOMMENDATION_PRECOMPUTE_CHUNK_SIZE
+        table = UserRecommendation.__table__
+        processed, last_id = 0, 0
+        while True:
+            # 先读数据版本再读记录，期间写入的新记录会使版本不一致，请求时重新计算
+            versions = dict(db.session.execute(
+                sa.select(User.id, User.data_version).where(User.id > last_id).order_by(User.id).limit(chunk_size)
+            ).all())
+            if not versions:
+                break
+            records = self._latest_records(list(versions))
+            ranges = clinical_ranges.current()
+            rules_digest = recommendation_engine.digest(ranges)
+            results = recommendation_engine.analyze_and_recommend(records, ranges)
+
+            now = datetime.utcnow()
+            db.session.execute(sa.delete(table).where(table.c.user_id.in_(list(versions))))
+            if records:
+                db.session.execute(sa.insert(table), [
+                    self._row(record, result, versions[record.user_id] or 0, rules_digest, now)
+                    for record, result in zip(records, results)
+                ])
+            db.session.commit()
+            processed += len(records)
+            last_id = max(versions)
+            self.logger.info(f"已预计算 {processed} 个用户的健康建议")
+        return processed
+
+    def get(self, user_id):
+        """返回用户当前有效的建议，保存的结果已过期时重新计算；没有健康记录时返回None"""
+        data_version = get_data_version(user_id)
+        ranges = clinical_ranges.current()
+        rules_digest = recommendation_engine.digest(ranges)
+        stored = db.session.get(UserRecommendation, user_id)
+        if stored is not None and stored.data_version == data_version and stored.rules_digest == rules_digest:
+            return stored
+
+        record = HealthRecord.latest_for_user(user_id)
+        if record is None:
+            return None
+        result = recommendation_engine.analyze_and_recommend([record], ranges)[0]
+        row = self._row(record, result, data_version, rules_digest, datetime.utcnow())
+        try:
+            with db.session.begin_nested():
+                if stored is None:
+                    stored = UserRecommendation(**row)
+                    db.session.add(stored)
+                else:
+                    for name, value in row.items():
+                        setattr(stored, name, value)
+            db.session.commit()
+        except IntegrityError:
+            # 并发请求已保存了同一用户的建议，本次结果直接返回
+            stored = UserRecommendation(**row)
+        return stored
+
+
+recommendation_store = RecommendationStore()
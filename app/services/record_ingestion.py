@@ -0,0 +1,149 @@
+# 健康记录批量导入服务
+import logging
+from datetime import datetime, timezone
+import numpy as np
+from app import db
+from app.config import Config
+from app.models.user import HealthRecord
+from app.services.feature_extraction import load_columns
+from app.services.health_rollups import rollup_service
+
+# 各指标的合理取值范围，超出范围视为录入错误
+VALID_RANGES = {
+    'heart_rate': (20, 250),
+    'systolic_bp': (50, 260),
+    'diastolic_bp': (30, 160),
+    'blood_sugar': (0.5, 40),
+    'weight': (1, 500),
+    'sleep_hours': (0, 24),
+    'mood_score': (1, 10)
+}
+
+# 数据库中为整数类型的指标
+INTEGER_FIELDS = ('heart_rate', 'mood_score', 'systolic_bp', 'diastolic_bp')
+
+METRIC_FIELDS = (
+    'heart_rate', 'systolic_bp', 'diastolic_bp', 'blood_sugar',
+    'weight', 'sleep_hours', 'mood_score'
+)
+
+
+class RecordIngestionService:
+    """健康记录批量导入：整批向量化校验，分块批量插入"""
+
+    def __init__(self, chunk_size=None):
+        self.logger = logging.getLogger(__name__)
+        self.chunk_size = chunk_size or Config.BULK_INSERT_CHUNK_SIZE
+
+    def _parse_recorded_at(self, records, errors):
+        """解析记录时间，缺失时为None"""
+        values = [
+            record.get('recorded_at') if isinstance(record, dict) else None
+            for record in records
+        ]
+        if all(v is None or isinstance(v, str) for v in values):
+            try:
+                parsed = np.array([v or None for v in values], dtype='datetime64[us]')
+                return parsed.astype(object)
+            except (ValueError, TypeError):
+                pass
+
+        # 含时区、datetime对象或格式不规范时逐行解析
+        result = [None] * len(values)
+        for i, value in enumerate(values):
+            if not value:
+                continue
+            try:
+                parsed = value if isinstance(value, datetime) else datetime.fromisoformat(value)
+                if parsed.tzinfo is not None:
+                    parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+                result[i] = parsed
+            except (TypeError, ValueError):
+                errors.setdefault(i, f'无效的记录时间: {value!r}')
+        return result
+
+    def validate(self, records):
+        """校验一批记录，返回 (可插入的行, 对应的原始下标, 行错误字典)"""
+        columns = load_columns(records)
+        errors = columns.errors
+
+        # 向量化范围检查：缺失值允许，存在的值必须在合理范围内
+        for field, (low, high) in VALID_RANGES.items():
+            values = columns[field]
+            with np.errstate(invalid='ignore'):
+                bad = ~np.isnan(values) & ((values < low) | (values > high))
+            for i in np.flatnonzero(bad):
+                errors.setdefault(int(i), f'{field} 超出合理范围 [{low}, {high}]: {values[i]:g}')
+
+        for field in INTEGER_FIELDS:
+            values = columns[field]
+            with np.errstate(invalid='ignore'):
+                bad = ~np.isnan(values) & (values != np.round(values))
+            for i in np.flatnonzero(bad):
+                errors.setdefault(int(i), f'{field} 必须是整数: {values[i]:g}')
+
+        partial = np.isnan(columns['systolic_bp']) != np.isnan(columns['diastolic_bp'])
+        for i in np.flatnonzero(partial):
+            errors.setdefault(int(i), '收缩压和舒张压必须同时提供')
+
+        present = np.zeros(len(columns), dtype=bool)
+        for field in METRIC_FIELDS:
+            present |= ~np.isnan(columns[field])
+        for i in np.flatnonzero(~present):
+            errors.setdefault(int(i), '记录中没有任何健康指标')
+
+        recorded_at = self._parse_recorded_at(records, errors)
+
+        valid = np.flatnonzero(columns.valid)
+        # 转换为Python对象列，NaN转换为None
+        values = {}
+        for field in METRIC_FIELDS:
+            column = columns[field][valid]
+            mask = np.isnan(column)
+            column = column.astype(object)
+            if field in INTEGER_FIELDS:
+                column[~mask] = column[~mask].astype(float).astype(int)
+            column[mask] = None
+            values[field] = column.tolist()
+
+        now = datetime.utcnow()
+        rows = []
+        for k, i in enumerate(valid):
+            row = {field: values[field][k] for field in METRIC_FIELDS}
+            # 只提供了收缩压/舒张压数值时补全血压字符串
+            row['blood_pressure'] = records[i].get('blood_pressure') or (
+                f"{row['systolic_bp']}/{row['diastolic_bp']}" if row['systolic_bp'] is not None else None
+            )
+            row['recorded_at'] = recorded_at[i] or now
+            rows.append(row)
+        return rows, valid.tolist(), errors
+
+    def ingest(self, user_id, records):
+        """校验并分块写入健康记录，每块一个事务；某一块写入失败不影响其他块"""
+        rows, indices, errors = self.validate(records)
+        for row in rows:
+            row['user_id'] = user_id
+        inserted = 0
+
+        for start in range(0, len(rows), self.chunk_size):
+            chunk = rows[start:start + self.chunk_size]
+            try:
+                db.session.execute(db.insert(HealthRecord), chunk)
+                # 汇总表的增量与记录在同一个事务中提交
+                rollup_service.apply(chunk)
+                db.session.commit()
+                inserted += len(chunk)
+            except Exception as e:
+                db.session.rollback()
+                self.logger.error(f"批量写入健康记录失败: {str(e)}")
+                for index in indices[start:start + self.chunk_size]:
+                    errors.setdefault(index, f'写入失败: {str(e)}')
+
+        return {
+            'inserted': inserted,
+            'failed': len(errors),
+            'errors': [
+                {'index': index, 'error': message}
+                for index, message in sorted(errors.items())
+            ]
+        }
@@ -0,0 +1,83 @@
+# 训练任务队列服务
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import current_app
+from app import db
+from app.config import Config
+from app.models.training_job import TrainingJob
+
+
+class TrainingJobError(Exception):
+    """训练任务的业务错误，message 会原样写入任务状态"""
+
+
+class TrainingJobQueue:
+    """本地训练任务队列
+
+    任务状态保存在 training_jobs 表中，训练在进程内的线程池里执行，
+    提交后立即返回任务ID，请求线程不再被模型训练阻塞。
+    """
+
+    def __init__(self, max_workers=None):
+        self.logger = logging.getLogger(__name__)
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    workers = self.max_workers or current_app.config.get('TRAINING_WORKERS', Config.TRAINING_WORKERS)
+                    self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='training')
+        return self._executor
+
+    def submit(self, kind, user_id, func, *args, **kwargs):
+        """提交训练任务，func 会额外收到 progress 关键字参数用于汇报进度"""
+        job = TrainingJob(id=uuid.uuid4().hex, user_id=user_id, kind=kind, status='queued')
+        db.session.add(job)
+        db.session.commit()
+
+        app = current_app._get_current_object()
+        self._get_executor().submit(self._run, app, job.id, func, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        return db.session.get(TrainingJob, job_id)
+
+    def _update(self, job_id, **fields):
+        job = db.session.get(TrainingJob, job_id)
+        for key, value in fields.items():
+            setattr(job, key, value)
+        db.session.commit()
+
+    def _run(self, app, job_id, func, args, kwargs):
+        with app.app_context():
+            self._update(job_id, status='running', started_at=datetime.utcnow(), progress=0.0)
+
+            def progress(fraction, message=None):
+                fields = {'progress': float(fraction)}
+                if message is not None:
+                    fields['message'] = message
+                self._update(job_id, **fields)
+
+            try:
+                result = func(*args, progress=progress, **kwargs)
+                self._update(
+                    job_id, status='succeeded', progress=1.0, result=result,
+                    message=(result or {}).get('message', '训练完成'),
+                    finished_at=datetime.utcnow()
+                )
+            except Exception as e:
+                db.session.rollback()
+                if not isinstance(e, TrainingJobError):
+                    self.logger.exception(f"训练任务 {job_id} 失败")
+                self._update(job_id, status='failed', message=str(e)[:255], finished_at=datetime.utcnow())
+            finally:
+                db.session.remove()
+
+
+training_queue = TrainingJobQueue()
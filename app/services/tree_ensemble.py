@@ -0,0 +1,166 @@
+# 编译后的树集成模型推理
+import numpy as np
+
+# 输出的汇总方式
+LOGISTIC_SUM = 'logistic_sum'  # 梯度提升：初始值 + 各树叶子值之和，再做 sigmoid
+MEAN = 'mean'                  # 随机森林：各树叶子上的正类概率取平均
+
+
+def _readonly(array, dtype):
+    array = np.ascontiguousarray(array, dtype=dtype)
+    array.setflags(write=False)
+    return array
+
+
+def _sibling_order(tree):
+    """按层重新排列节点，使每个分裂节点的左右子节点相邻（右子节点 = 左子节点 + 1）"""
+    order = [0]
+    for node in order:
+        if tree.children_left[node] >= 0:
+            order.extend((tree.children_left[node], tree.children_right[node]))
+    return np.array(order, dtype=np.intp)
+
+
+class CompiledEnsemble:
+    """把多个 sklearn 树集成模型展平成一组连续的节点数组，一次向量化遍历同时得到所有输出
+
+    所有树的节点依次拼接：feature/threshold 描述分裂，child 为左子节点（右子节点紧随其后），
+    value 为叶子的输出值（梯度提升已乘学习率，随机森林为正类概率），叶子节点的 child
+    指向自身。遍历时所有 (行, 树) 组合一起向下走一层，已到叶子的组合不再参与计算。
+    与 sklearn 一致，特征先转为 float32 再与 float64 阈值比较，标准化也按 StandardScaler
+    的原地运算方式计算，结果与 predict_proba 一致。预测时只依赖 numpy，工作进程不需要导入 sklearn。
+    """
+
+    # 每次遍历的行数，让中间数组留在CPU缓存中
+    CHUNK_ROWS = 1024
+
+    def __init__(self, names, kinds, offsets, tree_output, roots, feature, threshold,
+                 child, value, max_depth, mean=None, scale=None):
+        self.names = tuple(names)
+        self.kinds = tuple(kinds)
+        self.offsets = _readonly(offsets, np.float64)
+        self.tree_output = _readonly(tree_output, np.intp)
+        self.roots = _readonly(roots, np.intp)
+        self.feature = _readonly(feature, np.intp)
+        self.threshold = _readonly(threshold, np.float64)
+        self.child = _readonly(child, np.intp)
+        self.value = _readonly(value, np.float64)
+        self.max_depth = int(max_depth)
+        self.mean = None if mean is None else _readonly(mean, np.float64)
+        self.scale = None if scale is None else _readonly(scale, np.float64)
+        self.is_leaf = _readonly(self.child == np.arange(len(self.child)), bool)
+        self.n_trees = len(self.roots)
+        self.n_nodes = len(self.feature)
+        # 同一输出的树是连续存放的，预测时按切片取叶子值
+        self._slices = [
+            slice(*np.searchsorted(self.tree_output, [output, output + 1]))
+            for output in range(len(self.names))
+        ]
+
+    @classmethod
+    def compile(cls, models, scaler=None):
+        """models 为 {输出名: 已训练的二分类 GradientBoostingClassifier 或 RandomForestClassifier}"""
+        names, kinds, offsets, tree_output = [], [], [], []
+        nodes = {'roots': [], 'feature': [], 'threshold': [], 'child': [], 'value': []}
+        count, max_depth = 0, 0
+
+        def add_tree(tree, leaf_values):
+            nonlocal count, max_depth
+            order = _sibling_order(tree)
+            position = np.empty(tree.node_count, dtype=np.intp)
+            position[order] = np.arange(len(order)) + count
+            is_leaf = tree.children_left[order] < 0
+            nodes['roots'].append(count)
+            nodes['feature'].append(np.where(is_leaf, 0, tree.feature[order]))
+            nodes['threshold'].append(np.where(is_leaf, np.inf, tree.threshold[order]))
+            nodes['child'].append(np.where(is_leaf, position[order], position[np.maximum(tree.children_left[order], 0)]))
+            nodes['value'].append(np.where(is_leaf, leaf_values[order], 0.0))
+            count += len(order)
+            max_depth = max(max_depth, tree.max_depth)
+
+        for output, (name, model) in enumerate(models.items()):
+            if len(getattr(model, 'classes_', ())) != 2:
+                raise ValueError(f'{name}: 只支持二分类模型')
+            names.append(name)
+            if hasattr(model, 'estimators_') and hasattr(model, 'learning_rate'):
+                # 梯度提升：每个阶段一棵回归树，叶子值乘学习率后累加
+                estimators = model.estimators_
+                if estimators.shape[1] != 1:
+                    raise ValueError(f'{name}: 只支持二分类模型')
+                for stage in estimators[:, 0]:
+                    add_tree(stage.tree_, model.learning_rate * stage.tree_.value[:, 0, 0])
+                    tree_output.append(output)
+                kinds.append(LOGISTIC_SUM)
+                # 初始值 = 决策函数减去所有树的贡献，用公开接口求出，不依赖 init_ 的内部实现
+                probe = np.zeros((1, model.n_features_in_))
+                trees_sum = sum(
+                    model.learning_rate * stage.predict(probe)[0] for stage in estimators[:, 0]
+                )
+                offsets.append(float(model.decision_function(probe)[0]) - trees_sum)
+            else:
+                # 随机森林：叶子上正类样本的比例，各树取平均
+                for estimator in model.estimators_:
+                    value = estimator.tree_.value[:, 0, :]
+                    totals = value.sum(axis=1)
+                    positive = np.divide(value[:, 1], totals, out=np.zeros(len(totals)), where=totals > 0)
+                    add_tree(estimator.tree_, positive)
+                    tree_output.append(output)
+                kinds.append(MEAN)
+                offsets.append(0.0)
+
+        return cls(
+            names, kinds, offsets, tree_output,
+            nodes['roots'],
+            np.concatenate(nodes['feature']), np.concatenate(nodes['threshold']),
+            np.concatenate(nodes['child']), np.concatenate(nodes['value']), max_depth,
+            mean=None if scaler is None else scaler.mean_,
+            scale=None if scaler is None else scaler.scale_
+        )
+
+    def transform(self, X):
+        """与 StandardScaler.transform 相同：float32 输入原地减均值、除标准差"""
+        X = np.array(X, dtype=np.float32)
+        if self.mean is not None:
+            X -= self.mean
+            X /= self.scale
+        return X
+
+    def leaf_values(self, X):
+        """对已标准化的特征矩阵返回每行在每棵树上的叶子值，形状 (行数, 树数)"""
+        X = np.asarray(X, dtype=np.float32)
+        leaves = np.empty((len(X), self.n_trees))
+        for start in range(0, len(X), self.CHUNK_ROWS):
+            chunk = np.ascontiguousarray(X[start:start + self.CHUNK_ROWS])
+            leaves[start:start + len(chunk)] = self._traverse(chunk)
+        return leaves
+
+    def _traverse(self, X):
+        n_rows, n_features = X.shape
+        flat = X.ravel()
+        # 按 (行, 树) 展开，row_base 为该行在展平特征数组中的起始位置
+        node = np.tile(self.roots, n_rows)
+        row_base = np.repeat(np.arange(n_rows) * n_features, self.n_trees)
+        active = np.flatnonzero(~self.is_leaf[node])
+        while active.size:
+            current = node[active]
+            # 不满足 x <= 阈值时走右子节点（左子节点 + 1），与 sklearn 一样 NaN 走右边
+            current = self.child[current] + ~(flat[row_base[active] + self.feature[current]] <= self.threshold[current])
+            node[active] = current
+            active = active[~self.is_leaf[current]]
+        return self.value[node].reshape(n_rows, self.n_trees)
+
+    def predict_proba(self, X):
+        """返回 {输出名: 每行的正类概率}"""
+        leaves = self.leaf_values(self.transform(X))
+        result = {}
+        for output, (name, kind) in enumerate(zip(self.names, self.kinds)):
+            values = leaves[:, self._slices[output]]
+            if kind == LOGISTIC_SUM:
+                raw = self.offsets[output] + values.sum(axis=1)
+                result[name] = 1.0 / (1.0 + np.exp(-raw))
+            else:
+                result[name] = values.mean(axis=1)
+        return result
+
+    def __repr__(self):
+        return f'<CompiledEnsemble {self.names} trees={self.n_trees} nodes={self.n_nodes} depth={self.max_depth}>'
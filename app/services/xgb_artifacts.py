@@ -0,0 +1,112 @@
+# XGBoost 原生格式模型文件
+import glob
+import json
+import os
+import threading
+from datetime import datetime
+import numpy as np
+from app.config import Config
+from app.services.model_registry import model_registry
+
+# 元数据文件格式版本
+FORMAT_VERSION = 1
+# 保留的历史模型文件数（含当前），其他进程可能还在加载上一个版本
+KEEP_MODEL_FILES = 2
+
+
+def _readonly(values):
+    array = np.array(values, dtype=np.float32)
+    array.setflags(write=False)
+    return array
+
+
+class BoosterModel:
+    """原生 Booster 加上标准化参数，预测直接走 inplace_predict，不经过 sklearn 包装和 DMatrix"""
+
+    def __init__(self, booster, mean, scale, meta):
+        self.booster = booster
+        self.mean = _readonly(mean)
+        self.scale = _readonly(scale)
+        self.meta = meta
+
+    @classmethod
+    def from_sklearn(cls, model, scaler, **meta):
+        """由 XGBClassifier 和 StandardScaler 构造，用于训练后发布和转换旧的 pickle 模型"""
+        return cls(model.get_booster(), scaler.mean_, scaler.scale_, meta)
+
+    @property
+    def feature_names(self):
+        return self.meta.get('feature_names')
+
+    def transform(self, X):
+        """与 StandardScaler.transform 相同的标准化，全程 float32"""
+        return (np.asarray(X, dtype=np.float32) - self.mean) / self.scale
+
+    def predict_proba(self, X):
+        """返回正类概率（binary:logistic 目标下 inplace_predict 直接输出概率）"""
+        return self.booster.inplace_predict(self.transform(X), validate_features=False)
+
+    def set_threads(self, nthread):
+        # 只在加载时调用，Booster 参数修改不是线程安全的
+        self.booster.set_param({'nthread': nthread})
+
+
+def load_booster_model(meta_path):
+    """读取元数据文件及其引用的 .ubj 模型文件"""
+    import xgboost as xgb
+    with open(meta_path, encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f'不支持的模型元数据版本: {meta.get("format_version")}')
+    booster = xgb.Booster()
+    booster.load_model(os.path.join(os.path.dirname(meta_path), meta['model_file']))
+    model = BoosterModel(booster, meta['scaler']['mean'], meta['scaler']['scale'], meta)
+    model.set_threads(Config.XGBOOST_PREDICT_THREADS)
+    return model
+
+
+def _dump_meta(model, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(model.meta, f, ensure_ascii=False, indent=2)
+
+
+def save_booster_model(meta_path, model, **meta):
+    """发布模型：先写入带版本后缀的 .ubj 文件，再原子地替换元数据文件
+
+    元数据文件是唯一的发布点，其他进程读到新元数据时对应的模型文件已经完整写好，
+    不会加载到新旧混合的模型和标准化参数。
+    """
+    import xgboost as xgb
+    meta_path = os.path.abspath(meta_path)
+    directory = os.path.dirname(meta_path)
+    base = os.path.basename(meta_path).split('.')[0]
+    os.makedirs(directory, exist_ok=True)
+
+    stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+    model_file = f'{base}.{stamp}.{os.getpid()}.ubj'
+    # 临时文件以 . 开头，不会被下面的清理匹配到；保留 .ubj 后缀让 XGBoost 按 UBJSON 格式保存
+    tmp_path = os.path.join(directory, f'.{model_file}.{threading.get_ident()}.tmp.ubj')
+    try:
+        model.booster.save_model(tmp_path)
+        os.replace(tmp_path, os.path.join(directory, model_file))
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    model.meta = dict(
+        model.meta, **meta,
+        format_version=FORMAT_VERSION,
+        model_file=model_file,
+        xgboost_version=xgb.__version__,
+        scaler={'mean': model.mean.tolist(), 'scale': model.scale.tolist()},
+        saved_at=datetime.utcnow().isoformat()
+    )
+    model.set_threads(Config.XGBOOST_PREDICT_THREADS)
+    model_registry.publish(meta_path, model, dumper=_dump_meta)
+
+    # 删除更早的模型文件
+    model_files = sorted(glob.glob(os.path.join(directory, f'{base}.*.ubj')), key=os.path.getmtime)
+    for path in model_files[:-KEEP_MODEL_FILES]:
+        if os.path.basename(path) != model_file:
+            os.remove(path)
+    return model
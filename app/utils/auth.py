@@ -1,8 +1,7 @@
 from functools import wraps
 from flask import jsonify, request
-import jwt
 from app.config import Config
-from app.models.user import User
+from app.utils.principal_cache import authenticate
 
 def token_required(f):
     @wraps(f)
@@ -16,8 +15,8 @@ def token_required(f):
             return jsonify({'message': 'Token is missing!'}), 401
             
         try:
-            data = jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=["HS256"])
-            current_user = User.query.get(data['user_id'])
+            # 先查认证主体缓存，未命中时才解码令牌并查询用户
+            current_user = authenticate(token, Config.JWT_SECRET_KEY)
             if not current_user:
                 return jsonify({'message': 'User not found!'}), 401
         except:
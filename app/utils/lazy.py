@@ -0,0 +1,71 @@
+# 延迟创建的服务单例
+import importlib
+import threading
+import time
+
+# 所有延迟服务，用于统计初始化耗时
+_services = []
+
+
+class LazyService:
+    """服务单例的占位对象，第一次访问属性时才创建真正的服务实例
+
+    蓝图模块导入时只创建占位对象，服务构造（创建默认模型等）推迟到第一次被请求使用时，
+    工作进程启动时不再为用不到的服务付出初始化成本。factory 可以是 'module:Class'
+    形式的字符串，此时连服务模块（及其依赖的 xgboost、sklearn 等重量级库）也在首次使用时才导入。
+    """
+
+    def __init__(self, factory, name=None):
+        self._factory = factory
+        self._name = name or (factory if isinstance(factory, str) else getattr(factory, '__name__', repr(factory)))
+        self._instance = None
+        self._init_seconds = None
+        self._lock = threading.Lock()
+        _services.append(self)
+
+    def _get_instance(self):
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    start = time.perf_counter()
+                    factory = self._factory
+                    if isinstance(factory, str):
+                        module_name, _, attr = factory.partition(':')
+                        factory = getattr(importlib.import_module(module_name), attr)
+                    instance = factory()
+                    self._init_seconds = time.perf_counter() - start
+                    self._instance = instance
+        return self._instance
+
+    def __getattr__(self, name):
+        # 只有在自身属性中找不到时才会调用，转发给真正的服务实例
+        return getattr(self._get_instance(), name)
+
+    @property
+    def created(self):
+        return self._instance is not None
+
+    def __repr__(self):
+        state = 'created' if self.created else 'pending'
+        return f'<LazyService {self._name} {state}>'
+
+
+def preload(names=None):
+    """预先创建延迟服务（工作进程预热），names 为空时创建全部，返回每个服务的初始化耗时"""
+    timings = {}
+    for service in _services:
+        if names is None or service._name in names:
+            service._get_instance()
+            timings[service._name] = service._init_seconds
+    return timings
+
+
+def lazy_service_stats():
+    """返回每个延迟服务是否已创建及其初始化耗时"""
+    return {
+        service._name: {
+            'created': service.created,
+            'init_seconds': service._init_seconds
+        }
+        for service in _services
+    }
@@ -0,0 +1,95 @@
+# 健康记录分页工具
+import base64
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from app.models.user import HealthRecord
+
+
+def encode_cursor(record):
+    """把记录的 (recorded_at, id) 编码为不透明游标"""
+    raw = f'{record.recorded_at.isoformat()}|{record.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解析游标，返回 (recorded_at, id)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        recorded_at, record_id = base64.urlsafe_b64decode(padded).decode().rsplit('|', 1)
+        return datetime.fromisoformat(recorded_at), int(record_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('无效的分页游标')
+
+
+def _parse_datetime(value, name, end=False):
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'无效的日期参数 {name}: {value}')
+    # 只给日期的结束时间包含当天全天
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+# 血压过滤参数：参数名 -> (列名, 是否为下限)
+BP_FILTERS = {
+    'min_systolic': ('systolic_bp', True),
+    'max_systolic': ('systolic_bp', False),
+    'min_diastolic': ('diastolic_bp', True),
+    'max_diastolic': ('diastolic_bp', False)
+}
+
+
+def _apply_bp_filters(query, args):
+    """按收缩压/舒张压数值过滤（走 systolic_bp/diastolic_bp 索引），下限和上限均为闭区间"""
+    for name, (column, lower) in BP_FILTERS.items():
+        if args.get(name) in (None, ''):
+            continue
+        try:
+            value = int(args[name])
+        except ValueError:
+            raise ValueError(f'{name} 必须是整数')
+        column = getattr(HealthRecord, column)
+        query = query.filter(column >= value if lower else column <= value)
+    return query
+
+
+def paginate_health_records(user_id, args):
+    """按 (recorded_at, id) 升序对用户健康记录做游标分页
+
+    支持的查询参数：limit、after（上一页返回的游标）、start、end（ISO日期或时间，
+    end 为开区间，只给日期时包含当天）以及 min_systolic、max_systolic、
+    min_diastolic、max_diastolic。返回 (记录列表, 下一页游标或None)。
+    """
+    default_limit = current_app.config.get('RECORDS_PAGE_SIZE', 100)
+    max_limit = current_app.config.get('RECORDS_MAX_PAGE_SIZE', 1000)
+    try:
+        limit = int(args.get('limit', default_limit))
+    except ValueError:
+        raise ValueError('limit 必须是整数')
+    if limit < 1:
+        raise ValueError('limit 必须大于0')
+    limit = min(limit, max_limit)
+
+    query = HealthRecord.query.filter(HealthRecord.user_id == user_id)
+    if args.get('start'):
+        query = query.filter(HealthRecord.recorded_at >= _parse_datetime(args['start'], 'start'))
+    if args.get('end'):
+        query = query.filter(HealthRecord.recorded_at < _parse_datetime(args['end'], 'end', end=True))
+    query = _apply_bp_filters(query, args)
+    if args.get('after'):
+        recorded_at, record_id = decode_cursor(args['after'])
+        # 先用 recorded_at >= 缩小索引范围，再处理同一时间点的记录
+        query = query.filter(
+            HealthRecord.recorded_at >= recorded_at,
+            db.or_(HealthRecord.recorded_at > recorded_at, HealthRecord.id > record_id)
+        )
+
+    records = query.order_by(HealthRecord.recorded_at, HealthRecord.id).limit(limit + 1).all()
+    next_cursor = None
+    if len(records) > limit:
+        records = records[:limit]
+        next_cursor = encode_cursor(records[-1])
+    return records, next_cursor
@@ -0,0 +1,138 @@
+# 认证主体缓存
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+import jwt
+from sqlalchemy import event
+from app import db
+from app.config import Config
+from app.models.user import User
+
+
+class Principal:
+    """已认证用户的只读快照，缓存它而不是ORM对象，避免跨请求共享会话状态"""
+    __slots__ = ('id', 'username', 'email', 'created_at')
+
+    def __init__(self, id, username, email, created_at=None):
+        object.__setattr__(self, 'id', id)
+        object.__setattr__(self, 'username', username)
+        object.__setattr__(self, 'email', email)
+        object.__setattr__(self, 'created_at', created_at)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Principal 是只读的')
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.username, user.email, user.created_at)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'username': self.username,
+            'email': self.email,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+    def __repr__(self):
+        return f'<Principal {self.username}>'
+
+
+class PrincipalCache:
+    """进程内的令牌 -> 认证主体 TTL 缓存
+
+    键为 密钥+令牌 的 SHA-256 摘要，不在内存中保存令牌原文；缓存项在 TTL 和令牌
+    exp 中较早的时间点过期。用户被修改或删除时通过 SQLAlchemy 事件清除该用户的缓存项，
+    其他工作进程中的缓存最多在 TTL 之后失效。
+    """
+
+    def __init__(self, ttl=60, max_size=10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._by_user = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0, 'invalidations': 0}
+
+    @staticmethod
+    def digest(token, secret):
+        return hashlib.sha256(f'{secret}\0{token}'.encode()).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            principal, expires_at, exp = entry
+            if time.monotonic() >= expires_at or (exp is not None and time.time() >= exp):
+                self._remove(key)
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return principal
+
+    def put(self, key, principal, exp=None):
+        expires_at = time.monotonic() + self.ttl
+        if exp is not None:
+            expires_at = min(expires_at, time.monotonic() + (exp - time.time()))
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (principal, expires_at, exp)
+            self._by_user.setdefault(principal.id, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self._stats['evictions'] += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            keys = self._by_user.get(entry[0].id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_user[entry[0].id]
+
+    def invalidate_user(self, user_id):
+        """清除某个用户的全部缓存项"""
+        with self._lock:
+            for key in list(self._by_user.get(user_id, ())):
+                self._remove(key)
+            self._stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, size=len(self._entries), ttl=self.ttl, max_size=self.max_size)
+
+
+principal_cache = PrincipalCache(ttl=Config.PRINCIPAL_CACHE_TTL, max_size=Config.PRINCIPAL_CACHE_SIZE)
+
+
+def authenticate(token, secret):
+    """校验令牌并返回认证主体，用户不存在时返回None；令牌无效或过期时抛出 jwt.InvalidTokenError"""
+    key = principal_cache.digest(token, secret)
+    principal = principal_cache.get(key)
+    if principal is not None:
+        return principal
+
+    data = jwt.decode(token, secret, algorithms=["HS256"])
+    user = db.session.get(User, data['user_id'])
+    if user is None:
+        return None
+    principal = Principal.from_user(user)
+    principal_cache.put(key, principal, data.get('exp'))
+    return principal
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_user(mapper, connection, target):
+    principal_cache.invalidate_user(target.id)
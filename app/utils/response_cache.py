@@ -0,0 +1,172 @@
+# 按用户数据版本缓存的响应缓存
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, make_response, request
+from app import db
+from app.config import Config
+from app.models.user import User
+
+# 随缓存一起保存的响应头
+CACHED_HEADERS = ('X-Next-Cursor', 'Link')
+
+
+class LRUBackend:
+    """进程内LRU缓存，默认后端"""
+
+    def __init__(self, max_size=1024, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def size(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    """Redis（或兼容协议的本地服务）后端，多个工作进程共享缓存；需要安装 redis 包"""
+
+    def __init__(self, url, ttl=None, prefix='response-cache:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('RESPONSE_CACHE_BACKEND=redis 需要先安装 redis 包')
+        self._client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self._client.get(self.prefix + key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value):
+        self._client.set(self.prefix + key, json.dumps(value), ex=self.ttl or None)
+
+    def size(self):
+        return None
+
+
+def get_data_version(user_id):
+    """读取用户数据版本，用户的健康记录每次写入都会使版本加一"""
+    return db.session.execute(
+        db.select(User.data_version).where(User.id == user_id)
+    ).scalar() or 0
+
+
+def bump_data_version(user_id):
+    """在当前事务中把用户数据版本加一，使该用户的缓存响应全部失效"""
+    db.session.execute(
+        db.update(User.__table__)
+        .where(User.__table__.c.id == user_id)
+        .values(data_version=db.func.coalesce(User.__table__.c.data_version, 0) + 1)
+    )
+
+
+class ResponseCache:
+    """以 (用户, 数据版本, 请求路径) 为键的响应缓存
+
+    写入健康记录时只需把用户数据版本加一，旧版本的缓存项不再被访问，由LRU淘汰或TTL过期；
+    ETag 由同样的键计算，客户端带 If-None-Match 时只需读取数据版本即可返回 304。
+    """
+
+    def __init__(self):
+        self._backend = None
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'not_modified': 0, 'stores': 0}
+
+    def _config(self, name):
+        return current_app.config.get(name, getattr(Config, name))
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    ttl = self._config('RESPONSE_CACHE_TTL')
+                    if self._config('RESPONSE_CACHE_BACKEND') == 'redis':
+                        self._backend = RedisBackend(self._config('RESPONSE_CACHE_REDIS_URL'), ttl=ttl)
+                    else:
+                        self._backend = LRUBackend(self._config('RESPONSE_CACHE_SIZE'), ttl=ttl)
+        return self._backend
+
+    def cached(self, namespace, version=None):
+        """视图装饰器，放在 token_required 之后，只缓存 200 响应
+
+        version 为可选的无参函数，返回值加入缓存键，如响应所依赖规则的摘要；
+        它变化时只有依赖它的响应失效。
+        """
+        def decorator(f):
+            @wraps(f)
+            def wrapped(current_user, *args, **kwargs):
+                key = f'{namespace}:{current_user.id}:{get_data_version(current_user.id)}'
+                if version is not None:
+                    key = f'{key}:{version()}'
+                key = f'{key}:{request.full_path}'
+                etag = hashlib.sha256(key.encode()).hexdigest()[:32]
+
+                if etag in request.if_none_match:
+                    self._stats['not_modified'] += 1
+                    return self._finalize(make_response('', 304), etag)
+
+                entry = self.backend.get(key)
+                if entry is not None:
+                    self._stats['hits'] += 1
+                    response = make_response(entry['body'], entry['status'], entry['headers'])
+                    response.mimetype = entry['mimetype']
+                    return self._finalize(response, etag)
+
+                self._stats['misses'] += 1
+                response = make_response(f(current_user, *args, **kwargs))
+                if response.status_code == 200:
+                    self.backend.set(key, {
+                        'body': response.get_data(as_text=True),
+                        'status': response.status_code,
+                        'mimetype': response.mimetype,
+                        'headers': {h: response.headers[h] for h in CACHED_HEADERS if h in response.headers}
+                    })
+                    self._stats['stores'] += 1
+                    self._finalize(response, etag)
+                return response
+            return wrapped
+        return decorator
+
+    @staticmethod
+    def _finalize(response, etag):
+        response.set_etag(etag)
+        # 允许客户端缓存，但每次使用前都要带 ETag 重新验证
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def stats(self):
+        stats = dict(self._stats)
+        if self._backend is not None:
+            stats['backend'] = type(self._backend).__name__
+            stats['size'] = self._backend.size()
+        return stats
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,142 @@
+# 疾病预测推理延迟基准
+"""比较旧的 joblib + XGBClassifier.predict_proba 路径和原生 Booster.inplace_predict 路径
+
+用法：
+    python benchmarks/disease_inference.py
+    python benchmarks/disease_inference.py --rows 20000 --repeat 2000 --threads 1 4
+    python benchmarks/disease_inference.py --output benchmarks/disease_inference_report.txt
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def synthetic_features(n, seed=0):
+    """按 DISEASE_SCHEMA 的列顺序生成随机特征"""
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        rng.normal(78, 12, n),      # heart_rate
+        rng.normal(122, 15, n),     # systolic_bp
+        rng.normal(80, 10, n),      # diastolic_bp
+        rng.normal(5.4, 1.0, n),    # blood_sugar
+        rng.normal(65, 10, n),      # weight
+        rng.normal(7.2, 1.1, n),    # sleep_hours
+        rng.integers(1, 11, n),     # mood_score
+        rng.normal(22.5, 3, n)      # bmi
+    ]).astype(np.float32)
+
+
+def timeit(func, repeat):
+    """返回每次调用耗时的 (p50, p99) 微秒"""
+    func()
+    samples = np.empty(repeat)
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples[i] = time.perf_counter() - start
+    return np.percentile(samples, 50) * 1e6, np.percentile(samples, 99) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='疾病预测推理延迟基准')
+    parser.add_argument('--rows', type=int, default=5000, help='训练样本数')
+    parser.add_argument('--repeat', type=int, default=1000, help='单条预测的重复次数')
+    parser.add_argument('--batch', type=int, nargs='*', default=[100, 1000, 10000], help='批量预测的行数')
+    parser.add_argument('--threads', type=int, nargs='*', default=[1, os.cpu_count() or 1], help='inplace_predict 线程数')
+    parser.add_argument('--output', help='同时把报告写入文件')
+    args = parser.parse_args()
+
+    import joblib
+    import xgboost as xgb
+    from sklearn.preprocessing import StandardScaler
+    from app.config import Config
+    from app.services.disease_prediction import DiseasePrediction
+    from app.services.health_scoring import DISEASE_RULES
+    from app.services.feature_extraction import DISEASE_SCHEMA, HealthColumns
+    from app.services.xgb_artifacts import BoosterModel, load_booster_model, save_booster_model
+
+    X = synthetic_features(args.rows)
+    columns = {name: X[:, j].astype(np.float64) for j, name in enumerate(DISEASE_SCHEMA.columns)}
+    y = (~DISEASE_RULES.label(HealthColumns(columns, {}, len(X)))).astype(int)
+
+    scaler = StandardScaler()
+    model = DiseasePrediction()._build_model()
+    model.fit(scaler.fit_transform(X), y)
+
+    lines = [
+        f'xgboost {xgb.__version__}, {args.rows} training rows, '
+        f'{model.n_estimators} trees, max_depth {model.max_depth}, cpu_count {os.cpu_count()}',
+        ''
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.path.join(tmp, 'disease_model.pkl')
+        scaler_path = os.path.join(tmp, 'disease_scaler.pkl')
+        meta_path = os.path.join(tmp, 'disease_model.meta.json')
+        joblib.dump(model, model_path)
+        joblib.dump(scaler, scaler_path)
+        save_booster_model(meta_path, BoosterModel.from_sklearn(model, scaler), feature_names=list(DISEASE_SCHEMA.columns))
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            pickle_load = timeit(lambda: (joblib.load(model_path), joblib.load(scaler_path)), 20)
+        native_load = timeit(lambda: load_booster_model(meta_path), 20)
+        sizes = sum(os.path.getsize(p) for p in (model_path, scaler_path))
+        ubj = [f for f in os.listdir(tmp) if f.endswith('.ubj')][0]
+        native_size = os.path.getsize(os.path.join(tmp, ubj)) + os.path.getsize(meta_path)
+        lines.append('load (p50 / p99 us, bytes on disk):')
+        lines.append(f'  joblib pickle + scaler     {pickle_load[0]:10.0f} {pickle_load[1]:10.0f}  {sizes}')
+        lines.append(f'  ubj + metadata sidecar     {native_load[0]:10.0f} {native_load[1]:10.0f}  {native_size}')
+        lines.append('')
+
+        legacy_model, legacy_scaler = model, scaler
+        natives = {}
+        for threads in args.threads:
+            native = load_booster_model(meta_path)
+            native.set_threads(threads)
+            natives[threads] = native
+
+        # 两条路径结果一致性
+        sample = synthetic_features(1000, seed=1)
+        reference = legacy_model.predict_proba(legacy_scaler.transform(sample))[:, 1]
+        max_diff = max(float(np.abs(n.predict_proba(sample) - reference).max()) for n in natives.values())
+        lines.append(f'max |p_native - p_legacy| on 1000 rows: {max_diff:.2e}')
+        lines.append('')
+
+        lines.append('single row (p50 / p99 us):')
+        row = sample[:1]
+        legacy = timeit(lambda: legacy_model.predict_proba(legacy_scaler.transform(row))[:, 1], args.repeat)
+        lines.append(f'  scaler + predict_proba     {legacy[0]:10.1f} {legacy[1]:10.1f}')
+        for threads, native in natives.items():
+            result = timeit(lambda: native.predict_proba(row), args.repeat)
+            lines.append(f'  inplace_predict nthread={threads:<3}{result[0]:10.1f} {result[1]:10.1f}  ({legacy[0] / result[0]:.1f}x)')
+        lines.append('')
+
+        for n in args.batch:
+            batch = synthetic_features(n, seed=2)
+            repeat = max(10, args.repeat * 100 // max(n, 100))
+            lines.append(f'batch of {n} rows (p50 / p99 us, {repeat} runs):')
+            legacy = timeit(lambda: legacy_model.predict_proba(legacy_scaler.transform(batch))[:, 1], repeat)
+            lines.append(f'  scaler + predict_proba     {legacy[0]:10.1f} {legacy[1]:10.1f}')
+            for threads, native in natives.items():
+                result = timeit(lambda: native.predict_proba(batch), repeat)
+                lines.append(f'  inplace_predict nthread={threads:<3}{result[0]:10.1f} {result[1]:10.1f}  ({legacy[0] / result[0]:.1f}x)')
+            lines.append('')
+
+    lines.append(f'XGBOOST_PREDICT_THREADS (service default): {Config.XGBOOST_PREDICT_THREADS}')
+    text = '\n'.join(lines)
+    print(text)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+# 联邦学习模型更新编码基准
+"""比较 JSON 参数列表与二进制编码（float32/float16/q8/top-k 增量）的数据大小、解码耗时和误差
+
+用法：
+    python benchmarks/fl_codec.py
+    python benchmarks/fl_codec.py --repeat 20000 --top-k 5
+    python benchmarks/fl_codec.py --output benchmarks/fl_codec_report.txt
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def client_params(rng, n=500):
+    """在随机生成的健康数据上训练一个本地模型，返回 JSON 格式的参数"""
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.preprocessing import StandardScaler
+    X = np.column_stack([
+        rng.normal(78, 12, n), rng.normal(122, 15, n), rng.normal(80, 10, n), rng.normal(5.4, 1.0, n),
+        rng.normal(65, 10, n), rng.normal(7.2, 1.1, n), rng.integers(1, 11, n)
+    ])
+    y = ((X[:, 1] < 130) & (X[:, 3] < 6.1) & (X[:, 5] > 6.5)).astype(int)
+    scaler = StandardScaler().fit(X)
+    model = LogisticRegression().fit(scaler.transform(X), y)
+    return {
+        'model_weights': model.coef_.tolist(),
+        'intercept': model.intercept_.tolist(),
+        'scaler_mean': scaler.mean_.tolist(),
+        'scaler_scale': scaler.scale_.tolist(),
+        'samples': n
+    }
+
+
+def timeit(func, repeat):
+    """返回每次调用耗时的 (p50, p99) 微秒"""
+    func()
+    samples = np.empty(repeat)
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples[i] = time.perf_counter() - start
+    return np.percentile(samples, 50) * 1e6, np.percentile(samples, 99) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='联邦学习模型更新编码基准')
+    parser.add_argument('--repeat', type=int, default=10000, help='每种编码的解码次数')
+    parser.add_argument('--top-k', type=int, default=6, help='top-k 增量保留的参数个数')
+    parser.add_argument('--output', help='同时把报告写入文件')
+    args = parser.parse_args()
+
+    from app.services.federated_rounds import PARAM_SIZE, pack_params, parse_update, PARAM_KEYS
+    from app.services.fl_codec import encode_update, decode_update, FLOAT32, FLOAT16, Q8, TOPK
+
+    rng = np.random.default_rng(0)
+    base_payload = client_params(rng)
+    base = pack_params(*(base_payload[key] for key in PARAM_KEYS))
+    # 客户端在上一版全局模型的基础上多了一些新数据
+    update = client_params(rng, n=600)
+    params = pack_params(*(update[key] for key in PARAM_KEYS))
+    samples = update['samples']
+    base_params = {1: base}.get
+
+    cases = [('json', json.dumps(update).encode(), lambda body: parse_update(json.loads(body))[:2])]
+    for label, encoding, delta in (
+        ('float32', FLOAT32, False), ('float16', FLOAT16, False), ('q8', Q8, False),
+        ('float16 delta', FLOAT16, True), ('q8 delta', Q8, True), (f'top-{args.top_k} delta', TOPK, True)
+    ):
+        payload = encode_update(
+            params, samples, encoding,
+            base=base if delta else None, base_version=1 if delta else 0, top_k=args.top_k
+        )
+        cases.append((label, payload, lambda body: decode_update(body, base_params)[:2]))
+
+    lines = [f'{PARAM_SIZE} parameters per update (LogisticRegression coef + intercept + StandardScaler mean/scale)', '']
+    lines.append(f'{"encoding":<16}{"bytes":>7}{"base64":>8}{"p50 us":>9}{"p99 us":>9}{"max abs err":>13}{"max rel err":>13}')
+    json_size = len(cases[0][1])
+    for label, body, decode in cases:
+        decoded, decoded_samples = decode(body)
+        assert decoded_samples == samples
+        error = np.abs(decoded - params)
+        p50, p99 = timeit(lambda: decode(body), args.repeat)
+        lines.append(
+            f'{label:<16}{len(body):>7}{len(base64.b64encode(body)):>8}{p50:>9.1f}{p99:>9.1f}'
+            f'{error.max():>13.2e}{(error / np.maximum(np.abs(params), 1e-12)).max():>13.2e}'
+            + ('' if label == 'json' else f'  ({json_size / len(body):.1f}x smaller)')
+        )
+    text = '\n'.join(lines)
+    print(text)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
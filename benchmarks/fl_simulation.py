@@ -0,0 +1,382 @@
+# 联邦学习模拟与压测
+"""在一台机器上模拟大量客户端，压测联邦学习的训练、上传和聚合流程
+
+每个模拟客户端在进程池中生成自己的合成健康记录（--skew 大于 0 时各客户端的指标分布和数据量不同，
+即非独立同分布），调用 FederatedLearning.train_local_model 训练本地模型，再提交到 /api/fl/update：
+默认通过 Flask 测试客户端提交到本进程中的应用（临时数据库、临时模型目录，不影响工作目录）；
+指定 --url 时由各工作进程直接向本地 gunicorn 并发提交。
+每轮统计端到端延迟、聚合吞吐、上传/下载数据大小，以及全局模型在留出集上的准确率和对数损失。
+
+用法：
+    python benchmarks/fl_simulation.py
+    python benchmarks/fl_simulation.py --clients 2000 --rounds 5 --skew 1.0 --encoding q8
+    python benchmarks/fl_simulation.py --clients 1000 --mode async --buffer-size 50 --participation 0.3
+    python benchmarks/fl_simulation.py --url http://127.0.0.1:8000 --clients 500
+    python benchmarks/fl_simulation.py --output benchmarks/fl_simulation_report.txt
+
+--url 模式下聚合配置由服务端的环境变量决定，同步模式下 FL_ROUND_QUORUM 应等于每轮参与的客户端数，例如：
+    FL_ROUND_QUORUM=500 gunicorn --preload -w 4 -b 127.0.0.1:8000 run:app
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# 人群中各项指标的 (均值, 标准差)，顺序与 FEDERATED_SCHEMA 相同
+POPULATION = np.array([
+    (78, 12),     # heart_rate
+    (122, 15),    # systolic_bp
+    (80, 10),     # diastolic_bp
+    (5.4, 1.0),   # blood_sugar
+    (65, 10),     # weight
+    (7.2, 1.1),   # sleep_hours
+    (6, 2.5)      # mood_score
+])
+MIN_RECORDS = 5
+FL_API = '/api/fl'
+
+# 工作进程内的状态，由 _init_worker 创建
+_worker = {}
+
+
+def client_records(seed, client_id, round_, records, skew):
+    """生成一个客户端在某一轮的健康记录（HealthRecord 的字段）
+
+    客户端的指标偏移（以人群标准差为单位）和数据量只由 (seed, client_id) 决定，各轮保持不变；
+    每轮的记录是从该客户端自己的分布中新抽取的。
+    """
+    profile = np.random.default_rng([seed, client_id])
+    shift = profile.normal(0, skew, len(POPULATION))
+    n = max(MIN_RECORDS, int(round(records * profile.lognormal(0, 0.5 * skew))))
+    values = POPULATION[:, 0] + POPULATION[:, 1] * (shift + np.random.default_rng([seed, client_id, round_]).standard_normal((n, len(POPULATION))))
+    return [{
+        'heart_rate': int(round(row[0])),
+        'blood_pressure': f'{int(round(row[1]))}/{int(round(row[2]))}',
+        'blood_sugar': round(float(row[3]), 1),
+        'weight': round(float(row[4]), 1),
+        'sleep_hours': round(float(row[5]), 1),
+        'mood_score': int(np.clip(round(row[6]), 1, 10))
+    } for row in values]
+
+
+def _init_worker(url):
+    from app.services.federated_learning import FederatedLearning
+    _worker['fl'] = FederatedLearning()
+    if url:
+        import requests
+        _worker['session'] = requests.Session()
+    _worker['url'] = url
+
+
+def _post_auth(path, data):
+    """认证接口在密码哈希线程池繁忙时返回 503，按 Retry-After 重试"""
+    while True:
+        response = _worker['session'].post(f"{_worker['url']}/api/auth/{path}", json=data)
+        if response.status_code != 503:
+            return response
+        time.sleep(float(response.headers.get('Retry-After', 1)))
+
+
+def _register(username):
+    """--url 模式：通过注册和登录接口创建模拟用户，返回令牌"""
+    response = _post_auth('register', {'username': username, 'email': f'{username}@sim.local', 'password': username})
+    if response.status_code != 201:
+        raise RuntimeError(f'注册 {username} 失败: {response.status_code} {response.text[:200]}')
+    response = _post_auth('login', {'username': username, 'password': username})
+    if response.status_code != 200:
+        raise RuntimeError(f'登录 {username} 失败: {response.status_code} {response.text[:200]}')
+    return response.json()['token']
+
+
+def _run_client(task):
+    """训练一个客户端的本地模型并编码更新；--url 模式下同时提交，返回统计信息"""
+    from app.services.federated_rounds import pack_params, PARAM_KEYS
+    from app.services.fl_codec import encode_update
+    client_id, round_, token, base_version, base, options = task
+    result = {'client': client_id, 'status': None, 'latency': 0.0, 'bytes': 0}
+
+    records = client_records(options['seed'], client_id, round_, options['records'], options['skew'])
+    start = time.perf_counter()
+    try:
+        params = _worker['fl'].train_local_model(records)
+    except ValueError as e:
+        # 本地数据只有一类标签时无法训练，真实设备上同样会跳过这一轮
+        result['error'] = str(e).splitlines()[0]
+        return result
+    result['train'] = time.perf_counter() - start
+    result['samples'] = params['samples']
+
+    path = f'{FL_API}/update'
+    if options['encoding'] == 'json':
+        body = json.dumps(dict(params, base_version=base_version) if base_version else params).encode()
+        content_type = 'application/json'
+    else:
+        vector = pack_params(*(params[key] for key in PARAM_KEYS))
+        delta = options['delta'] and base is not None
+        body = encode_update(
+            vector, params['samples'], options['encoding'],
+            base=np.frombuffer(base) if delta else None, base_version=base_version if delta else 0,
+            top_k=options['top_k']
+        )
+        content_type = 'application/octet-stream'
+        if base_version and not delta:
+            path = f'{path}?base_version={base_version}'
+    result['bytes'] = len(body)
+
+    if not _worker['url']:
+        result.update(path=path, body=body, content_type=content_type)
+        return result
+    start = time.perf_counter()
+    response = _worker['session'].post(
+        _worker['url'] + path, data=body,
+        headers={'Authorization': f'Bearer {token}', 'Content-Type': content_type}
+    )
+    result['latency'] = time.perf_counter() - start
+    result['status'] = response.status_code
+    return result
+
+
+class LocalServer:
+    """本进程中的应用：临时 SQLite 数据库，工作目录切换到临时目录，模型文件也写在其中"""
+
+    def __init__(self, args, participants):
+        from app import create_app, db
+        from app.config import Config
+        self.directory = tempfile.TemporaryDirectory(prefix='fl-simulation-')
+        os.chdir(self.directory.name)
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.directory.name, 'fl.db')}",
+            'JWT_SECRET_KEY': Config.JWT_SECRET_KEY,
+            'TESTING': True,
+            # 同步模式下每轮在最后一个参与者提交时关闭
+            'FL_ROUND_QUORUM': participants,
+            'FL_ROUND_DEADLINE_SECONDS': 24 * 3600,
+            'FL_AGGREGATION_MODE': args.mode,
+            'FL_ASYNC_BUFFER_SIZE': args.buffer_size,
+            'FL_ASYNC_MAX_STALENESS': args.max_staleness
+        })
+        self.client = self.app.test_client()
+        self.db = db
+
+    def create_users(self, names):
+        """直接写入数据库创建模拟用户，用应用的 JWT 密钥签发令牌"""
+        import jwt
+        from app.models.user import User
+        with self.app.app_context():
+            self.db.session.execute(User.__table__.insert(), [
+                {'username': name, 'email': f'{name}@sim.local', 'data_version': 0} for name in names
+            ])
+            self.db.session.commit()
+            ids = dict(self.db.session.execute(
+                self.db.select(User.username, User.id).where(User.email.like('%@sim.local'))
+            ).all())
+        secret = self.app.config['JWT_SECRET_KEY']
+        return [jwt.encode({'user_id': ids[name]}, secret, algorithm='HS256') for name in names]
+
+    def request(self, method, path, token, data=None, content_type=None):
+        response = self.client.open(
+            path, method=method, data=data, content_type=content_type,
+            headers={'Authorization': f'Bearer {token}'}
+        )
+        return response.status_code, response.headers, response.get_data()
+
+    def finish_round(self):
+        """跳过训练的客户端不会提交，用 close-fl-round 关闭未达到法定数量的轮次，相当于到达截止时间"""
+        self.app.test_cli_runner().invoke(args=['close-fl-round'])
+
+    def close(self):
+        os.chdir(ROOT)
+        self.directory.cleanup()
+
+
+class RemoteServer:
+    """--url 指定的服务（如本地 gunicorn），模拟用户通过注册接口创建，令牌有效期为一小时"""
+
+    def __init__(self, args, executor):
+        import requests
+        self.url = args.url.rstrip('/')
+        self.executor = executor
+        self.session = requests.Session()
+
+    def create_users(self, names):
+        return list(self.executor.map(_register, names, chunksize=16))
+
+    def request(self, method, path, token, data=None, content_type=None):
+        headers = {'Authorization': f'Bearer {token}'}
+        if content_type:
+            headers['Content-Type'] = content_type
+        response = self.session.request(method, self.url + path, data=data, headers=headers)
+        return response.status_code, response.headers, response.content
+
+    def finish_round(self):
+        # 由服务端的截止时间或定时任务关闭轮次
+        pass
+
+    def close(self):
+        pass
+
+
+def evaluate(vector, X, y):
+    """全局模型在留出集上的 (准确率, 对数损失)"""
+    from app.services.federated_rounds import N_FEATURES
+    d = N_FEATURES
+    coef, intercept = vector[:d], vector[d]
+    mean, scale = vector[d + 1:2 * d + 1], vector[2 * d + 1:]
+    probability = 1.0 / (1.0 + np.exp(-(((X - mean) / scale) @ coef + intercept)))
+    probability = np.clip(probability, 1e-12, 1 - 1e-12)
+    log_loss = -np.mean(y * np.log(probability) + (1 - y) * np.log(1 - probability))
+    return float(np.mean((probability >= 0.5) == y)), float(log_loss)
+
+
+def holdout(args, offset, n_clients=200):
+    """从客户端分布的混合中抽取一份数据（使用不参与训练的客户端编号），返回 (X, y)"""
+    from app.services.federated_learning import FederatedLearning
+    records = []
+    for client_id in range(offset, offset + n_clients):
+        records.extend(client_records(args.seed, client_id, 0, args.records, args.skew))
+    return FederatedLearning().prepare_data(records)
+
+
+def global_model(server, token, since=None):
+    """下载全局模型，返回 (版本, 参数向量, JSON 字节数, float32 字节数, 相对 since 的 float16 增量字节数)"""
+    from app.services.federated_rounds import pack_params, PARAM_KEYS
+    status, _, body = server.request('GET', f'{FL_API}/model', token)
+    if status == 404:
+        return None, None, 0, 0, 0
+    if status != 200:
+        raise RuntimeError(f'下载全局模型失败: {status} {body[:200]}')
+    data = json.loads(body)
+    vector = pack_params(*(data[key] for key in PARAM_KEYS))
+    binary = server.request('GET', f'{FL_API}/model?encoding=float32', token)[2]
+    delta = 0
+    if since:
+        delta = len(server.request('GET', f'{FL_API}/model?since={since}&encoding=float16', token)[2])
+    return data['version'], vector, len(body), len(binary), delta
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if len(values) else float('nan')
+
+
+def main():
+    from app.config import Config
+    parser = argparse.ArgumentParser(description='联邦学习模拟与压测')
+    parser.add_argument('--clients', type=int, default=200, help='模拟客户端数')
+    parser.add_argument('--rounds', type=int, default=3, help='轮数，每轮每个参与的客户端提交一次')
+    parser.add_argument('--participation', type=float, default=1.0, help='每轮参与的客户端比例')
+    parser.add_argument('--records', type=int, default=100, help='每个客户端每轮的平均记录数')
+    parser.add_argument('--skew', type=float, default=0.5, help='非独立同分布程度：客户端指标偏移的标准差（单位为人群标准差），0 为独立同分布')
+    parser.add_argument('--encoding', default='json', choices=('json', 'float32', 'float16', 'q8', 'topk'), help='上传格式')
+    parser.add_argument('--delta', action='store_true', help='二进制格式上传相对最新全局模型的增量（topk 必须使用）')
+    parser.add_argument('--top-k', type=int, help='topk 编码保留的参数个数')
+    parser.add_argument('--mode', default='sync', choices=('sync', 'async'), help='聚合模式（仅本地模式，--url 时由服务端决定）')
+    parser.add_argument('--buffer-size', type=int, default=Config.FL_ASYNC_BUFFER_SIZE, help='异步聚合每个版本的更新数')
+    parser.add_argument('--max-staleness', type=int, default=Config.FL_ASYNC_MAX_STALENESS, help='异步聚合允许落后的版本数')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='进程池大小')
+    parser.add_argument('--url', help='提交到已启动的服务，如 http://127.0.0.1:8000；默认使用 Flask 测试客户端')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='同时把报告写入文件')
+    args = parser.parse_args()
+    if args.encoding == 'topk' and not args.delta:
+        parser.error('topk 编码必须与 --delta 一起使用')
+    if args.encoding == 'json' and args.delta:
+        parser.error('JSON 格式不支持增量上传')
+
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.preprocessing import StandardScaler
+    participants = max(1, int(round(args.clients * args.participation)))
+    rng = np.random.default_rng(args.seed)
+    options = {key: getattr(args, key) for key in ('seed', 'records', 'skew', 'encoding', 'delta', 'top_k')}
+
+    # 留出集和集中式训练的基准，使用不参与训练的客户端编号
+    X_test, y_test = holdout(args, args.clients + 10000)
+    X_central, y_central = holdout(args, args.clients + 20000)
+    scaler = StandardScaler().fit(X_central)
+    central = LogisticRegression().fit(scaler.transform(X_central), y_central)
+    central_vector = np.concatenate([central.coef_[0], central.intercept_, scaler.mean_, scaler.scale_])
+    central_accuracy, central_loss = evaluate(central_vector, X_test, y_test)
+
+    executor = ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(args.url,))
+    server = RemoteServer(args, executor) if args.url else LocalServer(args, participants)
+    try:
+        start = time.perf_counter()
+        prefix = f'sim{int(time.time())}'
+        tokens = server.create_users([f'{prefix}-{i}' for i in range(args.clients)])
+        setup = time.perf_counter() - start
+
+        mode = 'remote ' + args.url if args.url else f'local test client, {args.mode}'
+        lines = [
+            f'{args.clients} clients, {participants} per round, {args.rounds} rounds, {args.records} records/client, '
+            f'skew {args.skew}, encoding {args.encoding}{" delta" if args.delta else ""}, {args.workers} workers ({mode})',
+            f'setup {setup:.1f}s; holdout {len(y_test)} rows, positive rate {y_test.mean():.2f}; '
+            f'centralized baseline accuracy {central_accuracy:.3f}, log loss {central_loss:.3f}',
+            '',
+            f'{"round":>5}{"version":>8}{"ok":>6}{"rej":>5}{"skip":>5}{"wall s":>8}{"train ms":>9}{"upd p50":>9}{"upd p99":>9}'
+            f'{"upd/s":>8}{"B/upd":>7}{"model B":>9}{"delta B":>8}{"acc":>7}{"loss":>7}'
+        ]
+        print('\n'.join(lines))
+        version, base, _, _, _ = global_model(server, tokens[0])
+        chunksize = max(1, participants // (4 * args.workers))
+        for round_ in range(1, args.rounds + 1):
+            chosen = rng.choice(args.clients, size=participants, replace=False)
+            base_bytes = base.tobytes() if base is not None else None
+            tasks = [(int(i), round_, tokens[i], version, base_bytes, options) for i in chosen]
+
+            start = time.perf_counter()
+            results = []
+            for result in executor.map(_run_client, tasks, chunksize=chunksize):
+                if 'body' in result:
+                    # 本地模式：训练在进程池中并行，提交在主进程中按完成顺序进行
+                    post_start = time.perf_counter()
+                    result['status'] = server.request(
+                        'POST', result.pop('path'), tokens[result['client']],
+                        data=result.pop('body'), content_type=result.pop('content_type')
+                    )[0]
+                    result['latency'] = time.perf_counter() - post_start
+                results.append(result)
+            wall = time.perf_counter() - start
+            server.finish_round()
+
+            previous = version
+            version, base, _, model_bytes, delta_bytes = global_model(server, tokens[0], since=previous)
+            posted = [r for r in results if r['status'] is not None]
+            ok = [r for r in posted if r['status'] == 200]
+            latencies = np.array([r['latency'] for r in posted])
+            # 本地模式的提交是串行的，吞吐按提交耗时之和计算；远程模式按整轮时间计算
+            busy = latencies.sum() if not args.url else wall
+            accuracy, loss = evaluate(base, X_test, y_test) if base is not None else (float('nan'), float('nan'))
+            line = (
+                f'{round_:>5}{version or 0:>8}{len(ok):>6}{len(posted) - len(ok):>5}{len(results) - len(posted):>5}'
+                f'{wall:>8.2f}{percentile([r["train"] * 1e3 for r in posted], 50):>9.2f}'
+                f'{percentile(latencies * 1e3, 50):>9.2f}{percentile(latencies * 1e3, 99):>9.2f}'
+                f'{len(posted) / busy if busy else 0:>8.0f}{np.mean([r["bytes"] for r in posted]) if posted else 0:>7.0f}'
+                f'{model_bytes:>9}{delta_bytes:>8}{accuracy:>7.3f}{loss:>7.3f}'
+            )
+            print(line)
+            lines.append(line)
+    finally:
+        executor.shutdown()
+        server.close()
+
+    lines += [
+        '',
+        'ok/rej/skip: accepted updates, updates rejected by the server (e.g. too stale), clients whose local data had one class',
+        'upd p50/p99: POST /api/fl/update latency in ms; upd/s: aggregation throughput',
+        'model B / delta B: float32 download of the full global model / float16 download of the delta since the previous round'
+    ]
+    print('\n'.join(lines[-4:]))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+
+
+if __name__ == '__main__':
+    main()
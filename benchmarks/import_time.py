@@ -0,0 +1,74 @@
+# 导入耗时报告
+"""统计导入应用模块的耗时（基于 python -X importtime）
+
+用法：
+    python benchmarks/import_time.py                       # 默认统计 app.api
+    python benchmarks/import_time.py app.services.disease_prediction --top 30
+    python benchmarks/import_time.py --output benchmarks/import_time_report.txt
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 需要关注的重量级依赖，应当只在路由第一次用到时才导入
+HEAVY_PACKAGES = ('xgboost', 'sklearn', 'pandas', 'scipy', 'snownlp', 'jieba', 'joblib')
+
+
+def measure(module):
+    """在新的解释器中导入模块，返回 [(模块名, 自身耗时us, 累计耗时us, 层级)]"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise SystemExit(f'导入 {module} 失败:\n{result.stderr[-2000:]}')
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def report(module, rows, top):
+    total = sum(self_us for _, self_us, _, _ in rows)
+    lines = [f'import {module}: {total / 1e6:.3f}s, {len(rows)} modules', '']
+
+    # 只列出顶层包，子模块的耗时已经包含在累计耗时中
+    packages = {}
+    for name, _, cumulative_us, _ in rows:
+        package = name.split('.')[0]
+        if name == package:
+            packages[package] = max(packages.get(package, 0), cumulative_us)
+    lines.append(f'top {top} packages by cumulative import time:')
+    for package, cumulative_us in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        lines.append(f'  {cumulative_us / 1000:9.1f} ms  {package}')
+
+    loaded = sorted({name.split('.')[0] for name, _, _, _ in rows} & set(HEAVY_PACKAGES))
+    lines.append('')
+    lines.append(f"heavy packages imported: {', '.join(loaded) if loaded else 'none'}")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='统计应用模块的导入耗时')
+    parser.add_argument('modules', nargs='*', default=['app.api'])
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--output', help='同时把报告写入文件')
+    args = parser.parse_args()
+
+    text = '\n\n'.join(report(module, measure(module), args.top) for module in args.modules)
+    print(text)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+"""add (user_id, recorded_at) index to health_records
+
+Revision ID: b2d4f6a80002
+Revises: a1c3e5f70001
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2d4f6a80002'
+down_revision = 'a1c3e5f70001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('health_records', schema=None) as batch_op:
+        batch_op.create_index('ix_health_records_user_id_recorded_at', ['user_id', 'recorded_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('health_records', schema=None) as batch_op:
+        batch_op.drop_index('ix_health_records_user_id_recorded_at')
@@ -0,0 +1,36 @@
+"""add user_recommendations table
+
+Revision ID: b8d0f2a30008
+Revises: a7c9e1f20007
+Create Date: 2026-10-17 19:00:00.000000
+
+升级后执行 flask precompute-recommendations 为已有用户生成建议；
+未预计算的用户在第一次请求时计算并保存。
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d0f2a30008'
+down_revision = 'a7c9e1f20007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_recommendations',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('data_version', sa.Integer(), nullable=False),
+    sa.Column('record_id', sa.Integer(), nullable=True),
+    sa.Column('analysis', sa.JSON(), nullable=True),
+    sa.Column('recommendations', sa.JSON(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade():
+    op.drop_table('user_recommendations')
@@ -0,0 +1,33 @@
+"""add systolic_bp/diastolic_bp columns to health_records
+
+Revision ID: c3e5a7b90003
+Revises: b2d4f6a80002
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e5a7b90003'
+down_revision = 'b2d4f6a80002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 新列允许为空，已有数据由下一个迁移分块回填
+    with op.batch_alter_table('health_records', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('systolic_bp', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('diastolic_bp', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_health_records_systolic_bp'), ['systolic_bp'], unique=False)
+        batch_op.create_index(batch_op.f('ix_health_records_diastolic_bp'), ['diastolic_bp'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('health_records', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_health_records_diastolic_bp'))
+        batch_op.drop_index(batch_op.f('ix_health_records_systolic_bp'))
+        batch_op.drop_column('diastolic_bp')
+        batch_op.drop_column('systolic_bp')
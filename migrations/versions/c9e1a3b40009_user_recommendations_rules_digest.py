@@ -0,0 +1,28 @@
+"""add user_recommendations.rules_digest
+
+Revision ID: c9e1a3b40009
+Revises: b8d0f2a30008
+Create Date: 2026-10-17 20:00:00.000000
+
+已有的预计算结果没有摘要，会在下次请求或执行 flask precompute-recommendations 时重新计算。
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9e1a3b40009'
+down_revision = 'b8d0f2a30008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user_recommendations', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('rules_digest', sa.String(length=16), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('user_recommendations', schema=None) as batch_op:
+        batch_op.drop_column('rules_digest')
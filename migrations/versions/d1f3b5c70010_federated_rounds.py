@@ -0,0 +1,55 @@
+"""add federated_rounds and federated_updates tables
+
+Revision ID: d1f3b5c70010
+Revises: c9e1a3b40009
+Create Date: 2026-10-17 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd1f3b5c70010'
+down_revision = 'c9e1a3b40009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('federated_rounds',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('quorum', sa.Integer(), nullable=False),
+    sa.Column('deadline', sa.DateTime(), nullable=False),
+    sa.Column('clients', sa.Integer(), nullable=False),
+    sa.Column('total_samples', sa.Float(), nullable=False),
+    sa.Column('sums', sa.LargeBinary(), nullable=True),
+    sa.Column('result', sa.JSON(), nullable=True),
+    sa.Column('close_reason', sa.String(length=16), nullable=True),
+    sa.Column('opened_at', sa.DateTime(), nullable=True),
+    sa.Column('closed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('federated_rounds', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_federated_rounds_status'), ['status'], unique=False)
+
+    op.create_table('federated_updates',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('round_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('samples', sa.Float(), nullable=False),
+    sa.Column('submitted_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['round_id'], ['federated_rounds.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('round_id', 'user_id', name='uq_federated_updates_round_user')
+    )
+
+
+def downgrade():
+    op.drop_table('federated_updates')
+    with op.batch_alter_table('federated_rounds', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_federated_rounds_status'))
+
+    op.drop_table('federated_rounds')
@@ -0,0 +1,79 @@
+"""backfill systolic_bp/diastolic_bp from blood_pressure
+
+Revision ID: d4f6b8c00004
+Revises: c3e5a7b90003
+Create Date: 2026-10-17 12:05:00.000000
+
+在自动提交模式下按主键分块回填，不会在一个大事务里长时间锁表；
+中断后重新执行 upgrade 只会处理剩余未回填的记录。块大小可通过环境变量 BP_BACKFILL_CHUNK_SIZE 调整。
+
+"""
+import os
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f6b8c00004'
+down_revision = 'c3e5a7b90003'
+branch_labels = None
+depends_on = None
+
+health_records = sa.table(
+    'health_records',
+    sa.column('id', sa.Integer),
+    sa.column('blood_pressure', sa.String),
+    sa.column('systolic_bp', sa.Integer),
+    sa.column('diastolic_bp', sa.Integer)
+)
+
+
+def _split(value):
+    # 迁移脚本不依赖应用代码，与 feature_extraction.split_blood_pressure 保持一致
+    systolic, sep, diastolic = (value or '').partition('/')
+    try:
+        if not sep:
+            raise ValueError
+        return int(round(float(systolic))), int(round(float(diastolic)))
+    except ValueError:
+        return None, None
+
+
+def upgrade():
+    chunk_size = int(os.environ.get('BP_BACKFILL_CHUNK_SIZE', 5000))
+    update = (
+        sa.update(health_records)
+        .where(health_records.c.id == sa.bindparam('record_id'))
+        .values(systolic_bp=sa.bindparam('systolic'), diastolic_bp=sa.bindparam('diastolic'))
+    )
+
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                sa.select(health_records.c.id, health_records.c.blood_pressure)
+                .where(
+                    health_records.c.id > last_id,
+                    health_records.c.systolic_bp.is_(None),
+                    health_records.c.blood_pressure.isnot(None)
+                )
+                .order_by(health_records.c.id)
+                .limit(chunk_size)
+            ).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            params = []
+            for row in rows:
+                systolic, diastolic = _split(row.blood_pressure)
+                if systolic is not None:
+                    params.append({'record_id': row.id, 'systolic': systolic, 'diastolic': diastolic})
+            if params:
+                conn.execute(update, params)
+
+
+def downgrade():
+    # 数据回填无需回滚，列在上一个迁移的 downgrade 中删除
+    pass
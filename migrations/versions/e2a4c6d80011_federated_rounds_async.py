@@ -0,0 +1,33 @@
+"""add async aggregation columns to federated_rounds
+
+Revision ID: e2a4c6d80011
+Revises: d1f3b5c70010
+Create Date: 2026-10-17 22:00:00.000000
+
+已有轮次都是同步联邦平均，权重就是样本数。
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a4c6d80011'
+down_revision = 'd1f3b5c70010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('federated_rounds', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('mode', sa.String(length=8), server_default='sync', nullable=False))
+        batch_op.add_column(sa.Column('base_version', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('total_weight', sa.Float(), server_default='0', nullable=False))
+    op.execute('UPDATE federated_rounds SET total_weight = total_samples')
+
+
+def downgrade():
+    with op.batch_alter_table('federated_rounds', schema=None) as batch_op:
+        batch_op.drop_column('total_weight')
+        batch_op.drop_column('base_version')
+        batch_op.drop_column('mode')
@@ -0,0 +1,42 @@
+"""add health_rollups table
+
+Revision ID: e5a7c9d00005
+Revises: d4f6b8c00004
+Create Date: 2026-10-17 14:00:00.000000
+
+升级后执行 flask rebuild-rollups 根据已有健康记录生成汇总数据。
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a7c9d00005'
+down_revision = 'd4f6b8c00004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('health_rollups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('period', sa.String(length=8), nullable=False),
+    sa.Column('period_start', sa.Date(), nullable=False),
+    sa.Column('metric', sa.String(length=32), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('value_sum', sa.Float(), nullable=False),
+    sa.Column('min_value', sa.Float(), nullable=True),
+    sa.Column('max_value', sa.Float(), nullable=True),
+    sa.Column('last_value', sa.Float(), nullable=True),
+    sa.Column('last_recorded_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'period', 'period_start', 'metric', name='uq_health_rollups_bucket')
+    )
+
+
+def downgrade():
+    op.drop_table('health_rollups')
@@ -0,0 +1,34 @@
+"""widen users.password_hash for scrypt hashes
+
+Revision ID: f6b8d0e10006
+Revises: e5a7c9d00005
+Create Date: 2026-10-17 16:00:00.000000
+
+scrypt 哈希长度约 162 个字符，超过原来的 128。
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6b8d0e10006'
+down_revision = 'e5a7c9d00005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.alter_column('password_hash',
+               existing_type=sa.String(length=128),
+               type_=sa.String(length=256),
+               existing_nullable=True)
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.alter_column('password_hash',
+               existing_type=sa.String(length=256),
+               type_=sa.String(length=128),
+               existing_nullable=True)
@@ -1,6 +1,7 @@
 import requests
 import json
 import random
+import time
 from datetime import datetime, timedelta
 
 def generate_test_data(num_records=20):
@@ -49,14 +50,18 @@ def test_disease_prediction():
             response = requests.post(add_record_url, headers=headers, json=record)
             print(f"添加健康记录状态码: {response.status_code}")
         
-        # 3. 训练模型
+        # 3. 提交训练任务并等待完成
         train_url = "http://localhost:5000/api/disease/train"
         response = requests.post(train_url, headers=headers)
-        print(f"训练模型状态码: {response.status_code}")
-        print(f"训练响应: {response.json()}")
+        print(f"提交训练任务状态码: {response.status_code}")
+        job = response.json()
+        while job.get('status') in ('queued', 'running'):
+            time.sleep(1)
+            job = requests.get(f"http://localhost:5000/api/jobs/{job['id']}", headers=headers).json()
+        print(f"训练任务结果: {job}")
         
         # 4. 预测疾病风险
-        if response.status_code == 200:
+        if job.get('status') == 'succeeded':
             predict_url = "http://localhost:5000/api/disease/predict"
             test_data = {
                 "heart_rate": 75,
@@ -0,0 +1,105 @@
+import os
+import sys
+import tempfile
+import jwt
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+
+from app import create_app, db
+from app.models.user import User
+from app.services.federated_rounds import (
+    fedavg_aggregator, contribution, from_contribution, pack_params, UpdateError
+)
+
+def train_client(rng, n, shift):
+    """在偏移后的随机数据上训练一个客户端模型，返回 (参数向量, 样本数, 模型, 标准化器)"""
+    X = rng.normal(70 + shift, 5 + shift / 2, (n, 7))
+    y = (X[:, 0] + X[:, 3] > 140 + shift).astype(int)
+    scaler = StandardScaler().fit(X)
+    model = LogisticRegression().fit(scaler.transform(X), y)
+    params = pack_params(model.coef_, model.intercept_, scaler.mean_, scaler.scale_)
+    return params, n, model, scaler
+
+def logits(params, X):
+    """参数向量对应模型在原始特征上的对数几率"""
+    d = X.shape[1]
+    coef, intercept = params[:d], params[d]
+    mean, scale = params[d + 1:2 * d + 1], params[2 * d + 1:]
+    return ((X - mean) / scale) @ coef + intercept
+
+def test_fedavg_rounds():
+    rng = np.random.default_rng(0)
+    clients = [train_client(rng, n, shift) for n, shift in ((100, 0), (250, 4), (60, 10))]
+    X_test = rng.normal(74, 7, (500, 7))
+    # 期望：各客户端在原始特征空间上的对数几率按样本数加权平均
+    expected = np.average(
+        [model.decision_function(scaler.transform(X_test)) for _, _, model, scaler in clients],
+        axis=0, weights=[n for _, n, _, _ in clients]
+    )
+
+    # 1. 贡献向量的加权平均还原为全局模型
+    total = sum(n for _, n, _, _ in clients)
+    average = sum(n * contribution(params) for params, n, _, _ in clients) / total
+    diff = np.abs(logits(from_contribution(average), X_test) - expected).max()
+    print(f"加权平均对数几率最大误差: {diff:.3e}")
+    assert diff < 1e-9
+
+    # 2. 通过聚合轮次提交，关闭后发布的全局模型与之一致；重复提交返回 409
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)  # 发布的模型文件写在临时目录中
+        try:
+            app = create_app({
+                'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TESTING': True,
+                'JWT_SECRET_KEY': 'test-secret', 'FL_ROUND_QUORUM': len(clients)
+            })
+            with app.app_context():
+                users = [User(username=f'client{i}', email=f'client{i}@test.com') for i in range(len(clients))]
+                db.session.add_all(users)
+                db.session.commit()
+                for user, (params, n, _, _) in zip(users, clients):
+                    round_ = fedavg_aggregator.submit(user.id, params, n)
+                assert round_.status == 'closed' and round_.clients == len(clients)
+                version = fedavg_aggregator.latest_version()
+                diff = np.abs(logits(fedavg_aggregator.global_params(version), X_test) - expected).max()
+                print(f"第 {version} 轮全局模型对数几率最大误差: {diff:.3e}")
+                assert diff < 1e-9
+
+                params, n, _, _ = clients[0]
+                fedavg_aggregator.submit(users[0].id, params, n)
+                try:
+                    fedavg_aggregator.submit(users[0].id, params, n)
+                    raise AssertionError('同一轮重复提交应当被拒绝')
+                except UpdateError as e:
+                    print(f"重复提交: {e.status} {e}")
+                    assert e.status == 409
+
+                # 接口同样返回 409
+                token = jwt.encode({'user_id': users[1].id}, 'test-secret', algorithm='HS256')
+                headers = {'Authorization': f'Bearer {token}'}
+                body = {
+                    'model_weights': [params[:7].tolist()], 'intercept': [float(params[7])],
+                    'scaler_mean': params[8:15].tolist(), 'scaler_scale': params[15:].tolist(), 'samples': n
+                }
+                client = app.test_client()
+                assert client.post('/api/fl/update', json=body, headers=headers).status_code == 200
+                response = client.post('/api/fl/update', json=body, headers=headers)
+                print(f"接口重复提交: {response.status_code} {response.get_json()}")
+                assert response.status_code == 409
+
+                # 并发冲突重试耗尽时返回 503，并带 Retry-After
+                fedavg_aggregator.current_round = lambda: None
+                try:
+                    response = client.post('/api/fl/update', json=body, headers=headers)
+                finally:
+                    del fedavg_aggregator.current_round
+                print(f"并发冲突: {response.status_code} {response.get_json()}")
+                assert response.status_code == 503 and response.headers['Retry-After'] == '1'
+        finally:
+            os.chdir(ROOT)
+
+if __name__ == '__main__':
+    test_fedavg_rounds()
@@ -1,5 +1,6 @@
 import requests
 import json
+import time
 
 def test_federated_learning():
     # 登录获取token
@@ -26,10 +27,14 @@ def test_federated_learning():
             train_url = "http://localhost:5000/api/fl/train"
             train_response = requests.post(train_url, headers=headers)
             print("训练响应状态码:", train_response.status_code)
-            print("训练响应内容:", train_response.text)
+            job = train_response.json()
+            while job.get('status') in ('queued', 'running'):
+                time.sleep(1)
+                job = requests.get(f"http://localhost:5000/api/jobs/{job['id']}", headers=headers).json()
+            print("训练任务结果:", job)
             
-            if train_response.status_code == 200:
-                local_model_params = train_response.json()
+            if job.get('status') == 'succeeded':
+                local_model_params = job['result']
                 
                 # 测试更新全局模型
                 print("\n2. 测试更新全局模型")
@@ -0,0 +1,80 @@
+import numpy as np
+from app.services.federated_rounds import N_FEATURES, PARAM_SIZE, UpdateError, pack_params
+from app.services.fl_codec import encode_update, decode_update, SEGMENTS, FLOAT32, FLOAT16, Q8, TOPK
+
+def random_params(rng):
+    """一组取值范围接近真实模型的参数向量"""
+    d = N_FEATURES
+    return pack_params(
+        rng.normal(0, 1, d), rng.normal(0, 1, 1),
+        rng.normal([78, 122, 80, 5.4, 65, 7.2, 5.5], 1), rng.uniform(1, 15, d)
+    )
+
+def expect_error(func, error=UpdateError):
+    try:
+        func()
+    except error as e:
+        return e
+    raise AssertionError(f'应当抛出 {error.__name__}')
+
+def test_fl_codec():
+    rng = np.random.default_rng(0)
+    params = random_params(rng)
+    base = random_params(rng)
+    samples = 321.0
+
+    # 1. 完整参数的往返误差
+    for encoding, rtol in ((FLOAT32, 1e-7), (FLOAT16, 1e-3)):
+        decoded, decoded_samples, base_version = decode_update(encode_update(params, samples, encoding))
+        error = np.abs(decoded - params).max()
+        print(f"{encoding} 最大误差: {error:.2e}")
+        assert decoded_samples == samples and base_version == 0
+        assert np.allclose(decoded, params, rtol=rtol, atol=0)
+
+    # q8：每个参数组的误差不超过该组量化步长的一半
+    payload = encode_update(params, samples, Q8)
+    decoded = decode_update(payload)[0]
+    starts = np.concatenate([[0], np.cumsum(SEGMENTS)])
+    for low, high in zip(starts[:-1], starts[1:]):
+        segment = params[low:high]
+        step = (segment.max() - segment.min()) / 255
+        assert np.abs(decoded[low:high] - segment).max() <= step / 2 * (1 + 1e-3) + 1e-6
+    print(f"q8 {len(payload)} 字节，最大误差: {np.abs(decoded - params).max():.2e}")
+
+    # 2. 增量：float16 增量和 top-k 增量都还原到基准之上
+    decoded, _, base_version = decode_update(encode_update(params, samples, FLOAT16, base=base, base_version=3), {3: base}.get)
+    assert base_version == 3
+    assert np.allclose(decoded, params, rtol=0, atol=np.abs(params - base).max() * 1e-3)
+
+    k = 5
+    decoded, _, base_version = decode_update(
+        encode_update(params, samples, TOPK, base=base, base_version=3, top_k=k), {3: base}.get
+    )
+    delta = params - base
+    kept = np.argsort(-np.abs(delta))[:k]
+    assert base_version == 3
+    assert np.allclose(decoded[kept], params[kept], rtol=1e-6, atol=1e-6)
+    others = np.setdiff1d(np.arange(PARAM_SIZE), kept)
+    assert np.array_equal(decoded[others], base[others])
+    print(f"top-{k} 增量保留的下标: {sorted(kept.tolist())}")
+
+    # 基准版本不存在时返回 409
+    assert expect_error(lambda: decode_update(encode_update(params, samples, TOPK, base=base, base_version=3, top_k=k), {}.get)).status == 409
+
+    # 3. 非法的 top_k 在编码时拒绝
+    for top_k in (0, -1, PARAM_SIZE + 1):
+        expect_error(lambda: encode_update(params, samples, TOPK, base=base, base_version=3, top_k=top_k), ValueError)
+
+    # 4. 长度错误和非有限值的数据被拒绝
+    payload = encode_update(params, samples, FLOAT32)
+    for bad in (payload[:-1], payload + b'\0', payload[:10]):
+        print(f"长度 {len(bad)}: {expect_error(lambda: decode_update(bad))}")
+    overflow = params.copy()
+    overflow[0] = 1e6  # 超出 float16 范围，编码后为 inf
+    with np.errstate(over='ignore'):
+        payload = encode_update(overflow, samples, FLOAT16)
+    print(f"float16 溢出: {expect_error(lambda: decode_update(payload))}")
+    print(f"样本数为0: {expect_error(lambda: decode_update(encode_update(params, 0, FLOAT32)))}")
+
+if __name__ == '__main__':
+    test_fl_codec()
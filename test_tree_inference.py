@@ -0,0 +1,77 @@
+import random
+import time
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+from sklearn.preprocessing import StandardScaler
+from app.services.feature_extraction import extract_features, ALGORITHM_SCHEMA
+from app.services.health_scoring import ALGORITHM_LABEL_RULES
+from app.services.tree_ensemble import CompiledEnsemble
+
+def generate_test_data(num_records=2000, seed=42):
+    """生成测试用的健康记录数据，包含缺失值和边界值"""
+    rng = random.Random(seed)
+    records = []
+    for i in range(num_records):
+        records.append({
+            "heart_rate": rng.choice([rng.randint(45, 120), 60, 100, None]),
+            "blood_pressure": f"{rng.randint(80, 170)}/{rng.randint(50, 105)}",
+            "blood_sugar": round(rng.uniform(3.0, 9.0), 1),
+            "weight": round(rng.uniform(45, 95), 1),
+            "sleep_hours": rng.choice([round(rng.uniform(4, 10), 1), None]),
+            "mood_score": rng.randint(1, 10)
+        })
+    return records
+
+def test_tree_inference():
+    # 1. 按训练流程准备数据并训练两个模型
+    X, columns = extract_features(generate_test_data(), ALGORITHM_SCHEMA)
+    y = ALGORITHM_LABEL_RULES.label(columns).astype(int)
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    diabetes_model = GradientBoostingClassifier(n_estimators=100, random_state=42).fit(X_scaled, y)
+    hypertension_model = RandomForestClassifier(n_estimators=100, random_state=42).fit(X_scaled, y)
+
+    # 2. 编译成融合模型
+    ensemble = CompiledEnsemble.compile(
+        {'diabetes': diabetes_model, 'hypertension': hypertension_model}, scaler
+    )
+    print(f"编译结果: {ensemble}")
+
+    # 3. 在新数据上对比 sklearn 的 predict_proba
+    X_test, _ = extract_features(generate_test_data(5000, seed=7), ALGORITHM_SCHEMA)
+    probabilities = ensemble.predict_proba(X_test)
+    expected_diabetes = diabetes_model.predict_proba(scaler.transform(X_test))[:, 1]
+    expected_hypertension = hypertension_model.predict_proba(scaler.transform(X_test))[:, 1]
+    diabetes_diff = np.abs(probabilities['diabetes'] - expected_diabetes).max()
+    hypertension_diff = np.abs(probabilities['hypertension'] - expected_hypertension).max()
+    print(f"糖尿病概率最大误差: {diabetes_diff:.3e}")
+    print(f"高血压概率最大误差: {hypertension_diff:.3e}")
+    assert diabetes_diff < 1e-9
+    assert hypertension_diff < 1e-9
+
+    # 4. 落在阈值上的特征值：与 sklearn 一样按 float32 比较
+    thresholds = ensemble.threshold[~ensemble.is_leaf]
+    features = ensemble.feature[~ensemble.is_leaf]
+    X_edge = np.tile(scaler.mean_, (len(thresholds), 1))
+    X_edge[np.arange(len(thresholds)), features] = thresholds * scaler.scale_[features] + scaler.mean_[features]
+    X_edge = X_edge.astype(np.float32)  # 与 extract_features 输出的类型一致
+    edge = ensemble.predict_proba(X_edge)
+    assert np.allclose(edge['diabetes'], diabetes_model.predict_proba(scaler.transform(X_edge))[:, 1], rtol=0, atol=1e-9)
+    assert np.allclose(edge['hypertension'], hypertension_model.predict_proba(scaler.transform(X_edge))[:, 1], rtol=0, atol=1e-9)
+    print(f"阈值边界 {len(thresholds)} 条记录结果一致")
+
+    # 5. 单条预测耗时对比
+    row = X_test[:1]
+    start = time.perf_counter()
+    for _ in range(100):
+        diabetes_model.predict_proba(scaler.transform(row))
+        hypertension_model.predict_proba(scaler.transform(row))
+    sklearn_ms = (time.perf_counter() - start) * 10
+    start = time.perf_counter()
+    for _ in range(100):
+        ensemble.predict_proba(row)
+    compiled_ms = (time.perf_counter() - start) * 10
+    print(f"单条预测耗时: sklearn {sklearn_ms:.3f}ms, 编译后 {compiled_ms:.3f}ms")
+
+if __name__ == '__main__':
+    test_tree_inference()